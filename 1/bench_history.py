@@ -0,0 +1,126 @@
+"""
+بررسی محدود ماندن تاریخچه‌ی گراف main.py در یک گفتگوی طولانی، با LLM جعلی
+(بدون کلید Groq).
+
+    python bench_history.py --turns 300
+
+بعد از هر نوبت تعداد پیام‌های state و اندازه‌ی پرامپت نوبت بعد (پیام‌ها به علاوه‌ی
+خلاصه، توکن ≈ کاراکتر / ۴) ثبت می‌شود. از اولین خلاصه به بعد تعداد پیام‌ها نباید از
+سقف SUMMARIZE_AFTER_TURNS بیشتر شود و اندازه‌ی پرامپت در نیمه‌ی دوم گفتگو نباید از
+نیمه‌ی اول بزرگ‌تر باشد؛ در غیر این صورت AssertionError.
+"""
+import argparse
+import os
+import random
+import re
+import tempfile
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+os.environ.setdefault("GROQ_API_KEY", "fake")
+import main
+from common.checkpoint import SqliteDeltaSaver
+from common.history import with_summary
+
+
+MAX_WORDS = re.compile(r"in at most (\d+) words")
+SUMMARY_SLACK = 1.05  # خلاصه تا سقف max_words کمی بلند و کوتاه می‌شود
+
+
+def estimate_tokens(messages):
+    return sum(len(str(m.content)) for m in messages) // 4
+
+
+class FakeChatLLM(BaseChatModel):
+    """
+    جواب چت: reply_words کلمه. جواب پرامپت خلاصه‌سازی: خلاصه‌ی قبلی به علاوه‌ی
+    پیام‌های جدید، بریده به همان تعداد کلمه‌ای که پرامپت خواسته.
+    """
+
+    reply_words: int = 60
+    calls: int = 0
+    summaries: int = 0
+
+    @property
+    def _llm_type(self):
+        return "fake-history"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        prompt = str(messages[-1].content)
+        limit = MAX_WORDS.search(prompt)
+        if limit and prompt.startswith("You maintain the running summary"):
+            self.summaries += 1
+            words = prompt.split("Current summary:", 1)[1].split()
+            text = " ".join(words[: int(limit.group(1))])
+        else:
+            text = " ".join(f"word{i}" for i in range(self.reply_words))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+
+def question(rng, n):
+    return f"question {n}: " + " ".join(
+        rng.choice(["pump", "valve", "order", "price", "route", "hotel"])
+        for _ in range(rng.randrange(5, 40))
+    )
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Bounded chat history over a long thread")
+    parser.add_argument("--turns", type=int, default=300)
+    parser.add_argument("--reply-words", type=int, default=60)
+    parser.add_argument("--report-every", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    main.llm = FakeChatLLM(reply_words=args.reply_words)
+    rng = random.Random(args.seed)
+    config = {"configurable": {"thread_id": "bench-history"}}
+    counts, tokens = [], []
+    first_summary = None
+    print(
+        f"--- {args.turns} turns, KEEP_LAST_TURNS={main.KEEP_LAST_TURNS}, "
+        f"SUMMARIZE_AFTER_TURNS={main.SUMMARIZE_AFTER_TURNS} ---"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        graph = main.builder.compile(
+            checkpointer=SqliteDeltaSaver(os.path.join(tmp, "checkpoints.sqlite"))
+        )
+        start = time.perf_counter()
+        for turn in range(1, args.turns + 1):
+            graph.invoke({"messages": [HumanMessage(content=question(rng, turn))]}, config)
+            state = graph.get_state(config).values
+            messages, summary = state["messages"], state.get("summary", "")
+            if summary and first_summary is None:
+                first_summary = turn
+            counts.append(len(messages))
+            tokens.append(estimate_tokens(with_summary(messages, summary)))
+            if turn % args.report_every == 0 or turn == first_summary:
+                print(
+                    f"turn {turn:>4}: {counts[-1]:>3} messages, "
+                    f"~{tokens[-1]:>5} prompt tokens, summary {len(summary.split()):>3} words"
+                )
+        elapsed = time.perf_counter() - start
+    print(
+        f"{elapsed:.2f}s, {main.llm.calls} LLM calls ({main.llm.summaries} summaries)"
+    )
+
+    assert first_summary is not None, "history was never summarized"
+    after = first_summary - 1
+    # هر نوبت یک HumanMessage و یک AIMessage؛ خلاصه بعد از نوبت SUMMARIZE_AFTER_TURNS+1 ساخته می‌شود
+    limit = 2 * (main.SUMMARIZE_AFTER_TURNS + 1)
+    assert max(counts[after:]) <= limit, f"{max(counts[after:])} messages > {limit}"
+    middle = after + (len(counts) - after) // 2
+    early, late = max(tokens[after:middle]), max(tokens[middle:])
+    assert late <= early * SUMMARY_SLACK, f"prompt grew: ~{early} -> ~{late} tokens"
+    print(
+        f"bounded after turn {first_summary}: <= {max(counts[after:])} messages, "
+        f"~{early} / ~{late} max prompt tokens (first / second half)"
+    )
+
+
+if __name__ == "__main__":
+    main_cli()
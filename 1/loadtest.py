@@ -0,0 +1,133 @@
+"""
+تست بار server.py با یک LLM جعلی (بدون نیاز به کلید Groq).
+
+    python loadtest.py --sessions 300 --turns 3 --max-inflight 64
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+os.environ.setdefault("GROQ_API_KEY", "fake")
+import main
+from common.checkpoint import SqliteDeltaSaver
+from server import ChatServer
+
+
+class SlowFakeLLM(BaseChatModel):
+    """تأخیر شبکه را شبیه‌سازی می‌کند: first_token ثانیه تا اولین توکن، بعد هر توکن token_delay"""
+
+    first_token: float = 0.5
+    token_delay: float = 0.01
+    tokens: int = 20
+
+    @property
+    def _llm_type(self):
+        return "slow-fake"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.first_token + self.tokens * self.token_delay)
+        text = "".join(f"token{i} " for i in range(self.tokens))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.first_token + self.tokens * self.token_delay)
+        text = "".join(f"token{i} " for i in range(self.tokens))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.first_token)
+        for i in range(self.tokens):
+            await asyncio.sleep(self.token_delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=f"token{i} "))
+
+
+async def client(port, turns, ttft, latencies, outcomes):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    hello = json.loads(await reader.readline())
+    if hello["type"] != "hello":
+        outcomes.append(hello["type"])
+        writer.close()
+        return
+    for i in range(turns):
+        start = time.perf_counter()
+        first = None
+        writer.write(f"question {i}\n".encode())
+        await writer.drain()
+        while True:
+            event = json.loads(await reader.readline())
+            if event["type"] == "token" and first is None:
+                first = time.perf_counter() - start
+            if event["type"] in ["end", "busy", "error"]:
+                outcomes.append(event["type"])
+                break
+        if event["type"] == "end":
+            ttft.append(first)
+            latencies.append(time.perf_counter() - start)
+    writer.write(b"quit\n")
+    await writer.drain()
+    writer.close()
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+async def run(args):
+    main.llm = SlowFakeLLM(first_token=args.latency)
+    with tempfile.TemporaryDirectory() as tmp:
+        saver = SqliteDeltaSaver(os.path.join(tmp, "loadtest.sqlite"))
+        graph = main.builder.compile(checkpointer=saver)
+        server = ChatServer(
+            graph,
+            max_inflight=args.max_inflight,
+            max_connections=args.sessions,
+            queue_timeout=args.queue_timeout,
+        )
+        tcp_server = await asyncio.start_server(
+            server.handle, "127.0.0.1", 0, backlog=args.sessions
+        )
+        port = tcp_server.sockets[0].getsockname()[1]
+
+        ttft, latencies, outcomes = [], [], []
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(
+                client(port, args.turns, ttft, latencies, outcomes)
+                for _ in range(args.sessions)
+            )
+        )
+        elapsed = time.perf_counter() - start
+        tcp_server.close()
+        await tcp_server.wait_closed()
+        saver.conn.close()
+
+    ideal = args.sessions * args.turns * (args.latency + 0.2) / args.max_inflight
+    print(f"--- Load test: {args.sessions} sessions x {args.turns} turns ---")
+    print(f"Completed turns : {outcomes.count('end')} ({outcomes.count('busy')} busy, {outcomes.count('error')} errors)")
+    print(f"Wall time       : {elapsed:.2f}s (ideal at this cap ~{ideal:.2f}s)")
+    print(f"Throughput      : {outcomes.count('end') / elapsed:.1f} turns/s")
+    print(f"TTFT p50/p95    : {percentile(ttft, 0.5):.3f}s / {percentile(ttft, 0.95):.3f}s")
+    print(f"Turn p50/p95    : {percentile(latencies, 0.5):.3f}s / {percentile(latencies, 0.95):.3f}s")
+    print(f"Server stats    : {server.stats}")
+
+
+def cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--max-inflight", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--queue-timeout", type=float, default=30)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    cli()
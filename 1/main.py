@@ -1,12 +1,17 @@
 import os
+import sys
 from dotenv import load_dotenv
 from typing import Annotated
 from typing_extensions import TypedDict
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
-from langgraph.checkpoint.memory import MemorySaver
 from langchain_groq import ChatGroq
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import HumanMessage, message_chunk_to_message
+from langchain_core.runnables import RunnableLambda
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.checkpoint import SqliteDeltaSaver
+from common.history import amanage_history, manage_history, with_summary
 
 
 load_dotenv()
@@ -14,8 +19,16 @@ if not os.getenv("GROQ_API_KEY"):
     print("Error: OPENAI_API_KEY not found in .env file")
 
 
+KEEP_LAST_TURNS = 4
+SUMMARIZE_AFTER_TURNS = 8
+TOOL_PAYLOAD_LIMIT = 2000
+# خطایی که langchain-core وقتی stream هیچ تکه‌ای نداد می‌دهد
+EMPTY_STREAM = "No generation chunks were returned"
+
+
 class State(TypedDict):
     messages: Annotated[list, add_messages]
+    summary: str
 
 
 llm = ChatGroq(
@@ -23,21 +36,70 @@ llm = ChatGroq(
 )
 
 
+def empty_stream(error, response):
+    """
+    فقط stream ـی که هیچ تکه‌ای نداد؛ بقیه‌ی ValueErrorها (validation، parse) یا خطای
+    بعد از اولین تکه نباید با یک درخواست دوباره پوشانده شوند
+    """
+    return response is None and type(error) is ValueError and str(error) == EMPTY_STREAM
+
+
 def chatbot_node(state: State):
-    messages = state["messages"]
-    response = llm.invoke(messages)
-    return {"messages": [response]}
+    messages = with_summary(state["messages"], state.get("summary", ""))
+    # پاسخ را تکه‌تکه از مدل می‌گیریم تا در حالت stream_mode="messages" توکن‌ها فوراً چاپ شوند
+    response = None
+    try:
+        for chunk in llm.stream(messages):
+            response = chunk if response is None else response + chunk
+    except ValueError as e:
+        if not empty_stream(e, response):
+            raise
+    if response is None:
+        # stream هیچ تکه‌ای نداد؛ جواب کامل را یک‌جا می‌گیریم
+        return {"messages": [llm.invoke(messages)]}
+    return {"messages": [message_chunk_to_message(response)]}
+
+
+async def achatbot_node(state: State):
+    messages = with_summary(state["messages"], state.get("summary", ""))
+    response = None
+    try:
+        async for chunk in llm.astream(messages):
+            response = chunk if response is None else response + chunk
+    except ValueError as e:
+        if not empty_stream(e, response):
+            raise
+    if response is None:
+        return {"messages": [await llm.ainvoke(messages)]}
+    return {"messages": [message_chunk_to_message(response)]}
 
 
+def history_node(state: State):
+    return manage_history(
+        state, llm, KEEP_LAST_TURNS, SUMMARIZE_AFTER_TURNS, TOOL_PAYLOAD_LIMIT
+    )
+
+
+async def ahistory_node(state: State):
+    return await amanage_history(
+        state, llm, KEEP_LAST_TURNS, SUMMARIZE_AFTER_TURNS, TOOL_PAYLOAD_LIMIT
+    )
+
+
+# هر نود نسخه sync (برای CLI) و async (برای server.py و graph.astream) دارد
 builder = StateGraph(State)
-builder.add_node("chatbot", chatbot_node)
+builder.add_node("chatbot", RunnableLambda(chatbot_node, afunc=achatbot_node))
+builder.add_node("history", RunnableLambda(history_node, afunc=ahistory_node))
 builder.add_edge(START, "chatbot")
-builder.add_edge("chatbot", END)
-memory = MemorySaver()
+builder.add_edge("chatbot", "history")
+builder.add_edge("history", END)
+memory = SqliteDeltaSaver(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "checkpoints.sqlite")
+)
 graph = builder.compile(checkpointer=memory)
 
 
-def main():
+def main(stream_tokens=True):
     print("--- Chatbot Started (Type 'quit' to exit) ---")
     config = {"configurable": {"thread_id": "1"}}
     while True:
@@ -45,10 +107,21 @@ def main():
         if user_input.lower() in ["quit", "exit"]:
             break
         input_message = HumanMessage(content=user_input)
-        for event in graph.stream({"messages": [input_message]}, config):
-            for value in event.values():
-                print(f"Assistant:{value['messages'][-1].content}")
+        if not stream_tokens:
+            for event in graph.stream({"messages": [input_message]}, config):
+                for node_name, value in event.items():
+                    if node_name == "chatbot":
+                        print(f"Assistant:{value['messages'][-1].content}")
+            continue
+
+        print("Assistant:", end="", flush=True)
+        for message, metadata in graph.stream(
+            {"messages": [input_message]}, config, stream_mode="messages"
+        ):
+            if metadata["langgraph_node"] == "chatbot" and message.content:
+                print(message.content, end="", flush=True)
+        print()
 
 
 if __name__ == "__main__":
-    main()
+    main(stream_tokens="--no-stream" not in sys.argv)
@@ -0,0 +1,133 @@
+import argparse
+import asyncio
+import json
+import uuid
+
+from langchain_core.messages import HumanMessage
+
+
+MAX_CONNECTIONS = 1000
+MAX_INFLIGHT_LLM = 64  # سقف کل درخواست‌های هم‌زمان به LLM در کل پروسه
+QUEUE_TIMEOUT = 10  # اگر تا این مدت جایی برای LLM خالی نشد، پاسخ busy می‌دهیم
+TURN_TIMEOUT = 120
+
+
+class ChatServer:
+    """
+    سرور خطی (line protocol) روی asyncio:
+    کلاینت هر پیام را در یک خط می‌فرستد و سرور رویدادها را به صورت JSON خط‌به‌خط
+    برمی‌گرداند: hello (با thread_id)، token، end، busy، error و full.
+    """
+
+    def __init__(
+        self,
+        graph,
+        max_inflight=MAX_INFLIGHT_LLM,
+        max_connections=MAX_CONNECTIONS,
+        queue_timeout=QUEUE_TIMEOUT,
+        turn_timeout=TURN_TIMEOUT,
+    ):
+        self.graph = graph
+        self.llm_slots = asyncio.Semaphore(max_inflight)
+        self.max_connections = max_connections
+        self.queue_timeout = queue_timeout
+        self.turn_timeout = turn_timeout
+        self.connections = 0
+        self.stats = {"turns": 0, "busy": 0, "errors": 0, "rejected": 0}
+
+    async def send(self, writer, **event):
+        writer.write((json.dumps(event, ensure_ascii=False) + "\n").encode())
+        # drain باعث می‌شود کلاینت کند، تولید توکن را هم کند کند (backpressure)
+        await writer.drain()
+
+    async def handle(self, reader, writer):
+        if self.connections >= self.max_connections:
+            self.stats["rejected"] += 1
+            await self.send(writer, type="full")
+            writer.close()
+            return
+
+        self.connections += 1
+        thread_id = uuid.uuid4().hex
+        try:
+            await self.send(writer, type="hello", thread_id=thread_id)
+            # خط بعدی فقط وقتی خوانده می‌شود که جواب قبلی تمام شده باشد
+            while line := await reader.readline():
+                text = line.decode("utf-8", errors="replace").strip()
+                if not text:
+                    continue
+                if text.lower() in ["quit", "exit"]:
+                    break
+                await self.turn(writer, thread_id, text)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def turn(self, writer, thread_id, text):
+        try:
+            await asyncio.wait_for(self.llm_slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.stats["busy"] += 1
+            await self.send(writer, type="busy")
+            return
+
+        try:
+            await asyncio.wait_for(
+                self.stream_reply(writer, thread_id, text), self.turn_timeout
+            )
+            self.stats["turns"] += 1
+        except asyncio.TimeoutError:
+            self.stats["errors"] += 1
+            await self.send(writer, type="error", message="timeout")
+        except ConnectionError:
+            raise
+        except Exception as e:
+            self.stats["errors"] += 1
+            await self.send(writer, type="error", message=str(e))
+        finally:
+            self.llm_slots.release()
+
+    async def stream_reply(self, writer, thread_id, text):
+        config = {"configurable": {"thread_id": thread_id}}
+        input_message = HumanMessage(content=text)
+        async for message, metadata in self.graph.astream(
+            {"messages": [input_message]}, config, stream_mode="messages"
+        ):
+            if metadata["langgraph_node"] == "chatbot" and message.content:
+                await self.send(writer, type="token", text=message.content)
+        await self.send(writer, type="end")
+
+
+async def serve(server, host, port):
+    # backlog پیش‌فرض (۱۰۰) برای صدها اتصال هم‌زمان کافی نیست
+    tcp_server = await asyncio.start_server(
+        server.handle, host, port, backlog=server.max_connections
+    )
+    print(f"--- Chat Server listening on {host}:{port} ---")
+    async with tcp_server:
+        await tcp_server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-inflight", type=int, default=MAX_INFLIGHT_LLM)
+    parser.add_argument("--max-connections", type=int, default=MAX_CONNECTIONS)
+    args = parser.parse_args()
+
+    from main import graph
+
+    server = ChatServer(
+        graph, max_inflight=args.max_inflight, max_connections=args.max_connections
+    )
+    try:
+        asyncio.run(serve(server, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
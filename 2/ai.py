@@ -1,4 +1,5 @@
 import os
+import sys
 from dotenv import load_dotenv
 from typing import Annotated
 from typing_extensions import TypedDict
@@ -7,7 +8,12 @@ from langgraph.graph.message import add_messages
 from langgraph.checkpoint.memory import MemorySaver
 from langchain_groq import ChatGroq
 from langchain_core.messages import HumanMessage
-from pydantic import BaseModel, Field
+from langchain_core.exceptions import OutputParserException
+from langgraph.types import RetryPolicy, default_retry_on
+from pydantic import BaseModel, Field, ValidationError
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.structured import StructuredOutput
 
 load_dotenv()
 if not os.getenv('GROQ_API_KEY'):
@@ -25,15 +31,20 @@ llm=ChatGroq(
     api_key=os.getenv("GROQ_API_KEY"),
     temperature=0.7
 )
-structured_llm=llm.with_structured_output(Joke)
+# خروجی نامعتبر اول محلی تعمیر می‌شود (مثلاً rating=12 → 10) و فقط در صورت شکست دوباره پرسیده می‌شود
+structured_llm=StructuredOutput(llm,Joke)
 def generate_joke_node(state:State):
     topic=state['topic']
     prompt=f"یک جوک خیلی خنده‌دار درباره '{topic}' بگو."
     response=structured_llm.invoke(prompt)
     return{'generated_joke':response}
 
+# جوک نامعتبر (مثلاً rating خارج از ۱..۱۰) هم مثل خطای شبکه دوباره امتحان می‌شود
+def should_retry(error):
+    return isinstance(error,(ValidationError,OutputParserException)) or default_retry_on(error)
+
 builder=StateGraph(State)
-builder.add_node('joke_generator',generate_joke_node)
+builder.add_node('joke_generator',generate_joke_node,retry_policy=RetryPolicy(max_attempts=3,retry_on=should_retry))
 builder.add_edge(START,'joke_generator')
 builder.add_edge('joke_generator',END)
 graph=builder.compile()
@@ -43,13 +54,11 @@ def main():
                 user_topic=input('\nموضوع جوک رو بگو (یا quit): ')
                 if user_topic.lower() in ["quit", "exit"]:
                     break
-                result=graph.invoke('topic':user_topic)
+                result=graph.invoke({'topic':user_topic})
                 joke=result['generated_joke']
                 print(f'setup: {joke.setup}')
                 print(f'punchline:{joke.punchline}')
                 print(f'rating:{joke.rating}/10')
+    print(f'structured output stats: {structured_llm.stats}')
 if __name__ == "__main__":
     main()
-print(m)
-def tab():
-                
@@ -0,0 +1,102 @@
+"""
+تولید دسته‌ای جوک از فایل یا stdin.
+
+    python batch.py topics.jsonl -o jokes.jsonl --concurrency 8
+    cat topics.csv | python batch.py - --format csv
+
+ورودی JSONL: هر خط {"topic": "..."} (و اختیاری "id") یا فقط یک رشته.
+ورودی CSV: ستون topic (و اختیاری id)؛ اگر هدر نداشت، ستون اول موضوع است.
+هر جوک به محض آماده شدن در خروجی نوشته می‌شود، نه در پایان کار.
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+
+from ai import graph, structured_llm
+
+
+def read_topics(stream, fmt):
+    items = []
+    if fmt == "csv":
+        rows = list(csv.reader(stream))
+        header = [h.strip().lower() for h in rows[0]] if rows else []
+        if "topic" in header:
+            topic_col = header.index("topic")
+            id_col = header.index("id") if "id" in header else None
+            rows = rows[1:]
+        else:
+            topic_col, id_col = 0, None
+        for n, row in enumerate(rows, 1):
+            if row and row[topic_col].strip():
+                item_id = row[id_col] if id_col is not None else n
+                items.append({"id": item_id, "topic": row[topic_col].strip()})
+        return items
+
+    for n, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line)
+        if isinstance(record, str):
+            record = {"topic": record}
+        items.append({"id": record.get("id", n), "topic": record["topic"]})
+    return items
+
+
+def run_batch(items, out, concurrency):
+    inputs = [{"topic": item["topic"]} for item in items]
+    done = failed = 0
+    start = time.perf_counter()
+    # هر آیتم تلاش‌های مجدد خودش را دارد (RetryPolicy نود) و بقیه منتظرش نمی‌مانند
+    for index, result in graph.batch_as_completed(
+        inputs, config={"max_concurrency": concurrency}, return_exceptions=True
+    ):
+        item = items[index]
+        if isinstance(result, Exception):
+            failed += 1
+            record = {**item, "error": f"{type(result).__name__}: {result}"}
+        else:
+            done += 1
+            record = {**item, **result["generated_joke"].model_dump()}
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+    return done, failed, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch joke generator")
+    parser.add_argument("input", help="topics file (.jsonl / .csv) or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output, - for stdout")
+    parser.add_argument("--format", choices=["jsonl", "csv"])
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.input.lower().endswith(".csv") else "jsonl")
+    if args.input == "-":
+        items = read_topics(sys.stdin, fmt)
+    else:
+        with open(args.input, encoding="utf-8", newline="") as f:
+            items = read_topics(f, fmt)
+
+    out = (
+        sys.stdout
+        if args.output == "-"
+        else open(args.output, "w", encoding="utf-8")
+    )
+    try:
+        done, failed, elapsed = run_batch(items, out, args.concurrency)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(
+        f"--- {done} jokes, {failed} failed in {elapsed:.1f}s "
+        f"({len(items) / max(elapsed, 1e-9):.1f} topics/s) ---",
+        file=sys.stderr,
+    )
+    print(f"structured output stats: {structured_llm.stats}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+بررسی جواب‌های مسیر سریع ماشین‌حساب (fast_math.solve)، بدون LLM.
+
+    python check_fast_math.py
+
+هر مورد یا جواب دقیق دارد یا None (یعنی سؤال به LLM می‌رود)؛ اگر solve جواب
+دیگری بدهد AssertionError.
+"""
+from fast_math import solve
+
+
+CASES = [
+    ("2+2", "2+2 = 4"),
+    ("10/4", "10/4 = 2.5"),
+    ("۲ به توان ۱۰", "۲ ** ۱۰ = ۱۰۲۴"),
+    ("(-8)**0.5", None),
+    # توان بزرگ داخل عبارت بزرگ‌تر: خلاصه‌ی خود توان جواب کل عبارت نیست
+    ("9**99999999 * 0", None),
+    ("1 + 9**99999999", None),
+    ("9**99999999 - 9**99999999", None),
+    ("-9**99999999", None),
+    ("2 ** 3 ** 1000000", None),
+]
+# توان تنها بدون ساختن عدد خلاصه می‌شود
+COMPACT = [
+    ("9**99999999", "9**99999999 ≈ 9.7653986715386750136e+95424249 (95,424,250 digits"),
+    ("(2+7)**(10**8)", "(2+7)**(10**8) ≈ 8.7888588043848075122e+95424250"),
+]
+
+
+def main():
+    for text, expected in CASES:
+        answer = solve(text)
+        assert answer == expected, f"{text!r}: {answer!r} != {expected!r}"
+    for text, prefix in COMPACT:
+        answer = solve(text)
+        assert answer and answer.startswith(prefix), f"{text!r}: {answer!r}"
+    print(f"{len(CASES) + len(COMPACT)} cases ok")
+
+
+if __name__ == "__main__":
+    main()
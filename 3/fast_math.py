@@ -0,0 +1,217 @@
+import ast
+import decimal
+import math
+import operator
+import re
+
+
+MAX_DIGITS = 10_000  # جواب‌های بزرگ‌تر از این به مسیر LLM و ابزارها می‌روند
+COMPACT_DIGITS = 1000  # بالاتر از این، به جای خود عدد شکل فشرده‌اش برگردانده می‌شود
+SHOWN_DIGITS = 20
+
+PERSIAN_DIGITS = "۰۱۲۳۴۵۶۷۸۹"
+TO_LATIN = str.maketrans(
+    PERSIAN_DIGITS + "٠١٢٣٤٥٦٧٨٩" + "٫٬×÷−–",
+    "0123456789" + "0123456789" + ".,*/--",
+)
+TO_PERSIAN = str.maketrans("0123456789", PERSIAN_DIGITS)
+
+# ترتیب مهم است: عبارت‌های بلندتر اول
+WORDS = [
+    (r"to the power of|raised to|به توان", "**"),
+    (r"multiplied by|times|ضربدر|ضرب در", "*"),
+    (r"divided by|تقسیم بر", "/"),
+    (r"plus|به علاوه|بعلاوه|جمع با", "+"),
+    (r"minus|منهای|منها", "-"),
+    (r"\bmod\b|باقیمانده", "%"),
+]
+PREFIXES = r"^(what is|what's|calculate|compute|evaluate|حساب کن|محاسبه کن)\s*"
+SUFFIXES = r"(چند میشه|چند می‌شود|چنده|میشه چند|می‌شود چند|=)\s*$"
+EXPRESSION = re.compile(r"^[\d\s.+\-*/%()]+$")
+
+OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+
+
+class TooLarge(ArithmeticError):
+    def __init__(self, base, exponent=None):
+        super().__init__(f"{base} ** {exponent}" if exponent is not None else base)
+        self.base = base
+        self.exponent = exponent
+
+
+def normalize(text):
+    """متن کاربر را به یک عبارت ریاضی پایتونی تبدیل می‌کند؛ اگر عبارت خالص نبود None"""
+    expr = text.translate(TO_LATIN).strip().lower()
+    expr = re.sub(r"[?؟!.]+$", "", expr).strip()
+    expr = re.sub(PREFIXES, "", expr)
+    expr = re.sub(SUFFIXES, "", expr).strip()
+    for pattern, symbol in WORDS:
+        expr = re.sub(pattern, f" {symbol} ", expr)
+    expr = re.sub(r"(?<=\d)\s*x\s*(?=\d)", "*", expr)
+    expr = expr.replace("^", "**")
+    expr = re.sub(r"(?<=\d),(?=\d{3}\b)", "", expr)
+    expr = " ".join(expr.split())
+    if not expr or not EXPRESSION.match(expr):
+        return None
+    if not re.search(r"\d\W*(\*\*|[+\-*/%])\W*\d", expr):
+        return None
+    return expr
+
+
+def estimate_digits(base, exponent):
+    if base in (0, 1, -1) or exponent <= 0:
+        return 1
+    return int(exponent * math.log10(abs(base))) + 1
+
+
+def count_digits(value):
+    # str() روی اعداد بیش از ۴۳۰۰ رقم خطا می‌دهد، پس از bit_length تخمین و بعد تصحیح می‌کنیم
+    value = abs(value)
+    digits = max(1, int(value.bit_length() * math.log10(2)))
+    if value >= 10**digits:
+        digits += 1
+    return digits
+
+
+def leading_digits(base, exponent, count=SHOWN_DIGITS):
+    """ارقام اول |base|**exponent را از روی لگاریتم با دقت کافی حساب می‌کند"""
+    with decimal.localcontext() as ctx:
+        ctx.prec = count + len(str(exponent)) + 10
+        log = decimal.Decimal(abs(base)).log10() * exponent
+        fraction = log - log.to_integral_value(rounding=decimal.ROUND_FLOOR)
+        mantissa = decimal.Decimal(10) ** fraction
+        return str(mantissa.scaleb(count - 1).to_integral_value(decimal.ROUND_FLOOR))
+
+
+def _describe(sign, digits, head, last, mod, count):
+    return (
+        f"≈ {sign}{head[0]}.{head[1:]}e+{digits - 1} "
+        f"({digits:,} digits, leading {head}…, "
+        f"last {count} digits …{str(last).zfill(count)}, mod 10^{count} = {mod})"
+    )
+
+
+def compact_power(base, exponent, count=SHOWN_DIGITS):
+    """
+    base**exponent را بدون ساختن خود عدد توصیف می‌کند:
+    تعداد ارقام، ارقام اول (از لگاریتم) و ارقام آخر (با pow پیمانه‌ای).
+    """
+    negative = base < 0 and exponent % 2 == 1
+    modulus = 10**count
+    last = pow(abs(base), exponent, modulus)
+    return _describe(
+        "-" if negative else "",
+        estimate_digits(base, exponent),
+        leading_digits(base, exponent, count),
+        last,
+        (-last) % modulus if negative else last,
+        count,
+    )
+
+
+def compact_int(value, count=SHOWN_DIGITS):
+    digits = count_digits(value)
+    if digits <= COMPACT_DIGITS:
+        return str(value)
+    modulus = 10**count
+    return _describe(
+        "-" if value < 0 else "",
+        digits,
+        str(abs(value) // 10 ** (digits - count)),
+        abs(value) % modulus,
+        value % modulus,
+        count,
+    )
+
+
+def power(base, exponent):
+    """a**b برای ابزار: اندازه قبل از محاسبه تخمین زده می‌شود و جواب خیلی بزرگ فشرده برمی‌گردد"""
+    if exponent < 0:
+        return base**exponent
+    if estimate_digits(base, exponent) > COMPACT_DIGITS:
+        return compact_power(base, exponent)
+    return base**exponent
+
+
+def multiply(a, b):
+    return compact_int(a * b)
+
+
+def _eval(node):
+    if isinstance(node, ast.Expression):
+        return _eval(node.body)
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and type(node.op) in OPERATORS:
+        return OPERATORS[type(node.op)](_eval(node.operand))
+    if isinstance(node, ast.BinOp) and type(node.op) in OPERATORS:
+        left, right = _eval(node.left), _eval(node.right)
+        if isinstance(node.op, ast.Pow) and estimate_digits(left, right) > MAX_DIGITS:
+            raise TooLarge(left, right)
+        if isinstance(node.op, ast.Mult) and (
+            count_digits(int(left)) + count_digits(int(right)) > MAX_DIGITS
+        ):
+            raise TooLarge(f"{left} * {right}")
+        return OPERATORS[type(node.op)](left, right)
+    raise ValueError(f"unsupported expression: {ast.dump(node)}")
+
+
+def format_number(value, persian=False):
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e16:
+        value = int(value)
+    text = f"{value:.12g}" if isinstance(value, float) else str(value)
+    return text.translate(TO_PERSIAN) if persian else text
+
+
+def _root_power(node):
+    """(base، exponent) اگر node توان صحیحی است که عملوندهایش محاسبه می‌شوند، وگرنه None"""
+    if not (isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow)):
+        return None
+    try:
+        base, exponent = _eval(node.left), _eval(node.right)
+    except (ValueError, ArithmeticError, TypeError, RecursionError):
+        return None
+    if isinstance(base, int) and isinstance(exponent, int):
+        return base, exponent
+    return None
+
+
+def solve(text):
+    """
+    اگر پیام کاربر یک عبارت حسابی خالص باشد جواب فرمت‌شده را برمی‌گرداند،
+    در غیر این صورت (مسئله متنی، تقسیم بر صفر، عدد خیلی بزرگ، جواب مختلط یا
+    inf/nan) None.
+    """
+    expr = normalize(text)
+    if expr is None:
+        return None
+    persian = any(ch in PERSIAN_DIGITS for ch in text)
+    shown = expr.translate(TO_PERSIAN) if persian else expr
+    try:
+        tree = ast.parse(expr, mode="eval")
+        value = _eval(tree)
+    except TooLarge:
+        # فقط وقتی کل عبارت یک توان صحیح است (مثل 9**99999999) خلاصه‌اش جواب است؛
+        # توان بزرگ داخل عبارت (1 + 9**99999999، 2 ** 3 ** 1000000) به LLM می‌رود
+        root = _root_power(tree.body)
+        return f"{shown} {compact_power(*root)}" if root else None
+    except (SyntaxError, ValueError, ArithmeticError, TypeError, RecursionError):
+        return None
+    # مثل (-8)**0.5 یا 1e308*10؛ این‌ها را LLM توضیح می‌دهد
+    if isinstance(value, complex):
+        return None
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, int) and count_digits(value) > COMPACT_DIGITS:
+        return f"{shown} {compact_int(value)}"
+    return f"{shown} = {format_number(value, persian)}"
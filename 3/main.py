@@ -1,16 +1,26 @@
 import os
+import sys
+import time
 from dotenv import load_dotenv
 from typing import Annotated
 from typing_extensions import TypedDict
 
 from langchain_groq import ChatGroq
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_core.tools import tool
 
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
-from langgraph.prebuilt import ToolNode, tools_condition
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.prebuilt import tools_condition
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.cache import cache_stats, cached
+from common.checkpoint import SqliteDeltaSaver
+from common.history import manage_history, with_summary
+from common.tools import ParallelToolNode
+import fast_math
+from fast_math import solve
+from sandbox import ToolLimitExceeded, ToolSandbox
 
 
 load_dotenv()
@@ -19,16 +29,40 @@ if not os.getenv("OPENAI_API_KEY"):
     exit(1)
 
 
+# محاسبه در پروسهٔ جدا با سقف CPU/حافظه تا یک توان بزرگ کل agent را قفل نکند
+sandbox = ToolSandbox()
+
+
+def run_in_sandbox(func, *args):
+    try:
+        return sandbox.run(func, *args)
+    except ToolLimitExceeded as e:
+        return f"Error: calculation aborted ({e}). Ask for a smaller number."
+
+
+# ابزارها خالص‌اند: جواب تکراری (در همین session یا قبلی‌ها) از cache می‌آید.
+# پیام‌های خطای sandbox (مثلاً timeout) cache نمی‌شوند.
+TOOL_CACHE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "tool_cache.sqlite"
+)
+
+
+def is_result(content, artifact):
+    return not str(content).startswith("Error:")
+
+
+@cached(disk=TOOL_CACHE, max_entry_size=4096, should_cache=is_result)
 @tool
-def multiply(a: int, b: int) -> int:
-    """دو عدد را در هم ضرب می‌کند."""
-    return a * b
+def multiply(a: int, b: int) -> int | str:
+    """دو عدد را در هم ضرب می‌کند. حاصل خیلی بزرگ به صورت خلاصه (تعداد ارقام، ارقام اول و آخر) برمی‌گردد."""
+    return run_in_sandbox(fast_math.multiply, a, b)
 
 
+@cached(disk=TOOL_CACHE, max_entry_size=4096, should_cache=is_result)
 @tool
-def power(a: int, b: int) -> int:
-    """عدد a را به توان b می‌رساند."""
-    return a**b
+def power(a: int, b: int) -> int | str:
+    """عدد a را به توان b می‌رساند. حاصل خیلی بزرگ به صورت خلاصه (تعداد ارقام، ارقام اول و آخر) برمی‌گردد."""
+    return run_in_sandbox(fast_math.power, a, b)
 
 
 tools = [multiply, power]
@@ -42,44 +76,92 @@ llm = ChatGroq(
 llm_with_tools = llm.bind_tools(tools)
 
 
+KEEP_LAST_TURNS = 4
+SUMMARIZE_AFTER_TURNS = 8
+TOOL_PAYLOAD_LIMIT = 2000
+
+
 class State(TypedDict):
     messages: Annotated[list, add_messages]
+    summary: str
+
+
+fast_path_stats = {"hits": 0, "misses": 0, "seconds": 0.0}
+
+
+def fast_math_node(state: State):
+    """عبارت‌های حسابی خالص را بدون LLM و بدون ابزار همین‌جا حساب می‌کند"""
+    start = time.perf_counter()
+    answer = solve(state["messages"][-1].content)
+    elapsed = time.perf_counter() - start
+    fast_path_stats["seconds"] += elapsed
+    if answer is None:
+        fast_path_stats["misses"] += 1
+        return {}
+    fast_path_stats["hits"] += 1
+    return {
+        "messages": [
+            AIMessage(content=answer, response_metadata={"fast_path_seconds": elapsed})
+        ]
+    }
+
+
+def route_fast_math(state: State):
+    if isinstance(state["messages"][-1], AIMessage):
+        return "history"
+    return "reasoner"
 
 
 def reasoner_node(state: State):
+    messages = with_summary(state["messages"], state.get("summary", ""))
+    return {"messages": [llm_with_tools.invoke(messages)]}
 
-    return {"messages": [llm_with_tools.invoke(state["messages"])]}
 
+def history_node(state: State):
+    return manage_history(
+        state, llm, KEEP_LAST_TURNS, SUMMARIZE_AFTER_TURNS, TOOL_PAYLOAD_LIMIT
+    )
 
-tool_node = ToolNode(tools)
+
+tool_node = ParallelToolNode(tools, timeout=10)
 
 
 builder = StateGraph(State)
 
 
+builder.add_node("fast_math", fast_math_node)
 builder.add_node("reasoner", reasoner_node)
 builder.add_node("tools", tool_node)
+builder.add_node("history", history_node)
 
 
-builder.add_edge(START, "reasoner")
+builder.add_edge(START, "fast_math")
+builder.add_conditional_edges(
+    "fast_math", route_fast_math, {"reasoner": "reasoner", "history": "history"}
+)
 
 
 builder.add_conditional_edges(
     "reasoner",
     tools_condition,
+    {"tools": "tools", END: "history"},
 )
 
 
 builder.add_edge("tools", "reasoner")
+builder.add_edge("history", END)
 
 
-memory = MemorySaver()
+memory = SqliteDeltaSaver(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "checkpoints.sqlite")
+)
 graph = builder.compile(checkpointer=memory)
 
 
 def main():
     print("--- Smart Calculator Agent ---")
     config = {"configurable": {"thread_id": "1"}}
+    llm_turn_seconds = []
 
     while True:
         user_input = input("\nUser (Math Problem): ")
@@ -87,21 +169,51 @@ def main():
             break
 
         input_message = HumanMessage(content=user_input)
+        start = time.perf_counter()
+        used_llm = False
 
         for event in graph.stream({"messages": [input_message]}, config):
             for node_name, value in event.items():
+                if node_name == "history" or not value:
+                    continue
                 last_msg = value["messages"][-1]
 
-                if node_name == "reasoner":
+                if node_name == "fast_math":
+                    elapsed = last_msg.response_metadata["fast_path_seconds"]
+                    print(f"⚡ AI: {last_msg.content} ({elapsed * 1e6:.0f}µs, no LLM)")
+
+                elif node_name == "reasoner":
+                    used_llm = True
 
                     if last_msg.content:
                         print(f"🤖 AI: {last_msg.content}")
 
-                    if last_msg.tool_calls:
-                        print(f"🛠️ AI wants to call: {last_msg.tool_calls[0]['name']}")
+                    for call in last_msg.tool_calls:
+                        print(f"🛠️ AI wants to call: {call['name']}({call['args']})")
 
                 elif node_name == "tools":
-                    print(f"✅ Tool Output: {last_msg.content}")
+                    for msg in value["messages"]:
+                        elapsed = msg.response_metadata["elapsed"]
+                        print(f"✅ Tool Output [{msg.name}, {elapsed:.2f}s]: {msg.content}")
+
+        if used_llm:
+            llm_turn_seconds.append(time.perf_counter() - start)
+
+    total = fast_path_stats["hits"] + fast_path_stats["misses"]
+    if total:
+        print(
+            f"Fast path: {fast_path_stats['hits']}/{total} hits "
+            f"({fast_path_stats['hits'] / total:.0%}), "
+            f"avg check {fast_path_stats['seconds'] / total * 1e6:.0f}µs"
+        )
+    if sandbox.stats["calls"]:
+        print(f"Tool sandbox: {sandbox.stats}")
+    print(f"Tool cache: {cache_stats()}")
+    if llm_turn_seconds:
+        print(
+            f"LLM path: {len(llm_turn_seconds)} turns, "
+            f"avg {sum(llm_turn_seconds) / len(llm_turn_seconds):.2f}s"
+        )
 
 
 if __name__ == "__main__":
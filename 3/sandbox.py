@@ -0,0 +1,192 @@
+"""
+اجرای ابزارهای ماشین‌حساب در یک process pool جدا با سقف CPU و حافظه.
+
+یک محاسبهٔ فرار (مثلاً توانی که حدس اندازه‌اش اشتباه بوده) فقط پروسهٔ
+worker خودش را می‌کشد؛ پروسهٔ agent و بقیهٔ session‌ها منتظرش نمی‌مانند و
+فقط همان worker با یک پروسهٔ تازه عوض می‌شود. ProcessPoolExecutor این‌جا به کار
+نمی‌آید: مرگ یک worker کل pool و کارهای در جریان بقیه را خراب می‌کند.
+"""
+import multiprocessing
+import threading
+
+try:
+    import resource
+except ImportError:  # ویندوز: بدون سقف سیستم‌عامل، فقط timeout
+    resource = None
+
+
+WORKERS = 2
+CPU_SECONDS = 2
+MEMORY_MB = 512
+TIMEOUT = 5
+
+
+class ToolLimitExceeded(RuntimeError):
+    pass
+
+
+def _address_space():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _init_worker(memory_mb):
+    if resource is None or not memory_mb:
+        return
+    # worker با fork ساخته می‌شود و حافظهٔ مجازی والد را به ارث می‌برد،
+    # پس سقف را نسبت به اندازهٔ فعلی می‌گذاریم
+    limit = _address_space() + memory_mb * 1024 * 1024
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _limited_call(cpu_seconds, func, args):
+    if resource is not None and cpu_seconds:
+        # RLIMIT_CPU برای کل عمر پروسه است؛ سقف هر فراخوانی را روی مصرف فعلی اضافه می‌کنیم.
+        # عبور از سقف نرم SIGXCPU می‌فرستد که worker را حتی وسط یک عملیات C می‌کشد.
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = int(usage.ru_utime + usage.ru_stime) + cpu_seconds
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    try:
+        return func(*args)
+    except MemoryError:
+        raise ToolLimitExceeded("memory limit exceeded") from None
+
+
+def _serve(conn, memory_mb):
+    """حلقهٔ worker: (cpu_seconds، func، args) می‌گیرد و (ok، نتیجه یا خطا) برمی‌گرداند"""
+    _init_worker(memory_mb)
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        try:
+            reply = (True, _limited_call(*message))
+        except Exception as e:
+            reply = (False, e)
+        conn.send(reply)
+
+
+class _Worker:
+    def __init__(self, context, memory_mb):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(
+            target=_serve, args=(child, memory_mb), daemon=True
+        )
+        self.process.start()
+        child.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class ToolSandbox:
+    """
+    sandbox.run(func, *args) تابع را در یک worker با سقف CPU و حافظه و
+    زمان اجرا می‌کند. func باید در سطح ماژول تعریف شده باشد (pickle می‌شود).
+    خطای سقف‌ها به صورت ToolLimitExceeded بالا می‌آید.
+
+    هر فراخوانی یک worker را تا آخر برای خودش دارد (حداکثر workers هم‌زمان).
+    worker ـی که timeout خورد یا با SIGXCPU مرد کنار گذاشته و worker تازه‌ای
+    ساخته می‌شود؛ فراخوانی‌های بقیه روی worker‌های خودشان ادامه می‌دهند.
+    """
+
+    def __init__(
+        self,
+        workers=WORKERS,
+        cpu_seconds=CPU_SECONDS,
+        memory_mb=MEMORY_MB,
+        timeout=TIMEOUT,
+    ):
+        self.workers = workers
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.timeout = timeout
+        self.stats = {"calls": 0, "timeouts": 0, "killed": 0, "memory": 0}
+        self._context = (
+            multiprocessing.get_context("fork")
+            if "fork" in multiprocessing.get_all_start_methods()
+            else multiprocessing.get_context()
+        )
+        self._slots = threading.Semaphore(workers)
+        self._idle = []
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        self._slots.acquire()
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        try:
+            return _Worker(self._context, self.memory_mb)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, worker):
+        """worker سالم به صف برمی‌گردد؛ None یعنی worker کشته شده"""
+        with self._lock:
+            if worker is not None and not self._closed:
+                self._idle.append(worker)
+                worker = None
+        if worker is not None:
+            worker.kill()
+        self._slots.release()
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def run(self, func, *args):
+        self._count("calls")
+        worker = self._acquire()
+        try:
+            worker.conn.send((self.cpu_seconds, func, args))
+            if not worker.conn.poll(self.timeout):
+                # راهی برای لغو کار در حال اجرا نیست؛ فقط همین worker کشته می‌شود
+                self._count("timeouts")
+                worker.kill()
+                worker = None
+                raise ToolLimitExceeded(f"timed out after {self.timeout}s")
+            ok, value = worker.conn.recv()
+        except (EOFError, OSError):
+            self._count("killed")
+            worker.kill()
+            worker = None
+            raise ToolLimitExceeded(
+                f"worker killed (CPU limit {self.cpu_seconds}s or crash)"
+            ) from None
+        finally:
+            self._release(worker)
+        if not ok:
+            if isinstance(value, ToolLimitExceeded):
+                self._count("memory")
+            raise value
+        return value
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.process.join(timeout=1)
+            if worker.process.is_alive():
+                worker.kill()
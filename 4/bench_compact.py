@@ -0,0 +1,79 @@
+"""
+مقایسه‌ی حجم نتایج خام Tavily با خروجی فشرده، روی نتایج ضبط‌شده در fixtures.
+
+    python bench_compact.py --budget 300
+
+ستون kept نشان می‌دهد عبارت‌های لازم برای جواب (expect) بعد از فشرده‌سازی مانده‌اند یا نه.
+"""
+import argparse
+import json
+import os
+import time
+
+from langchain_core.messages import AIMessage, ToolMessage
+
+from search import TOKEN_BUDGET, approx_tokens, compact_search_messages
+
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def load_fixtures(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def run(fixtures, budget):
+    rows = []
+    for n, case in enumerate(fixtures):
+        call = {"name": "search", "args": {"query": case["query"]}, "id": f"call{n}"}
+        raw = ToolMessage(
+            content=json.dumps(case["results"], ensure_ascii=False),
+            name="search",
+            tool_call_id=call["id"],
+            id=f"msg{n}",
+        )
+        messages = [AIMessage(content="", tool_calls=[call]), raw]
+        start = time.perf_counter()
+        (compacted,) = compact_search_messages(messages, "search", budget)
+        elapsed = time.perf_counter() - start
+        kept = all(e.lower() in compacted.content.lower() for e in case["expect"])
+        rows.append(
+            (
+                case["query"],
+                approx_tokens(raw.content),
+                approx_tokens(compacted.content),
+                len(case["results"]),
+                len(compacted.artifact),
+                kept,
+                elapsed,
+            )
+        )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--fixtures", default=os.path.join(FIXTURES, "tavily_results.json")
+    )
+    parser.add_argument("--budget", type=int, default=TOKEN_BUDGET)
+    args = parser.parse_args()
+
+    rows = run(load_fixtures(args.fixtures), args.budget)
+    print(f"{'query':45} {'raw':>6} {'compact':>8} {'results':>8} {'kept':>5} {'ms':>6}")
+    for query, raw, compact, before, after, kept, elapsed in rows:
+        print(
+            f"{query[:45]:45} {raw:6} {compact:8} {f'{before}->{after}':>8} "
+            f"{'yes' if kept else 'NO':>5} {elapsed * 1000:6.2f}"
+        )
+    raw_total = sum(r[1] for r in rows)
+    compact_total = sum(r[2] for r in rows)
+    print(
+        f"--- {raw_total} -> {compact_total} prompt tokens per search turn "
+        f"({raw_total / compact_total:.1f}x smaller, budget {args.budget}) ---"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+شمارش دورهای reasoner → جستجو برای هر سؤال، با و بدون fan-out، روی یک جستجوی
+stub (بدون کلید Groq و Tavily).
+
+    python bench_fanout.py
+
+reasoner جعلی مثل یک مدل واقعی اول query های بازنویسی‌شده و محدود را امتحان
+می‌کند و تا وقتی جواب در نتایج نیامده دوباره جستجو می‌کند.
+"""
+import argparse
+import math
+import os
+import tempfile
+import time
+from collections import Counter
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.tools import StructuredTool
+
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+os.environ.setdefault("GROQ_API_KEY", "fake")
+os.environ.setdefault("TAVILY_API_KEY", "fake")
+import main
+from common.checkpoint import SqliteDeltaSaver
+from search import terms
+
+
+MAX_SEARCHES = 4
+
+CORPUS = [
+    ("Gustave Eiffel - biography", "Gustave Eiffel was a French civil engineer and architect whose company designed the Eiffel Tower."),
+    ("Eiffel Tower construction history", "The Eiffel Tower construction started in 1887 and the tower opened for the World's Fair in 1889."),
+    ("Eiffel Tower key figures", "How tall is the Eiffel Tower? It is 330 metres tall with its antennas and it was built between 1887 and 1889."),
+    ("Qatar 2022 stadiums", "Lusail Stadium in Qatar hosted the 2022 FIFA World Cup final with 88,966 spectators."),
+    ("World Cup 2022 final report", "Who won the World Cup 2022 final? Argentina won on penalties after a 3-3 draw with France."),
+    ("Tehran overview", "Tehran is the capital of Iran, at the foot of the Alborz mountains."),
+    ("Tehran population 2024", "The population of Tehran is about 9.5 million people in the city in 2024."),
+    ("Mount Damavand", "Mount Damavand is a dormant volcano in the Alborz range and the highest peak in Iran, 5,610 metres tall."),
+    ("Alborz range", "The Alborz range stretches along the south coast of the Caspian Sea, north of Tehran."),
+    ("Python release history", "Python 3.12 was released in October 2023 with improved error messages and faster comprehensions."),
+    ("Python 3.12 changes", "What's new in Python 3.12: PEP 695 type parameter syntax and per-interpreter GIL."),
+    ("PEP 695", "PEP 695 introduces a compact type parameter syntax for generic classes and functions."),
+    ("Typing improvements", "New typing features: type parameter syntax, the type statement and TypedDict kwargs."),
+]
+
+# سؤال، عبارتی که باید در نتایج باشد، و queryهایی که reasoner جعلی به ترتیب امتحان می‌کند
+QUESTIONS = [
+    ("When was the Eiffel Tower built and how tall is it?", "330 metres", ["Eiffel Tower architect", "Eiffel Tower construction history", "Eiffel Tower height metres"]),
+    ("Who won the World Cup 2022 final?", "Argentina", ["Lusail Stadium Qatar", "Argentina France 2022 penalties"]),
+    ("What is the population of Tehran?", "9.5 million", ["Tehran population"]),
+    ("How tall is Mount Damavand?", "5,610", ["Alborz mountains Tehran", "Damavand volcano elevation"]),
+    ("When was Python 3.12 released?", "October 2023", ["PEP 695 type parameter syntax", "Python 3.12 new typing features", "Python release history"]),
+]
+
+
+class StubSearch:
+    """جستجوی واژگانی روی CORPUS با امتیاز idf؛ دو نتیجه‌ی اول را برمی‌گرداند"""
+
+    def __init__(self, top_k=2):
+        self.top_k = top_k
+        self.calls = 0
+        self.docs = [(title, text, set(terms(title + " " + text))) for title, text in CORPUS]
+        frequency = Counter(t for _, _, words in self.docs for t in words)
+        self.idf = {t: math.log(1 + len(self.docs) / n) for t, n in frequency.items()}
+
+    def run(self, query):
+        self.calls += 1
+        query_terms = set(terms(query))
+        ranked = sorted(
+            range(len(self.docs)),
+            key=lambda i: -sum(self.idf[t] for t in query_terms & self.docs[i][2]),
+        )
+        results = [
+            {
+                "title": self.docs[i][0],
+                "url": f"https://stub.example/{i}",
+                "content": self.docs[i][1],
+            }
+            for i in ranked[: self.top_k]
+        ]
+        return results, {"results": results}
+
+    def as_tool(self, name):
+        return StructuredTool.from_function(
+            func=self.run,
+            name=name,
+            description="search the web",
+            response_format="content_and_artifact",
+        )
+
+
+class ScriptedReasoner(BaseChatModel):
+    tool_name: str = "search"
+    calls: int = 0
+
+    @property
+    def _llm_type(self):
+        return "scripted-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        start = max(i for i, m in enumerate(messages) if isinstance(m, HumanMessage))
+        question = messages[start].content
+        _, expected, queries = next(q for q in QUESTIONS if q[0] == question)
+        results = [m.content for m in messages[start:] if isinstance(m, ToolMessage)]
+        found = any(expected in r for r in results)
+        if found or len(results) >= min(MAX_SEARCHES, len(queries)):
+            message = AIMessage(content="found" if found else "gave up")
+        else:
+            query = queries[len(results)]
+            call = {"name": self.tool_name, "args": {"query": query}, "id": f"call_{time.time_ns()}"}
+            message = AIMessage(content="", tool_calls=[call])
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def run(max_variants):
+    search = StubSearch()
+    tool = search.as_tool(main.search_tool.name)
+    reasoner = ScriptedReasoner(tool_name=tool.name)
+    main.llm_with_tools = reasoner
+    main.tool_node.tools = {tool.name: tool}
+    main.tool_node.max_variants = max_variants
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        saver = SqliteDeltaSaver(os.path.join(tmp, "bench.sqlite"))
+        graph = main.builder.compile(checkpointer=saver)
+        for n, (question, _, _) in enumerate(QUESTIONS):
+            before_llm, before_search = reasoner.calls, search.calls
+            state = graph.invoke(
+                {"messages": [HumanMessage(content=question)]},
+                {"configurable": {"thread_id": f"q{n}"}},
+            )
+            rows.append(
+                (
+                    question,
+                    reasoner.calls - before_llm,
+                    search.calls - before_search,
+                    state["messages"][-1].content,
+                )
+            )
+        saver.conn.close()
+    return rows
+
+
+def cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--variants", type=int, default=main.tool_node.max_variants)
+    args = parser.parse_args()
+
+    for variants in (1, args.variants):
+        rows = run(variants)
+        print(f"--- max_variants={variants} ---")
+        for question, llm_calls, searches, answer in rows:
+            print(f"{question[:50]:50} reasoner {llm_calls}  backend {searches}  {answer}")
+        print(
+            f"avg reasoner calls {sum(r[1] for r in rows) / len(rows):.2f}, "
+            f"avg backend searches {sum(r[2] for r in rows) / len(rows):.2f}, "
+            f"answered {sum(r[3] == 'found' for r in rows)}/{len(rows)}"
+        )
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,151 @@
+"""
+سنجش حالت جستجوی حدسی با LLM و جستجوی جعلی (بدون کلید Groq و Tavily).
+
+    python bench_prefetch.py --llm-latency 0.8 --search-latency 1.0
+
+سؤال‌ها سه نوع‌اند: مدل همان سؤال را جستجو می‌کند (prefetch به کار می‌آید)،
+query کاملاً متفاوتی می‌خواهد (prefetch هدر می‌رود) یا اصلاً جستجو نمی‌کند (لغو).
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.tools import StructuredTool
+
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+os.environ.setdefault("GROQ_API_KEY", "fake")
+os.environ.setdefault("TAVILY_API_KEY", "fake")
+import main
+from common.checkpoint import SqliteDeltaSaver
+
+
+QUESTIONS = [
+    ("search", "When was the Eiffel Tower built?"),
+    ("search", "Who won the 2022 FIFA World Cup final?"),
+    ("search", "What is the population of Tehran?"),
+    ("search", "How tall is Mount Damavand?"),
+    ("other", "Is it a good idea to visit Paris in winter?"),
+    ("chat", "Thanks, that was helpful!"),
+]
+
+
+class FakeSearch:
+    """جستجوی جعلی با تأخیر؛ تعداد جستجوهای انجام‌شده و لغوشده را می‌شمارد"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.stats = {"calls": 0, "completed": 0, "cancelled": 0}
+
+    def _results(self, query):
+        self.stats["completed"] += 1
+        results = [
+            {
+                "title": f"Result {i}",
+                "url": f"https://example.com/{i}",
+                "content": f"{query} answer {i}.",
+            }
+            for i in range(3)
+        ]
+        return results, {"results": results}
+
+    def run(self, query):
+        self.stats["calls"] += 1
+        time.sleep(self.latency)
+        return self._results(query)
+
+    async def arun(self, query):
+        self.stats["calls"] += 1
+        try:
+            await asyncio.sleep(self.latency)
+        except asyncio.CancelledError:
+            self.stats["cancelled"] += 1
+            raise
+        return self._results(query)
+
+    def as_tool(self, name):
+        return StructuredTool.from_function(
+            func=self.run,
+            coroutine=self.arun,
+            name=name,
+            description="search the web",
+            response_format="content_and_artifact",
+        )
+
+
+class ScriptedLLM(BaseChatModel):
+    """تأخیر LLM را شبیه‌سازی می‌کند و بر اساس نوع سؤال تصمیم به جستجو می‌گیرد"""
+
+    latency: float = 0.8
+    tool_name: str = "search"
+
+    @property
+    def _llm_type(self):
+        return "scripted-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        last = messages[-1]
+        kind = {question: kind for kind, question in QUESTIONS}.get(last.content)
+        if isinstance(last, ToolMessage) or kind == "chat":
+            message = AIMessage(content="done")
+        else:
+            # "search": همان سؤال را جستجو می‌کند، "other": query کاملاً متفاوت
+            query = last.content.rstrip("?") if kind == "search" else "paris weather january"
+            call = {"name": self.tool_name, "args": {"query": query}, "id": f"call_{time.time_ns()}"}
+            message = AIMessage(content="", tool_calls=[call])
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def run(speculative, args):
+    search = FakeSearch(args.search_latency)
+    tool = search.as_tool(main.search_tool.name)
+    main.llm_with_tools = ScriptedLLM(latency=args.llm_latency, tool_name=tool.name)
+    # بعد از SUMMARIZE_AFTER_TURNS نوبت، history_node با main.llm خلاصه می‌سازد
+    main.llm = FakeListChatModel(responses=["Earlier: the user asked travel questions."])
+    main.tool_node.tools = {tool.name: tool}
+    main.prefetcher = main.Prefetcher(tool, enabled=speculative)
+    main.tool_node.prefetcher = main.prefetcher
+    latencies = []
+    with tempfile.TemporaryDirectory() as tmp:
+        saver = SqliteDeltaSaver(os.path.join(tmp, "bench.sqlite"))
+        graph = main.builder.compile(checkpointer=saver)
+        config = {"configurable": {"thread_id": "bench"}}
+        for _ in range(args.rounds):
+            for _, question in QUESTIONS:
+                start = time.perf_counter()
+                graph.invoke({"messages": [("user", question)]}, config)
+                latencies.append(time.perf_counter() - start)
+        saver.conn.close()
+    time.sleep(0.05)  # تا لغوهای پس‌زمینه ثبت شوند
+    return latencies, search.stats, dict(main.prefetcher.stats)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm-latency", type=float, default=0.8)
+    parser.add_argument("--search-latency", type=float, default=1.0)
+    parser.add_argument("--rounds", type=int, default=2)
+    args = parser.parse_args()
+
+    for speculative in (False, True):
+        latencies, searches, prefetch = run(speculative, args)
+        mode = "speculative" if speculative else "sequential"
+        print(f"--- {mode} ---")
+        print(f"Turns           : {len(latencies)}, avg {sum(latencies) / len(latencies):.2f}s, total {sum(latencies):.2f}s")
+        print(f"Search backend  : {searches}")
+        if speculative:
+            hit_rate = prefetch["hits"] / prefetch["started"] if prefetch["started"] else 0.0
+            print(f"Prefetch        : {prefetch} (hit rate {hit_rate:.0%})")
+
+
+if __name__ == "__main__":
+    main_cli()
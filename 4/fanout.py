@@ -0,0 +1,134 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.messages import HumanMessage, ToolMessage
+
+from common.tools import MAX_WORKERS
+from prefetch import PrefetchToolNode, similarity
+from search import canonical_url, parse_results, terms
+
+
+MAX_VARIANTS = 3
+MAX_FUSED = 6
+RRF_K = 60  # ثابت استاندارد RRF؛ اختلاف رتبه‌های بالای هر لیست را نرم می‌کند
+
+
+def expand_queries(query, question="", max_variants=MAX_VARIANTS):
+    """
+    چند شکل از یک جستجو، بدون فراخوانی LLM: query خود مدل، سؤال خام کاربر
+    (اگر مدل آن را بازنویسی کرده) و ترکیب کلمه‌های کلیدی هر دو.
+    نسخه‌هایی که تقریباً همان کلمه‌ها را دارند حذف می‌شوند.
+    """
+    combined = " ".join(dict.fromkeys(terms(query) + terms(question)))
+    candidates = [query, question, combined]
+    variants = []
+    for candidate in candidates:
+        candidate = " ".join(candidate.split())
+        if not candidate or len(variants) >= max_variants:
+            continue
+        if all(similarity(candidate, v) < 0.8 for v in variants):
+            variants.append(candidate)
+    return variants or [query]
+
+
+def reciprocal_rank_fusion(result_lists, k=RRF_K, limit=MAX_FUSED):
+    """هر نتیجه امتیاز sum(1 / (k + rank)) در لیست‌هایی که ظاهر شده می‌گیرد"""
+    fused = {}
+    for results in result_lists:
+        for rank, record in enumerate(results, 1):
+            key = canonical_url(record["url"]) or record["content"]
+            entry = fused.setdefault(key, {**record, "score": 0.0, "hits": 0})
+            entry["score"] += 1.0 / (k + rank)
+            entry["hits"] += 1
+    ranked = sorted(fused.values(), key=lambda r: -r["score"])
+    return ranked[:limit]
+
+
+class FanoutToolNode(PrefetchToolNode):
+    """
+    هر جستجوی مدل به چند query تبدیل می‌شود که هم‌زمان اجرا و با RRF ادغام می‌شوند؛
+    مدل برای هر tool call یک ToolMessage با نتایج ادغام‌شده می‌گیرد.
+    نسخه‌ی اول همان call اصلی است، پس prefetch و cache و سقف هم‌زمانی ابزار
+    برای همه‌ی نسخه‌ها مثل قبل کار می‌کند.
+    """
+
+    def __init__(
+        self,
+        tools,
+        prefetcher,
+        search_name,
+        max_variants=MAX_VARIANTS,
+        max_workers=MAX_WORKERS,
+        **kwargs,
+    ):
+        super().__init__(tools, prefetcher, max_workers=max_workers, **kwargs)
+        self.search_name = search_name
+        self.max_variants = max_variants
+        self._variant_executor = ThreadPoolExecutor(
+            max_workers * max_variants, thread_name_prefix="variant"
+        )
+
+    def tool_calls(self, input):
+        messages = input["messages"] if isinstance(input, dict) else input
+        question = next(
+            (m.content for m in reversed(messages) if isinstance(m, HumanMessage)), ""
+        )
+        return [{**call, "question": question} for call in super().tool_calls(input)]
+
+    def _variants(self, call):
+        question = call.pop("question", "")
+        if call["name"] != self.search_name or self.max_variants <= 1:
+            return [call]
+        query = call["args"].get("query", "")
+        queries = expand_queries(query, question, self.max_variants)
+        return [call] + [
+            {**call, "args": {**call["args"], "query": q}, "id": f"{call['id']}_{n}"}
+            for n, q in enumerate(queries[1:], 1)
+        ]
+
+    def _fuse(self, call, variants, outcomes):
+        # یک نسخه‌ی ناموفق بقیه را خراب نمی‌کند؛ فقط اگر همه شکست خوردند خطا برمی‌گردد
+        succeeded = [o for o in outcomes if not isinstance(o, BaseException)]
+        if not succeeded:
+            raise outcomes[0]
+        messages = [m for m, _ in succeeded if m.status != "error"]
+        if not messages:
+            return succeeded[0]
+        fused = reciprocal_rank_fusion([parse_results(m.content) for m in messages])
+        message = ToolMessage(
+            content=json.dumps(fused, ensure_ascii=False),
+            name=call["name"],
+            tool_call_id=call["id"],
+            artifact={"queries": [v["args"]["query"] for v in variants]},
+            response_metadata={
+                "prefetched": any(m.response_metadata.get("prefetched") for m in messages)
+            },
+        )
+        return message, max(elapsed for _, elapsed in succeeded)
+
+    def _run(self, call, config):
+        variants = self._variants(dict(call))
+        if len(variants) == 1:
+            return super()._run(variants[0], config)
+        futures = [
+            self._variant_executor.submit(super(FanoutToolNode, self)._run, v, config)
+            for v in variants
+        ]
+        outcomes = []
+        for future in futures:
+            try:
+                outcomes.append(future.result())
+            except Exception as e:
+                outcomes.append(e)
+        return self._fuse(variants[0], variants, outcomes)
+
+    async def _arun(self, call, config):
+        variants = self._variants(dict(call))
+        if len(variants) == 1:
+            return await super()._arun(variants[0], config)
+        outcomes = await asyncio.gather(
+            *(super(FanoutToolNode, self)._arun(v, config) for v in variants),
+            return_exceptions=True,
+        )
+        return self._fuse(variants[0], variants, outcomes)
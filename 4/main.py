@@ -1,4 +1,5 @@
 import os
+import sys
 from dotenv import load_dotenv
 from typing import Annotated
 from typing_extensions import TypedDict
@@ -6,11 +7,19 @@ from typing_extensions import TypedDict
 from langchain_groq import ChatGroq
 from langchain_community.tools.tavily_search import TavilySearchResults
 from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableConfig
 
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
-from langgraph.prebuilt import ToolNode, tools_condition
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.prebuilt import tools_condition
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.cache import cache_stats, cached
+from common.checkpoint import SqliteDeltaSaver
+from common.history import manage_history, with_summary
+from fanout import FanoutToolNode
+from prefetch import Prefetcher
+from search import TOKEN_BUDGET, approx_tokens, compact_search_messages
 
 
 load_dotenv()
@@ -23,10 +32,16 @@ if not os.getenv("TAVILY_API_KEY"):
     exit(1)
 
 
-search_tool = TavilySearchResults(max_results=2)
+# نتیجه‌ی جستجو تا یک ساعت تازه حساب می‌شود؛ جستجوی ناموفق (artifact خالی) cache نمی‌شود
+search_tool = cached(ttl=3600, should_cache=lambda content, artifact: bool(artifact))(
+    TavilySearchResults(max_results=5)
+)
 
 tools = [search_tool]
 
+# حالت حدسی (--speculative): سؤال خام کاربر هم‌زمان با اولین فراخوانی LLM جستجو می‌شود
+prefetcher = Prefetcher(search_tool, enabled=False)
+
 
 llm = ChatGroq(
     model="llama-3.3-70b-versatile", api_key=os.getenv("GROQ_API_KEY"), temperature=0.7
@@ -34,22 +49,61 @@ llm = ChatGroq(
 llm_with_tools = llm.bind_tools(tools)
 
 
-class State(TypedDict):
-    messages: Annotated[list, add_messages]
-
+KEEP_LAST_TURNS = 4
+SUMMARIZE_AFTER_TURNS = 8
+TOOL_PAYLOAD_LIMIT = 2000
 
-def reasoner_node(state: State):
 
-    return {"messages": [llm_with_tools.invoke(state["messages"])]}
+class State(TypedDict):
+    messages: Annotated[list, add_messages]
+    summary: str
+
+
+def reasoner_node(state: State, config: RunnableConfig):
+    messages = with_summary(state["messages"], state.get("summary", ""))
+    thread_id = config["configurable"].get("thread_id")
+    last = state["messages"][-1]
+    if isinstance(last, HumanMessage):
+        prefetcher.start(thread_id, last.content)
+    try:
+        response = llm_with_tools.invoke(messages)
+    except Exception:
+        prefetcher.discard(thread_id)
+        raise
+    # اگر مدل جستجوی مشابهی نخواست، جستجوی حدسی لغو می‌شود
+    prefetcher.resolve(thread_id, response.tool_calls)
+    return {"messages": [response]}
+
+
+def history_node(state: State):
+    return manage_history(
+        state, llm, KEEP_LAST_TURNS, SUMMARIZE_AFTER_TURNS, TOOL_PAYLOAD_LIMIT
+    )
+
+
+# چند جستجو در یک پیام هم‌زمان اجرا می‌شوند و هر جستجو هم با چند شکل از query
+# (ادغام با RRF)؛ در کل حداکثر ۳ درخواست هم‌زمان به Tavily
+tool_node = FanoutToolNode(
+    tools, prefetcher, search_tool.name, limits={search_tool.name: 3}, timeout=20
+)
 
 
-tool_node = ToolNode(tools)
+def compact_node(state: State):
+    """
+    نتایج خام جستجو را قبل از رسیدن به LLM تمیز می‌کند: بدون eval پارس، URL و متن
+    تکراری حذف و از هر نتیجه فقط جمله‌های مرتبط با query در سقف TOKEN_BUDGET نگه داشته می‌شود.
+    چون پیام با همان id جایگزین می‌شود، نوبت‌های بعدی هم فقط نسخه‌ی فشرده را می‌فرستند.
+    """
+    updates = compact_search_messages(state["messages"], search_tool.name, TOKEN_BUDGET)
+    return {"messages": updates} if updates else {}
 
 
 builder = StateGraph(State)
 
 builder.add_node("reasoner", reasoner_node)
 builder.add_node("tools", tool_node)
+builder.add_node("compact", compact_node)
+builder.add_node("history", history_node)
 
 
 builder.add_edge(START, "reasoner")
@@ -58,17 +112,23 @@ builder.add_edge(START, "reasoner")
 builder.add_conditional_edges(
     "reasoner",
     tools_condition,
+    {"tools": "tools", END: "history"},
 )
 
 
-builder.add_edge("tools", "reasoner")
+builder.add_edge("tools", "compact")
+builder.add_edge("compact", "reasoner")
+builder.add_edge("history", END)
 
-memory = MemorySaver()
+memory = SqliteDeltaSaver(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "checkpoints.sqlite")
+)
 graph = builder.compile(checkpointer=memory)
 
 
-def main():
+def main(speculative=False):
     print("--- Web Search Agent (Powered by Tavily) ---")
+    prefetcher.enabled = speculative
     config = {"configurable": {"thread_id": "1"}}
 
     while True:
@@ -80,21 +140,43 @@ def main():
 
         for event in graph.stream({"messages": [input_message]}, config):
             for node_name, value in event.items():
+                if node_name == "history" or not value:
+                    continue
                 last_msg = value["messages"][-1]
 
                 if node_name == "reasoner":
 
                     if last_msg.tool_calls:
-                        print(f"🌍 Searching for: {last_msg.tool_calls[0]['args']}")
+                        for call in last_msg.tool_calls:
+                            print(f"🌍 Searching for: {call['args']}")
 
                     elif last_msg.content:
                         print(f"🤖 AI: {last_msg.content}")
 
                 elif node_name == "tools":
-                    print(
-                        f"✅ Search Completed. (Found {len(eval(last_msg.content))} results)"
-                    )
+                    for msg in value["messages"]:
+                        elapsed = msg.response_metadata["elapsed"]
+                        if msg.status == "error":
+                            print(f"❌ Search Failed ({elapsed:.2f}s): {msg.content}")
+                        else:
+                            prefetched = msg.response_metadata.get("prefetched")
+                            source = " (prefetched)" if prefetched else ""
+                            print(f"✅ Search Completed in {elapsed:.2f}s{source}.")
+                            if isinstance(msg.artifact, dict) and "queries" in msg.artifact:
+                                print(f"🔀 Fused queries: {msg.artifact['queries']}")
+
+                elif node_name == "compact":
+                    for msg in value["messages"]:
+                        raw = msg.response_metadata["raw_tokens"]
+                        print(
+                            f"🗜️ Kept {len(msg.artifact)} results, "
+                            f"~{raw} -> ~{approx_tokens(msg.content)} tokens"
+                        )
+
+    print(f"Search cache: {cache_stats()}")
+    if speculative:
+        print(f"Prefetch: {prefetcher.stats} (hit rate {prefetcher.hit_rate:.0%})")
 
 
 if __name__ == "__main__":
-    main()
+    main(speculative="--speculative" in sys.argv)
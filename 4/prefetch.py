@@ -0,0 +1,148 @@
+import asyncio
+import threading
+import time
+
+from langchain_core.messages import ToolMessage
+
+from common.tools import ParallelToolNode
+from search import terms
+
+
+SIMILARITY = 0.5  # Jaccard کلمه‌های query پیش‌خوان و query مدل برای استفاده از نتیجه
+
+
+def similarity(a, b):
+    a, b = set(terms(a)), set(terms(b))
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class Prefetcher:
+    """
+    جستجوی حدسی: همزمان با اولین فراخوانی reasoner، سؤال خام کاربر جستجو می‌شود.
+
+    - start(key, query): شروع جستجو در پس‌زمینه (key معمولاً thread_id است)
+    - resolve(key, tool_calls): بعد از جواب reasoner؛ اگر مدل query مشابهی خواست
+      نتیجه به آن tool call وصل می‌شود، وگرنه جستجو لغو می‌شود
+    - take(call_id): نود ابزار نتیجه‌ی وصل‌شده را برمی‌دارد
+
+    جستجو با ainvoke روی یک event loop جدا اجرا می‌شود تا لغو واقعاً درخواست
+    شبکه را قطع کند، نه فقط نتیجه را دور بریزد.
+    شمارنده‌ها در self.stats: started، hits، wasted.
+    """
+
+    def __init__(self, tool, similarity=SIMILARITY, enabled=True):
+        self.tool = tool
+        self.similarity = similarity
+        self.enabled = enabled
+        self.stats = {"started": 0, "hits": 0, "wasted": 0}
+        self._pending = {}  # key -> (query, future)
+        self._claimed = {}  # tool_call_id -> future
+        self._lock = threading.Lock()
+        self._loop = None
+
+    def _background_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever, name="prefetch", daemon=True
+                ).start()
+            return self._loop
+
+    def start(self, key, query):
+        if not self.enabled or not query.strip():
+            return
+        call = {
+            "name": self.tool.name,
+            "args": {"query": query},
+            "id": "prefetch",
+            "type": "tool_call",
+        }
+        future = asyncio.run_coroutine_threadsafe(
+            self.tool.ainvoke(call), self._background_loop()
+        )
+        with self._lock:
+            previous = self._pending.pop(key, None)
+            self._pending[key] = (query, future)
+            self.stats["started"] += 1
+        if previous is not None:
+            self._waste(previous[1])
+
+    def _waste(self, future):
+        future.cancel()
+        with self._lock:
+            self.stats["wasted"] += 1
+
+    def resolve(self, key, tool_calls):
+        with self._lock:
+            entry = self._pending.pop(key, None)
+        if entry is None:
+            return None
+        query, future = entry
+        for call in tool_calls:
+            if call["name"] != self.tool.name:
+                continue
+            if similarity(query, call["args"].get("query", "")) >= self.similarity:
+                with self._lock:
+                    self._claimed[call["id"]] = future
+                    self.stats["hits"] += 1
+                return call["id"]
+        self._waste(future)
+        return None
+
+    def discard(self, key):
+        with self._lock:
+            entry = self._pending.pop(key, None)
+        if entry is not None:
+            self._waste(entry[1])
+
+    def take(self, call_id):
+        with self._lock:
+            return self._claimed.pop(call_id, None)
+
+    @property
+    def hit_rate(self):
+        return self.stats["hits"] / self.stats["started"] if self.stats["started"] else 0.0
+
+
+def _adopt(message, call):
+    return ToolMessage(
+        content=message.content,
+        artifact=message.artifact,
+        name=call["name"],
+        tool_call_id=call["id"],
+        status=message.status,
+        response_metadata={"prefetched": True},
+    )
+
+
+class PrefetchToolNode(ParallelToolNode):
+    """ParallelToolNode که برای callهای وصل‌شده به prefetch، منتظر همان نتیجه می‌ماند"""
+
+    def __init__(self, tools, prefetcher, **kwargs):
+        super().__init__(tools, **kwargs)
+        self.prefetcher = prefetcher
+
+    def _run(self, call, config):
+        future = self.prefetcher.take(call["id"])
+        if future is None:
+            return super()._run(call, config)
+        start = time.perf_counter()
+        try:
+            message = future.result()
+        except Exception:
+            return super()._run(call, config)
+        return _adopt(message, call), time.perf_counter() - start
+
+    async def _arun(self, call, config):
+        future = self.prefetcher.take(call["id"])
+        if future is None:
+            return await super()._arun(call, config)
+        start = time.perf_counter()
+        try:
+            message = await asyncio.wrap_future(future)
+        except Exception:
+            return await super()._arun(call, config)
+        return _adopt(message, call), time.perf_counter() - start
@@ -0,0 +1,236 @@
+import ast
+import json
+import math
+import re
+from collections import Counter
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from langchain_core.messages import AIMessage, ToolMessage
+
+
+TOKEN_BUDGET = 200  # سقف توکن نتایج یک مرحله‌ی جستجو، برای همه‌ی جستجوهای آن مرحله
+NEAR_DUPLICATE = 0.7  # چه سهمی از شینگل‌های متن کوتاه‌تر در دیگری باشد تا تکراری حساب شود
+NOVELTY = 0.3  # وزن کلمه‌ای از سؤال که جمله‌های انتخاب‌شده‌ی قبلی پوشش داده‌اند
+RELEVANCE = 0.5  # جمله‌ای که امتیازش کمتر از این کسر از بهترین جمله‌ی همان نتیجه است حذف می‌شود
+
+SENTENCE_END = re.compile(r"(?<=[.!?؟])\s+|\n+")
+WORD = re.compile(r"\w+")
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "of", "in", "on", "and", "or",
+    "to", "for", "with", "by", "at", "as", "it", "its", "what", "who", "when",
+    "where", "how", "which", "does", "did", "do", "be", "been", "from", "that",
+    "this", "there", "about",
+    "از", "به", "در", "با", "که", "را", "و", "این", "آن", "چه", "چی", "کی",
+    "است", "هست", "بود", "برای", "چند", "چقدر",
+}
+
+
+def approx_tokens(text):
+    # بدون tokenizer: حدوداً ۴ کاراکتر برای هر توکن
+    return max(1, len(text) // 4)
+
+
+def terms(text):
+    return [w for w in WORD.findall(text.lower()) if w not in STOPWORDS]
+
+
+def parse_results(content):
+    """خروجی Tavily (JSON یا repr پایتونی) را بدون eval به لیست رکورد تبدیل می‌کند"""
+    data = content
+    if isinstance(content, str):
+        try:
+            data = json.loads(content)
+        except json.JSONDecodeError:
+            try:
+                data = ast.literal_eval(content)
+            except (ValueError, SyntaxError, MemoryError, RecursionError):
+                return []
+    if isinstance(data, dict):
+        data = data.get("results", [])
+    if not isinstance(data, list):
+        return []
+    records = []
+    for item in data:
+        if not isinstance(item, dict) or not (item.get("url") or item.get("content")):
+            continue
+        records.append(
+            {
+                "title": str(item.get("title") or ""),
+                "url": clean_url(str(item.get("url") or "")),
+                "content": str(item.get("content") or item.get("raw_content") or ""),
+                "score": float(item.get("score") or 0.0),
+            }
+        )
+    return records
+
+
+def _without_tracking(query):
+    return urlencode(
+        [(k, v) for k, v in parse_qsl(query) if not k.lower().startswith("utm_")]
+    )
+
+
+def clean_url(url):
+    parts = urlsplit(url.strip())
+    return urlunsplit(parts._replace(query=_without_tracking(parts.query), fragment=""))
+
+
+def canonical_url(url):
+    """http/https، www، اسلش آخر، #fragment و پارامترهای utm_ در مقایسه نادیده گرفته می‌شوند"""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().removeprefix("www.")
+    return urlunsplit(
+        ("", host, parts.path.rstrip("/"), _without_tracking(parts.query), "")
+    )
+
+
+def shingles(text, size=3):
+    words = terms(text)
+    if len(words) < size:
+        return {tuple(words)}
+    return {tuple(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+class Deduper:
+    """یک نمونه برای هر مرحله، تا نتایج تکراریِ چند جستجوی هم‌زمان هم حذف شوند"""
+
+    def __init__(self, threshold=NEAR_DUPLICATE):
+        self.threshold = threshold
+        self.urls = set()
+        self.snippets = []
+
+    def is_new(self, record):
+        url = canonical_url(record["url"])
+        if url and url in self.urls:
+            return False
+        current = shingles(record["content"])
+        for seen in self.snippets:
+            # syndicated: متن کوتاه‌تر تقریباً کامل داخل متن دیگر است
+            overlap = len(current & seen) / max(1, min(len(current), len(seen)))
+            if overlap >= self.threshold:
+                return False
+        self.urls.add(url)
+        self.snippets.append(current)
+        return True
+
+    def filter(self, records):
+        return [r for r in records if self.is_new(r)]
+
+
+def _truncate(sentence, tokens):
+    words = sentence.split()
+    kept = []
+    for word in words:
+        if approx_tokens(" ".join(kept + [word])) > tokens:
+            break
+        kept.append(word)
+    return " ".join(kept) + ("…" if len(kept) < len(words) else "")
+
+
+def relevant_sentences(records, query, token_budget=TOKEN_BUDGET):
+    """
+    از هر نتیجه فقط جمله‌هایی که بیشترین کلمه‌ی مشترک (با وزن idf) با query
+    دارند نگه داشته می‌شوند؛ سهم هر نتیجه از بودجه برابر است و ترتیب جمله‌ها حفظ می‌شود.
+    """
+    if not records:
+        return []
+    split = [
+        [s.strip() for s in SENTENCE_END.split(r["content"]) if s.strip()]
+        for r in records
+    ]
+    all_sentences = [set(terms(s)) for sentences in split for s in sentences]
+    frequency = Counter(t for words in all_sentences for t in words)
+    idf = {t: math.log(1 + len(all_sentences) / n) for t, n in frequency.items()}
+    query_terms = set(terms(query))
+
+    # بودجه‌ای که یک نتیجه مصرف نکرد به نتیجه‌های بعدی می‌رسد
+    remaining = token_budget
+    covered = set()
+    compacted = []
+    for n, (record, sentences) in enumerate(zip(records, split)):
+        share = max(1, remaining // (len(records) - n))
+        header = f"[{n + 1}] {record['title']} ({record['url']})\n"
+        matched = [query_terms & set(terms(s)) for s in sentences]
+        for i in range(len(sentences) - 1):
+            # صفحه‌های پرسش و پاسخ: جمله‌ی سؤالی فقط سؤال ما را تکرار می‌کند و
+            # جوابش در جمله‌ی بعدی است
+            if sentences[i].endswith(("?", "؟")):
+                matched[i + 1] = matched[i + 1] | matched[i]
+                matched[i] = set()
+        chosen, left = [], set(range(len(sentences)))
+        while left:
+            # کلمه‌هایی که جمله‌های قبلی پوشش داده‌اند وزن کمتری دارند، تا جمله‌ی
+            # بعدی بخش دیگری از سؤال (مثلاً «ارتفاع» بعد از «سال ساخت») را جواب بدهد
+            scores = {
+                i: sum(idf[t] * (NOVELTY if t in covered else 1.0) for t in matched[i])
+                for i in left
+            }
+            i = min(left, key=lambda i: (-scores[i], i))
+            left.discard(i)
+            if chosen and scores[i] < RELEVANCE * best:
+                break
+            if not chosen:
+                best = scores[i]
+            text = " ".join(s for _, s in sorted(chosen + [(i, sentences[i])]))
+            if approx_tokens(header + text) <= share:
+                chosen.append((i, sentences[i]))
+                covered |= matched[i]
+            elif not chosen:
+                room = max(1, share - approx_tokens(header))
+                chosen.append((i, _truncate(sentences[i], room)))
+                covered |= matched[i]
+        text = " ".join(s for _, s in sorted(chosen))
+        remaining -= approx_tokens(header + text)
+        compacted.append({**record, "content": text})
+    return compacted
+
+
+def render(records):
+    if not records:
+        return "No results."
+    return "\n\n".join(
+        f"[{n}] {r['title']} ({r['url']})\n{r['content']}"
+        for n, r in enumerate(records, 1)
+    )
+
+
+def compact_search_messages(messages, tool_name, token_budget=TOKEN_BUDGET):
+    """
+    ToolMessageهای جستجوی آخرین مرحله را با نسخه‌ی فشرده (همان id) جایگزین می‌کند.
+    رکوردهای ساخت‌یافته در artifact می‌مانند و به LLM فرستاده نمی‌شوند.
+    """
+    step = []
+    for message in reversed(messages):
+        if isinstance(message, ToolMessage):
+            step.append(message)
+        elif isinstance(message, AIMessage):
+            calls = {c["id"]: c for c in message.tool_calls}
+            break
+    else:
+        return []
+    searches = [
+        m for m in reversed(step) if m.name == tool_name and m.status != "error"
+    ]
+    deduper = Deduper()
+    updates = []
+    for message in searches:
+        query = calls.get(message.tool_call_id, {}).get("args", {}).get("query", "")
+        if isinstance(message.artifact, dict) and message.artifact.get("queries"):
+            # نتیجه‌ی fan-out: جمله‌ها باید به هر کدام از queryها مربوط باشند
+            query = " ".join(message.artifact["queries"])
+        records = deduper.filter(parse_results(message.content))
+        records = relevant_sentences(records, query, token_budget // len(searches))
+        updates.append(
+            ToolMessage(
+                id=message.id,
+                content=render(records),
+                name=message.name,
+                tool_call_id=message.tool_call_id,
+                artifact=records,
+                response_metadata={
+                    **message.response_metadata,
+                    "raw_tokens": approx_tokens(str(message.content)),
+                },
+            )
+        )
+    return updates
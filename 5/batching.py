@@ -0,0 +1,105 @@
+import threading
+
+from langchain_core.exceptions import OutputParserException
+from pydantic import ValidationError
+
+
+MAX_EMAILS = 20
+TOKEN_BUDGET = 3000  # سقف توکن متن ایمیل‌های یک درخواست، بدون دستور و schema
+MAX_ROUNDS = 3  # درخواست اول + دو بار پرسیدن دوباره‌ی idهای جاافتاده
+
+PROMPT = (
+    "این ایمیل‌ها را دسته‌بندی کن. برای هر ایمیل، شماره‌ی داخل [email N] را به عنوان id "
+    "و یکی از برچسب‌های spam، work یا personal را برگردان. هیچ ایمیلی را جا نینداز.\n\n"
+)
+
+
+def approx_tokens(text):
+    # بدون tokenizer: حدوداً ۴ کاراکتر برای هر توکن
+    return max(1, len(text) // 4)
+
+
+def render(emails):
+    blocks = [
+        f"[email {n}]\n{item['email_content']}" for n, item in enumerate(emails, 1)
+    ]
+    return PROMPT + "\n\n".join(blocks)
+
+
+def _key(value):
+    # مدل گاهی id را به شکل "email 3" یا "[3]" برمی‌گرداند
+    return str(value).lower().strip(" []#").removeprefix("email").strip()
+
+
+class BatchClassifier:
+    """
+    چند ایمیل کوتاه را در یک درخواست structured output دسته‌بندی می‌کند؛ دستور و
+    schema یک بار برای همه فرستاده می‌شود. اگر مدل برچسب بعضی ایمیل‌ها را جا انداخت
+    فقط همان‌ها دوباره پرسیده می‌شوند.
+    شمارنده‌ها در self.stats: calls، emails، reasked، missing.
+    """
+
+    def __init__(
+        self,
+        structured_llm,
+        max_emails=MAX_EMAILS,
+        token_budget=TOKEN_BUDGET,
+        max_rounds=MAX_ROUNDS,
+    ):
+        self.structured_llm = structured_llm
+        self.max_emails = max_emails
+        self.token_budget = token_budget
+        self.max_rounds = max_rounds
+        self.stats = {"calls": 0, "emails": 0, "reasked": 0, "missing": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def pack(self, emails):
+        """ایمیل‌ها را در دسته‌هایی با حداکثر max_emails ایمیل و token_budget توکن می‌چیند"""
+        batch, tokens = [], 0
+        for item in emails:
+            size = approx_tokens(item["email_content"])
+            if batch and (
+                len(batch) >= self.max_emails or tokens + size > self.token_budget
+            ):
+                yield batch
+                batch, tokens = [], 0
+            batch.append(item)
+            tokens += size
+        if batch:
+            yield batch
+
+    def classify(self, emails):
+        """
+        {id ایمیل: برچسب}؛ ایمیل‌هایی که بعد از max_rounds هنوز برچسب ندارند در
+        خروجی نیستند و فراخواننده باید تکی دسته‌بندی‌شان کند.
+        """
+        labels = {}
+        missing = list(emails)
+        self._count("emails", len(missing))
+        for attempt in range(self.max_rounds):
+            if not missing:
+                break
+            if attempt:
+                self._count("reasked", len(missing))
+            self._count("calls")
+            try:
+                result = self.structured_llm.invoke(render(missing))
+            except (OutputParserException, ValidationError):
+                continue
+            returned = {}
+            for entry in result.emails:
+                returned.setdefault(_key(entry.id), entry.label)
+            still_missing = []
+            for n, item in enumerate(missing, 1):
+                label = returned.get(str(n))
+                if label is None:
+                    still_missing.append(item)
+                else:
+                    labels[item["id"]] = label
+            missing = still_missing
+        self._count("missing", len(missing))
+        return labels
@@ -0,0 +1,62 @@
+"""
+مقایسه‌ی دسته‌بندی تکی و دسته‌ای (چند ایمیل در یک درخواست) با LLM جعلی.
+
+    python bench_batch.py --emails 1000 --batch-size 20 --drop 0.05
+
+توکن ورودی هر درخواست = متن پرامپت + schema ابزار structured output؛ با --drop
+مدل جعلی برچسب بعضی ایمیل‌ها را جا می‌اندازد تا پرسیدن دوباره هم سنجیده شود.
+"""
+import argparse
+import os
+import tempfile
+
+from bench_bulk import use_fake_llm, write_mbox
+import main
+from bulk import iter_emails, run_bulk
+
+
+def run(mbox, concurrency, batcher):
+    with open(os.devnull, "w") as null:
+        return run_bulk(
+            main.graph, iter_emails(mbox), null, concurrency=concurrency, batcher=batcher
+        )
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Batched classification benchmark")
+    parser.add_argument("--emails", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake LLM seconds")
+    parser.add_argument(
+        "--drop", type=float, default=0.05, help="chance a label is missing"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        mbox = os.path.join(tmp, "inbox.mbox")
+        write_mbox(mbox, args.emails)
+
+        single, batch = use_fake_llm(args.latency, args.drop)
+        stats = run(mbox, args.concurrency, None)
+        print(
+            f"single:  {single.calls} requests, ~{single.tokens} input tokens, "
+            f"{stats['seconds']:.2f}s, {stats['failed']} failed"
+        )
+
+        single, batch = use_fake_llm(args.latency, args.drop)
+        batcher = main.batch_classifier
+        batcher.max_emails = args.batch_size
+        batcher.stats = dict.fromkeys(batcher.stats, 0)
+        stats = run(mbox, args.concurrency, batcher)
+        calls = single.calls + batch.calls
+        print(
+            f"batched: {calls} requests ({batch.calls} batch + {single.calls} single "
+            f"fallback), ~{single.tokens + batch.tokens} input tokens, "
+            f"{stats['seconds']:.2f}s, {stats['failed']} failed"
+        )
+        print(f"batch stats: {batcher.stats}")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,214 @@
+"""
+سنجش دسته‌بندی انبوه با LLM جعلی (بدون کلید Groq).
+
+    python bench_bulk.py --emails 5000 --concurrency 16 --latency 0.05
+
+یک صندوق mbox مصنوعی ساخته می‌شود، اجرای اول وسط کار قطع می‌شود (شبیه crash)
+و اجرای دوم از همان خروجی ادامه می‌دهد؛ در پایان بررسی می‌شود که هر ایمیل دقیقاً
+یک نتیجه‌ی موفق دارد.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from email.message import EmailMessage
+from typing import Any
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+os.environ.setdefault("GROQ_API_KEY", "fake")
+import main
+from batching import approx_tokens
+from bulk import iter_emails, load_done, run_bulk
+from common.structured import StructuredOutput
+from near_duplicates import NearDuplicateIndex
+from preclassifier import PreClassifier
+
+
+SAMPLES = {
+    "spam": [
+        ("Deals <promo@shop.example>", "50% OFF everything", "Limited offer, buy now and win a free prize!"),
+        ("Lottery <win@lucky.example>", "You are a winner", "Claim your prize today, click the link."),
+    ],
+    "work": [
+        ("Sara <sara@company.example>", "Sprint meeting", "The meeting moved to 3pm, please review the report before the deadline."),
+        ("Ops <ops@company.example>", "Deploy tonight", "Project deploy is scheduled; the manager asked for the final report."),
+    ],
+    "personal": [
+        ("Mom <mom@family.example>", "Dinner on Friday", "Are you coming for dinner? Your brother misses you."),
+        ("Ali <ali@friends.example>", "Birthday party", "Birthday party at my place this weekend, bring your friends!"),
+    ],
+}
+KEYWORDS = {
+    "spam": ("offer", "prize", "winner", "off", "buy"),
+    "work": ("meeting", "report", "deadline", "project", "manager"),
+}
+WORD = re.compile(r"\w+")
+BLOCK = re.compile(r"\[email (\d+)\]\n(.*?)(?=\n\n\[email \d+\]\n|\Z)", re.DOTALL)
+
+
+class FakeClassifier(BaseChatModel):
+    """
+    مدل جعلی برای structured output: با کلمه‌های کلیدی برچسب می‌زند، تأخیر شبکه را
+    شبیه‌سازی می‌کند و درخواست‌ها و توکن‌های ورودی (متن + schema ابزار) را می‌شمارد.
+    پرامپت‌های دسته‌ای ([email N]) را هم جواب می‌دهد و با احتمال drop بعضی را جا می‌اندازد.
+    """
+
+    latency: float = 0.05
+    drop: float = 0.0
+    answers: dict = {}  # متن ایمیل -> برچسب درست (مثلاً از fixture)؛ بقیه با کلمه‌ی کلیدی
+    calls: int = 0
+    tokens: int = 0
+    schema_tokens: int = 0
+    lock: Any = None
+    rng: Any = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.lock = threading.Lock()
+        self.rng = random.Random(0)
+
+    @property
+    def _llm_type(self):
+        return "fake-classifier"
+
+    def bind_tools(self, tools, **kwargs):
+        schema = json.dumps(convert_to_openai_tool(tools[0]), ensure_ascii=False)
+        self.schema_tokens = approx_tokens(schema)
+        return self
+
+    def label(self, text):
+        for body, label in self.answers.items():
+            if body in text:
+                return label
+        words = set(WORD.findall(text.lower()))
+        for label, keywords in KEYWORDS.items():
+            if words & set(keywords):
+                return label
+        return "personal"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        text = messages[-1].content
+        blocks = BLOCK.findall(text)
+        with self.lock:
+            self.calls += 1
+            self.tokens += approx_tokens(text) + self.schema_tokens
+            kept = [b for b in blocks if self.rng.random() >= self.drop]
+        time.sleep(self.latency)
+        if blocks:
+            name = "BatchCategory"
+            args = {"emails": [{"id": n, "label": self.label(body)} for n, body in kept]}
+        else:
+            name, args = "Category", {"label": self.label(text)}
+        call = {"name": name, "args": args, "id": f"call_{self.calls}"}
+        message = AIMessage(content="", tool_calls=[call])
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def use_fake_llm(latency, drop=0.0, answers=None, local=None, clusters=None):
+    """
+    مدل‌های 5/main.py (تکی و دسته‌ای) را با مدل جعلی عوض می‌کند. مدل محلی و خوشه‌بندی
+    هم با local و clusters جایگزین می‌شوند (پیش‌فرض: خاموش، تا فقط LLM سنجیده شود).
+    پیام نودهای spam/work/personal هم خاموش می‌شود.
+    """
+    main.QUIET = True
+    single = FakeClassifier(latency=latency, answers=answers or {})
+    batch = FakeClassifier(latency=latency, drop=drop, answers=answers or {})
+    main.classifier_llm = StructuredOutput(single, main.Category)
+    main.batch_classifier.structured_llm = StructuredOutput(batch, main.BatchCategory)
+    main.preclassifier = local or PreClassifier(warmup=float("inf"))
+    main.near_duplicates = clusters or NearDuplicateIndex(enabled=False)
+    return single, batch
+
+
+def write_mbox(path, count, seed=0):
+    rng = random.Random(seed)
+    labels = {}
+    with open(path, "wb") as f:
+        for n in range(count):
+            label = rng.choice(list(SAMPLES))
+            sender, subject, body = rng.choice(SAMPLES[label])
+            message = EmailMessage()
+            message["From"] = sender
+            message["Subject"] = subject
+            message["Message-ID"] = f"<{n}@bench.example>"
+            message.set_content(f"{body}\n\n#{n}")
+            f.write(b"From bench@example Thu Jan  1 00:00:00 2026\n")
+            f.write(message.as_bytes() + b"\n")
+            labels[f"<{n}@bench.example>"] = label
+    return labels
+
+
+class Crash(Exception):
+    pass
+
+
+def crash_after(emails, count):
+    for n, item in enumerate(emails):
+        if n == count:
+            raise Crash()
+        yield item
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Bulk classification benchmark")
+    parser.add_argument("--emails", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake LLM seconds")
+    args = parser.parse_args()
+
+    fake, _ = use_fake_llm(args.latency)
+    with tempfile.TemporaryDirectory() as tmp:
+        mbox = os.path.join(tmp, "inbox.mbox")
+        output = os.path.join(tmp, "triage.jsonl")
+        labels = write_mbox(mbox, args.emails)
+
+        with open(output, "a", encoding="utf-8") as out:
+            try:
+                run_bulk(
+                    main.graph,
+                    crash_after(iter_emails(mbox), args.emails // 2),
+                    out,
+                    concurrency=args.concurrency,
+                )
+            except Crash:
+                pass
+            # نصف یک رکورد، مثل قطع شدن برنامه وسط نوشتن
+            out.write('{"id": "<broken')
+        first_calls = fake.calls
+
+        done = load_done(output)
+        with open(output, "a", encoding="utf-8") as out:
+            stats = run_bulk(main.graph, iter_emails(mbox), out, done, args.concurrency)
+
+        with open(output, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+
+    ok = [r for r in records if "error" not in r]
+    ids = [r["id"] for r in ok]
+    correct = sum(r["category"] == labels[r["id"]] for r in ok)
+    rate = stats["classified"] / max(stats["seconds"], 1e-9)
+    print(f"emails: {args.emails}, concurrency: {args.concurrency}, latency: {args.latency}s")
+    print(f"first run (crashed): {first_calls} LLM calls, {len(done)} results kept")
+    print(
+        f"resumed run: {stats['classified']} classified, {stats['skipped']} skipped, "
+        f"{stats['failed']} failed in {stats['seconds']:.2f}s ({rate:.1f} emails/s)"
+    )
+    print(
+        f"check: {len(set(ids))}/{args.emails} unique ids, "
+        f"{len(ids) - len(set(ids))} duplicates, {correct}/{len(ok)} labels correct"
+    )
+    if args.latency:
+        print(f"ideal (latency-bound): {args.concurrency / args.latency:.1f} emails/s")
+
+
+if __name__ == "__main__":
+    main_bench()
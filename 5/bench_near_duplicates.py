@@ -0,0 +1,91 @@
+"""
+سنجش خوشه‌بندی ایمیل‌های تقریباً یکسان روی یک صندوق پر از کمپین، با LLM جعلی.
+
+    python bench_near_duplicates.py --campaign-emails 2000 --similarity 0.75
+
+هر کمپین یکی از ایمیل‌های fixtures/emails.jsonl است که با نام گیرنده، شماره‌ی
+سفارش و امضای متفاوت تکرار شده؛ خود ایمیل‌های fixture هم به صندوق اضافه می‌شوند.
+اجرای سوم با همان فایل index (مثل اجرای بعدی برنامه) روی ایمیل‌های جدید همان کمپین‌هاست.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import tempfile
+
+from bench_bulk import use_fake_llm
+from bench_preclassifier import content, load_fixture
+import main
+from bulk import run_bulk
+from near_duplicates import NearDuplicateIndex
+
+
+NAMES = ["Sara", "Ali", "Reza", "Maryam", "John", "Emma", "Niloofar", "David", "Leila"]
+SIGNATURES = ["", "Best,\nThe team", "Sent from my iPhone", "-- \nUnsubscribe"]
+
+
+def campaign_inbox(seeds, count, rng):
+    emails = []
+    for n in range(count):
+        seed = rng.choice(seeds)
+        body = (
+            f"Hi {rng.choice(NAMES)},\n\n{seed['body']}\n\n"
+            f"Reference #{rng.randrange(10**6)}. {rng.choice(SIGNATURES)}"
+        )
+        emails.append({**seed, "id": f"campaign-{n}", "body": body, "seed": seed["body"]})
+    return emails
+
+
+def run(emails, clusters, concurrency, latency):
+    answers = {e.get("seed", e["body"]): e["label"] for e in emails}
+    single, _ = use_fake_llm(latency, answers=answers, clusters=clusters)
+    items = [{"id": e["id"], "email_content": content(e)} for e in emails]
+    out = io.StringIO()
+    stats = run_bulk(main.graph, items, out, concurrency=concurrency)
+    labels = {e["id"]: e["label"] for e in emails}
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    wrong = sum(r["category"] != labels[r["id"]] for r in records if "error" not in r)
+    print(
+        f"  {len(emails)} emails: {single.calls} LLM calls "
+        f"({single.calls / len(emails):.1%}), {wrong} wrong labels, "
+        f"{stats['failed']} failed, {stats['seconds']:.2f}s"
+    )
+    if clusters.enabled:
+        print(f"  index: {clusters.stats}, {clusters.summary()}")
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Near-duplicate clustering benchmark")
+    parser.add_argument("--campaigns", type=int, default=30)
+    parser.add_argument("--campaign-emails", type=int, default=2000)
+    parser.add_argument("--similarity", type=float, default=0.75)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.02, help="fake LLM seconds")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    fixture = load_fixture()
+    seeds = rng.sample(fixture, args.campaigns)
+    inbox = campaign_inbox(seeds, args.campaign_emails, rng) + fixture
+    rng.shuffle(inbox)
+
+    print("without clustering:")
+    run(inbox, NearDuplicateIndex(enabled=False), args.concurrency, args.latency)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "near_duplicates.sqlite")
+        print(f"with clustering (similarity >= {args.similarity}):")
+        clusters = NearDuplicateIndex(path, threshold=args.similarity)
+        run(inbox, clusters, args.concurrency, args.latency)
+        clusters.conn.close()
+
+        print("next run, reloaded index, new emails from the same campaigns:")
+        clusters = NearDuplicateIndex(path, threshold=args.similarity)
+        later = campaign_inbox(seeds, args.campaign_emails // 2, random.Random(1))
+        run(later, clusters, args.concurrency, args.latency)
+        clusters.conn.close()
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,76 @@
+"""
+سنجش مدل محلی جلوی LLM روی ایمیل‌های برچسب‌دار fixtures/emails.jsonl.
+
+    python bench_preclassifier.py --confidence 0.99 --warmup 50
+
+LLM جعلی برچسب fixture را برمی‌گرداند (یعنی همان جوابی که LLM واقعی می‌داد).
+دو سوم ایمیل‌ها با مدل خالی و یادگیری هم‌زمان دسته‌بندی می‌شوند؛ بعد مدل ذخیره و
+دوباره بارگذاری می‌شود و یک سوم باقی‌مانده (که مدل ندیده) با آن دسته‌بندی می‌شود.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+
+from bench_bulk import use_fake_llm
+import main
+from preclassifier import PreClassifier
+
+
+FIXTURE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "fixtures", "emails.jsonl"
+)
+
+
+def load_fixture():
+    with open(FIXTURE, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def content(item):
+    return f"From: {item['from']}\nSubject: {item['subject']}\n\n{item['body']}"
+
+
+def run_pass(emails, local):
+    answers = {e["body"]: e["label"] for e in emails}
+    single, _ = use_fake_llm(0, answers=answers, local=local)
+    decided = agreed = 0
+    for item in emails:
+        result = main.graph.invoke({"email_content": content(item)})
+        if result["classified_by"] == "local":
+            decided += 1
+            agreed += result["category"] == item["label"]
+    asked = single.calls
+    print(
+        f"  LLM calls: {asked}/{len(emails)} ({asked / len(emails):.0%}), "
+        f"local decisions: {decided}, agreement with LLM: "
+        f"{agreed}/{decided} ({agreed / max(decided, 1):.1%})"
+    )
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Local pre-classifier benchmark")
+    parser.add_argument("--confidence", type=float, default=0.99)
+    parser.add_argument("--warmup", type=int, default=50)
+    args = parser.parse_args()
+
+    emails = load_fixture()
+    random.Random(0).shuffle(emails)
+    split = len(emails) * 2 // 3
+    stream, held_out = emails[:split], emails[split:]
+    local = PreClassifier(confidence=args.confidence, warmup=args.warmup)
+    print(f"online learning from an empty model ({len(stream)} emails):")
+    run_pass(stream, local)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "preclassifier.json")
+        local.save(path)
+        size = os.path.getsize(path)
+        local = PreClassifier.load(path, confidence=args.confidence, warmup=args.warmup)
+    print(f"reloaded model ({size / 1024:.0f} KB on disk), {len(held_out)} unseen emails:")
+    run_pass(held_out, local)
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,387 @@
+"""
+دسته‌بندی انبوه ایمیل‌ها از mbox، Maildir یا JSONL.
+
+    python bulk.py inbox.mbox -o triage.jsonl --concurrency 16
+    python bulk.py ~/Maildir -o triage.jsonl
+    python bulk.py emails.jsonl -o triage.jsonl --batch-size 20
+
+ایمیل‌ها یکی‌یکی از فایل خوانده می‌شوند (کل صندوق در حافظه بارگذاری نمی‌شود) و هر
+نتیجه به محض آماده شدن به خروجی اضافه می‌شود. خروجی همان checkpoint است: اگر
+اجرا وسط کار قطع شد، با همان دستور ادامه می‌دهد و ایمیل‌های انجام‌شده را رد می‌کند
+(ایمیل‌هایی که با خطا تمام شده بودند دوباره امتحان می‌شوند).
+با --batch-size چند ایمیل کوتاه در یک درخواست LLM دسته‌بندی می‌شوند.
+
+ورودی JSONL: هر خط {"id": ..., "subject": ..., "from": ..., "body": ...}
+یا {"id": ..., "email_content": ...}.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email import policy
+from email.header import decode_header, make_header
+from email.parser import BytesParser
+
+from batching import TOKEN_BUDGET
+from near_duplicates import THRESHOLD as NEAR_DUPLICATE
+
+
+MAX_CHARS = 4000  # متن خیلی بلند ایمیل فقط هزینه‌ی توکن دارد، نه دقت بیشتر
+TAG = re.compile(r"<[^>]+>")
+
+
+def _header(message, name):
+    value = message.get(name)
+    if value is None:
+        return ""
+    try:
+        return str(make_header(decode_header(value)))
+    except (LookupError, UnicodeError, ValueError):
+        return str(value)
+
+
+def _body(message):
+    html = None
+    for part in message.walk():
+        kind = part.get_content_type()
+        if kind not in ("text/plain", "text/html") or part.get_filename():
+            continue
+        payload = part.get_payload(decode=True) or b""
+        charset = part.get_content_charset() or "utf-8"
+        try:
+            text = payload.decode(charset, "replace")
+        except LookupError:
+            text = payload.decode("utf-8", "replace")
+        if kind == "text/plain":
+            return text
+        if html is None:
+            html = TAG.sub(" ", text)
+    return html or ""
+
+
+def email_text(message):
+    """سرایندهای مهم + متن ساده‌ی ایمیل، کوتاه‌شده تا MAX_CHARS"""
+    body = " ".join(_body(message).split())
+    header = f"From: {_header(message, 'from')}\nSubject: {_header(message, 'subject')}"
+    return f"{header}\n\n{body}"[:MAX_CHARS]
+
+
+def _record(message, fallback_id):
+    return {
+        "id": _header(message, "message-id").strip() or fallback_id,
+        "email_content": email_text(message),
+    }
+
+
+def iter_mbox(path):
+    # policy پیش‌فرض ماژول email حدود ده برابر کندتر پارس می‌کند و برای صندوق‌های
+    # صدها هزارتایی خودش گلوگاه می‌شود؛ اینجا compat32 و decode دستی کافی است
+    parser = BytesParser(policy=policy.compat32)
+    with open(path, "rb") as f:
+        lines, n = [], 0
+        for line in f:
+            # خط "From " جداکننده‌ی پیام‌هاست (داخل متن به ">From " تبدیل شده)
+            if line.startswith(b"From "):
+                if lines:
+                    yield _record(parser.parsebytes(b"".join(lines)), f"mbox:{n}")
+                    n += 1
+                lines = []
+                continue
+            lines.append(line)
+        if lines:
+            yield _record(parser.parsebytes(b"".join(lines)), f"mbox:{n}")
+
+
+def iter_maildir(path):
+    parser = BytesParser(policy=policy.compat32)
+    for sub in ("cur", "new"):
+        folder = os.path.join(path, sub)
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            with open(os.path.join(folder, name), "rb") as f:
+                message = parser.parse(f)
+            yield _record(message, f"maildir:{name.split(':')[0]}")
+
+
+def iter_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            content = item.get("email_content")
+            if content is None:
+                content = (
+                    f"From: {item.get('from', '')}\nSubject: {item.get('subject', '')}"
+                    f"\n\n{item.get('body', '')}"
+                )
+            yield {
+                "id": str(item.get("id", f"jsonl:{n}")),
+                "email_content": content[:MAX_CHARS],
+            }
+
+
+def iter_emails(path, fmt=None):
+    if fmt is None:
+        if os.path.isdir(path):
+            fmt = "maildir"
+        elif path.lower().endswith((".jsonl", ".json")):
+            fmt = "jsonl"
+        else:
+            fmt = "mbox"
+    return {"mbox": iter_mbox, "maildir": iter_maildir, "jsonl": iter_jsonl}[fmt](path)
+
+
+def load_done(out_path):
+    """
+    id ایمیل‌هایی که قبلاً بدون خطا نوشته شده‌اند.
+    خط ناقص آخر (crash وسط نوشتن) از فایل حذف می‌شود تا نوشتن بعدی خراب نشود.
+    """
+    done = set()
+    if not os.path.exists(out_path):
+        return done
+    with open(out_path, "rb+") as f:
+        valid_end = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            valid_end += len(line)
+            if "error" not in record:
+                done.add(record["id"])
+        f.truncate(valid_end)
+    return done
+
+
+def classify(graph, chunk, batcher=None, local=None, clusters=None):
+    """
+    یک دسته ایمیل را از گراف رد می‌کند. با batcher برچسب همه در یک درخواست گرفته
+    می‌شود و گراف فقط مسیریابی می‌کند؛ ایمیلی که مدل جا انداخت تکی دسته‌بندی می‌شود.
+    clusters (NearDuplicateIndex) و local (PreClassifier) ایمیل‌های تکراری و واضح را
+    قبل از درخواست دسته‌ای کنار می‌گذارند و از برچسب‌های دسته‌ای یاد می‌گیرند؛ بدون
+    batcher همین کار داخل گراف انجام می‌شود.
+    """
+    labels = {}
+    if batcher:
+        uncertain = []
+        for item in chunk:
+            text = item["email_content"]
+            # بدون انتظار: نماینده‌ی خوشه ممکن است در همین دسته باشد
+            label = clusters.find(text, wait=False) if clusters else None
+            if label is not None:
+                labels[item["id"]] = (label, "cluster")
+                continue
+            guess = local.predict(text) if local else None
+            if guess is None:
+                uncertain.append(item)
+            else:
+                labels[item["id"]] = (guess[0], "local")
+                if clusters:
+                    clusters.release(text)
+        if uncertain:
+            try:
+                answered = batcher.classify(uncertain)
+            except Exception:
+                if clusters:
+                    for item in uncertain:
+                        clusters.release(item["email_content"])
+                raise
+            for item_id, label in answered.items():
+                labels[item_id] = (label, "llm")
+        for item in uncertain:
+            text = item["email_content"]
+            if item["id"] not in labels:
+                # تکی از گراف رد می‌شود و آنجا دوباره نماینده می‌شود
+                if clusters:
+                    clusters.release(text)
+                continue
+            if local:
+                local.learn(text, labels[item["id"]][0])
+            if clusters:
+                clusters.add(text, labels[item["id"]][0])
+    records = []
+    for item in chunk:
+        state = {"email_content": item["email_content"]}
+        if item["id"] in labels:
+            state["category"], state["classified_by"] = labels[item["id"]]
+        try:
+            result = graph.invoke(state)
+        except Exception as e:
+            records.append(_error(item, e))
+            continue
+        records.append(
+            {
+                "id": item["id"],
+                "category": result["category"],
+                "classified_by": result["classified_by"],
+                "action_log": result["action_log"],
+            }
+        )
+    return records
+
+
+def _error(item, error):
+    return {"id": item["id"], "error": f"{type(error).__name__}: {error}"}
+
+
+def run_bulk(
+    graph,
+    emails,
+    out,
+    done=frozenset(),
+    concurrency=8,
+    progress=None,
+    batcher=None,
+    local=None,
+    clusters=None,
+):
+    """
+    emails را با حداکثر concurrency درخواست هم‌زمان دسته‌بندی می‌کند و هر نتیجه را
+    بلافاصله در out می‌نویسد. بیش از 2×concurrency درخواست هم‌زمان در حافظه نیست.
+    با batcher (BatchClassifier) هر درخواست یک دسته ایمیل است.
+    """
+    stats = {"classified": 0, "failed": 0, "skipped": 0}
+    start = time.perf_counter()
+    pending = set()
+    futures = {}
+
+    def write(future):
+        chunk = futures.pop(future)
+        try:
+            records = future.result()
+        except Exception as e:
+            records = [_error(item, e) for item in chunk]
+        for record in records:
+            stats["failed" if "error" in record else "classified"] += 1
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if progress:
+                progress(stats, time.perf_counter() - start)
+        out.flush()
+
+    def todo():
+        for item in emails:
+            if item["id"] in done:
+                stats["skipped"] += 1
+            else:
+                yield item
+
+    chunks = batcher.pack(todo()) if batcher else ([item] for item in todo())
+    with ThreadPoolExecutor(concurrency) as executor:
+        for chunk in chunks:
+            if len(pending) >= 2 * concurrency:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    write(future)
+            future = executor.submit(classify, graph, chunk, batcher, local, clusters)
+            futures[future] = chunk
+            pending.add(future)
+        for future in wait(pending).done:
+            write(future)
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def report(stats, elapsed):
+    done = stats["classified"] + stats["failed"]
+    if done % 100 == 0:
+        print(
+            f"\r{done} emails, {done / max(elapsed, 1e-9):.1f}/s",
+            end="",
+            file=sys.stderr,
+            flush=True,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk email triage")
+    parser.add_argument("input", help="mbox file, Maildir directory or .jsonl")
+    parser.add_argument(
+        "-o", "--output", required=True, help="JSONL results (also the resume checkpoint)"
+    )
+    parser.add_argument("--format", choices=["mbox", "maildir", "jsonl"])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--batch-size", type=int, default=1, help="emails per LLM request (1 = off)"
+    )
+    parser.add_argument(
+        "--batch-tokens", type=int, default=TOKEN_BUDGET, help="email tokens per request"
+    )
+    parser.add_argument(
+        "--no-local", action="store_true", help="skip the local pre-classifier"
+    )
+    parser.add_argument(
+        "--similarity",
+        type=float,
+        default=NEAR_DUPLICATE,
+        help="near-duplicate threshold (estimated Jaccard, 0-1)",
+    )
+    parser.add_argument(
+        "--no-clusters", action="store_true", help="skip near-duplicate clustering"
+    )
+    args = parser.parse_args()
+
+    import main as classifier
+
+    graph = classifier.graph
+    batch_classifier = classifier.batch_classifier
+    classifier_llm = classifier.classifier_llm
+    local = classifier.preclassifier
+    if args.no_local:
+        local.warmup = float("inf")  # هیچ تصمیمی محلی نیست، ولی یادگیری ادامه دارد
+    clusters = classifier.near_duplicates
+    clusters.threshold = args.similarity
+    clusters.enabled = not args.no_clusters
+
+    batcher = None
+    if args.batch_size > 1:
+        batcher = batch_classifier
+        batcher.max_emails = args.batch_size
+        batcher.token_budget = args.batch_tokens
+
+    # پیام‌های نودهای spam/work/personal برای هر ایمیل چاپ نمی‌شوند
+    classifier.QUIET = True
+    done = load_done(args.output)
+    with open(args.output, "a", encoding="utf-8") as out:
+        try:
+            stats = run_bulk(
+                graph,
+                iter_emails(args.input, args.format),
+                out,
+                done,
+                args.concurrency,
+                progress=report,
+                batcher=batcher,
+                local=local,
+                clusters=clusters,
+            )
+        finally:
+            local.save(classifier.PRECLASSIFIER_PATH)
+    total = stats["classified"] + stats["failed"]
+    print(
+        f"\n--- {stats['classified']} classified, {stats['failed']} failed, "
+        f"{stats['skipped']} already done, in {stats['seconds']:.1f}s "
+        f"({total / max(stats['seconds'], 1e-9):.1f} emails/s) ---",
+        file=sys.stderr,
+    )
+    print(f"structured output stats: {classifier_llm.stats}", file=sys.stderr)
+    if batcher:
+        print(f"batch stats: {batcher.stats}", file=sys.stderr)
+    print(
+        f"pre-classifier: {local.stats} (LLM call rate {local.llm_rate:.0%})",
+        file=sys.stderr,
+    )
+    print(
+        f"near-duplicates: {clusters.stats}, {clusters.summary()}", file=sys.stderr
+    )
+
+
+if __name__ == "__main__":
+    main()
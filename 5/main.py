@@ -1,10 +1,18 @@
 import os
+import sys
 from dotenv import load_dotenv
 from typing import Literal, TypedDict
 from pydantic import BaseModel, Field
 
 from langchain_groq import ChatGroq
 from langgraph.graph import StateGraph, START, END
+from langgraph.types import RetryPolicy
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.structured import StructuredOutput
+from batching import BatchClassifier
+from near_duplicates import NearDuplicateIndex
+from preclassifier import PreClassifier
 
 
 load_dotenv()
@@ -19,9 +27,18 @@ class Category(BaseModel):
     )
 
 
+class EmailCategory(Category):
+    id: str = Field(description="شماره‌ی ایمیل، همان N در [email N]")
+
+
+class BatchCategory(BaseModel):
+    emails: list[EmailCategory] = Field(description="برای هر ایمیل ورودی یک برچسب")
+
+
 class State(TypedDict):
     email_content: str
     category: str
+    classified_by: str
     action_log: str
 
 
@@ -29,29 +46,82 @@ llm = ChatGroq(
     model="llama-3.3-70b-versatile", api_key=os.getenv("GROQ_API_KEY"), temperature=0.7
 )
 
-classifier_llm = llm.with_structured_output(Category)
+classifier_llm = StructuredOutput(llm, Category)
+
+# حالت دسته‌ای bulk.py: چند ایمیل در یک درخواست؛ مسیر هر ایمیل در گراف جداست
+batch_classifier = BatchClassifier(StructuredOutput(llm, BatchCategory))
+
+# مدل محلی که از برچسب‌های LLM یاد می‌گیرد و ایمیل‌های واضح را بدون LLM دسته‌بندی می‌کند
+PRECLASSIFIER_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "preclassifier.json"
+)
+preclassifier = PreClassifier.load(PRECLASSIFIER_PATH)
+
+# ایمیل‌های تقریباً یکسان (کمپین، خبرنامه) یک خوشه‌اند و فقط نماینده به LLM می‌رود
+NEAR_DUPLICATES_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "near_duplicates.sqlite"
+)
+near_duplicates = NearDuplicateIndex(NEAR_DUPLICATES_PATH)
+
+
+def near_duplicate_node(state: State):
+    """برچسب خوشه‌ی ایمیل‌های مشابهی که قبلاً دسته‌بندی شده‌اند"""
+    if state.get("category"):
+        # دسته از قبل معلوم است (مثلاً از batch_classifier)؛ فقط مسیریابی لازم است
+        return {}
+    label = near_duplicates.find(state["email_content"])
+    if label is None:
+        return {}
+    return {"category": label, "classified_by": "cluster"}
+
+
+def pre_classifier_node(state: State):
+    """اگر مدل محلی مطمئن است، دسته بدون فراخوانی LLM تعیین می‌شود"""
+    content = state["email_content"]
+    guess = preclassifier.predict(content)
+    if guess is None:
+        return {}
+    # خوشه فقط با برچسب LLM ساخته می‌شود؛ ایمیل‌های مشابه هم به مدل محلی می‌رسند
+    near_duplicates.release(content)
+    return {"category": guess[0], "classified_by": "local"}
 
 
 def classifier_node(state: State):
     """ایمیل را می‌خواند و دسته‌بندی می‌کند"""
     content = state["email_content"]
-    result = classifier_llm.invoke(f"این ایمیل را دسته‌بندی کن: {content}")
+    try:
+        result = classifier_llm.invoke(f"این ایمیل را دسته‌بندی کن: {content}")
+    except Exception:
+        near_duplicates.release(content)
+        raise
+    preclassifier.learn(content, result.label)
+    near_duplicates.add(content, result.label)
+
+    return {"category": result.label, "classified_by": "llm"}
+
 
-    return {"category": result.label}
+# bulk.py و bench‌ها روشنش می‌کنند تا برای هر ایمیل چیزی چاپ نشود؛ برخلاف
+# redirect_stdout فقط همین پیام‌ها را خاموش می‌کند، نه خروجی بقیه‌ی threadها را
+QUIET = False
+
+
+def log_action(text):
+    if not QUIET:
+        print(text)
 
 
 def handle_spam(state: State):
-    print("🗑️ Deleting Spam...")
+    log_action("🗑️ Deleting Spam...")
     return {"action_log": "Moved to Trash"}
 
 
 def handle_work(state: State):
-    print("💼 Sending to Slack...")
+    log_action("💼 Sending to Slack...")
     return {"action_log": "Forwarded to Manager"}
 
 
 def handle_personal(state: State):
-    print("💌 Saving to Archive...")
+    log_action("💌 Saving to Archive...")
     return {"action_log": "Saved in Personal Folder"}
 
 
@@ -67,16 +137,57 @@ def route_email(state: State):
         return "personal_node"
 
 
+def route_near_duplicate(state: State):
+    if state.get("category"):
+        return route_email(state)
+    return "pre_classifier"
+
+
+def route_pre_classified(state: State):
+    if state.get("category"):
+        return route_email(state)
+    return "classifier"
+
+
 builder = StateGraph(State)
 
 
-builder.add_node("classifier", classifier_node)
+builder.add_node("near_duplicate", near_duplicate_node)
+builder.add_node("pre_classifier", pre_classifier_node)
+# خطای گذرای API (مثلاً rate limit در اجرای انبوه bulk.py) همان ایمیل را دوباره امتحان می‌کند
+builder.add_node(
+    "classifier", classifier_node, retry_policy=RetryPolicy(max_attempts=3)
+)
 builder.add_node("spam_node", handle_spam)
 builder.add_node("work_node", handle_work)
 builder.add_node("personal_node", handle_personal)
 
 
-builder.add_edge(START, "classifier")
+builder.add_edge(START, "near_duplicate")
+
+
+builder.add_conditional_edges(
+    "near_duplicate",
+    route_near_duplicate,
+    {
+        "pre_classifier": "pre_classifier",
+        "spam_node": "spam_node",
+        "work_node": "work_node",
+        "personal_node": "personal_node",
+    },
+)
+
+
+builder.add_conditional_edges(
+    "pre_classifier",
+    route_pre_classified,
+    {
+        "classifier": "classifier",
+        "spam_node": "spam_node",
+        "work_node": "work_node",
+        "personal_node": "personal_node",
+    },
+)
 
 
 builder.add_conditional_edges(
@@ -106,8 +217,18 @@ def main():
 
         result = graph.invoke({"email_content": email})
 
-        print(f"Category Detected: {result['category'].upper()}")
+        source = {"local": " (local model)", "cluster": " (near-duplicate)"}.get(
+            result["classified_by"], ""
+        )
+        print(f"Category Detected: {result['category'].upper()}{source}")
         print(f"Action Taken: {result['action_log']}")
+    preclassifier.save(PRECLASSIFIER_PATH)
+    print(f"Structured output stats: {classifier_llm.stats}")
+    print(
+        f"Pre-classifier: {preclassifier.stats} "
+        f"(LLM call rate {preclassifier.llm_rate:.0%})"
+    )
+    print(f"Near-duplicates: {near_duplicates.stats}, {near_duplicates.summary()}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,179 @@
+import hashlib
+import random
+import re
+import sqlite3
+import threading
+import zlib
+from array import array
+
+
+THRESHOLD = 0.75  # شباهت Jaccard تخمینی (شینگل‌های سه‌کلمه‌ای) برای یک خوشه بودن
+NUM_PERM = 64
+BANDS = 16  # LSH: امضا در ۱۶ باند ۴تایی؛ ایمیل‌های مشابه حداقل در یک باند برابرند
+ROWS = NUM_PERM // BANDS
+WAIT_TIMEOUT = 30  # ثانیه؛ انتظار عضو خوشه برای برچسب نماینده‌ای که در حال دسته‌بندی است
+PRIME = (1 << 61) - 1
+
+WORD = re.compile(r"\w+")
+DIGITS = re.compile(r"\d+")
+
+_rng = random.Random(17)
+PERMUTATIONS = [
+    (_rng.randrange(1, PRIME), _rng.randrange(PRIME)) for _ in range(NUM_PERM)
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS clusters (
+    id INTEGER PRIMARY KEY, label TEXT, size INTEGER, signature BLOB
+);
+CREATE TABLE IF NOT EXISTS bands (band INTEGER, key INTEGER, cluster INTEGER);
+CREATE INDEX IF NOT EXISTS bands_key ON bands (band, key);
+"""
+
+
+def shingles(text, size=3):
+    # عددها (شماره‌ی سفارش، تاریخ، کد تخفیف) در ایمیل‌های یک کمپین فرق دارند
+    words = WORD.findall(DIGITS.sub("0", text.lower()))
+    if len(words) < size:
+        return {" ".join(words)}
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+def signature(text):
+    """امضای MinHash: برای هر جایگشت، کمترین hash بین شینگل‌ها"""
+    hashes = [zlib.crc32(s.encode()) for s in shingles(text)]
+    return tuple(min((a * h + b) % PRIME for h in hashes) for a, b in PERMUTATIONS)
+
+
+def similarity(a, b):
+    """سهم خانه‌های برابر دو امضا ≈ شباهت Jaccard مجموعه‌ی شینگل‌ها"""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def band_keys(sig):
+    return [(band, hash(sig[band * ROWS : (band + 1) * ROWS])) for band in range(BANDS)]
+
+
+def _digest(text):
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+class NearDuplicateIndex:
+    """
+    خوشه‌بندی ایمیل‌های تقریباً یکسان (خبرنامه، اعلان، کمپین اسپم) با MinHash و LSH.
+    اولین ایمیل هر خوشه نماینده است و دسته‌بندی می‌شود؛ بقیه برچسب او را می‌گیرند.
+
+    - find(text): برچسب خوشه‌ی مشابه، یا None (در این حالت text نماینده‌ی یک خوشه‌ی
+      در انتظار می‌شود). اگر نماینده‌ی مشابهی هم‌زمان در حال دسته‌بندی است، منتظرش می‌ماند.
+    - add(text, label): برچسب نماینده را ثبت می‌کند و منتظرها را آزاد می‌کند.
+    - release(text): نماینده بدون برچسب کنار رفت (خطا یا تصمیم مدل محلی).
+
+    خوشه‌ها در SQLite می‌مانند و در اجرای بعدی هم استفاده می‌شوند.
+    شمارنده‌ها در self.stats: hits، waited، clusters.
+    """
+
+    def __init__(
+        self, path=":memory:", threshold=THRESHOLD, wait=WAIT_TIMEOUT, enabled=True
+    ):
+        self.threshold = threshold
+        self.wait = wait
+        self.enabled = enabled
+        self.stats = {"hits": 0, "waited": 0, "clusters": 0}
+        self._pending = {}  # digest متن نماینده -> (امضا، Event، [برچسب])
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def _match(self, sig):
+        """نزدیک‌ترین خوشه‌ی برچسب‌دار با شباهت حداقل threshold: (id، برچسب) یا None"""
+        candidates = set()
+        for band, key in band_keys(sig):
+            rows = self.conn.execute(
+                "SELECT cluster FROM bands WHERE band=? AND key=?", (band, key)
+            )
+            candidates.update(row[0] for row in rows)
+        best, best_score = None, self.threshold
+        for cluster in candidates:
+            label, stored = self.conn.execute(
+                "SELECT label, signature FROM clusters WHERE id=?", (cluster,)
+            ).fetchone()
+            score = similarity(sig, array("Q", stored))
+            if score >= best_score:
+                best, best_score = (cluster, label), score
+        return best
+
+    def _join(self, cluster):
+        self.conn.execute("UPDATE clusters SET size = size + 1 WHERE id=?", (cluster,))
+        self.conn.commit()
+        self.stats["hits"] += 1
+
+    def find(self, text, wait=True):
+        """
+        wait=False برای وقتی که نماینده ممکن است در همان thread منتظر دسته‌بندی
+        باشد (مثلاً یک درخواست دسته‌ای)؛ در این حالت فقط خوشه‌های برچسب‌دار برمی‌گردند.
+        """
+        if not self.enabled:
+            return None
+        sig = signature(text)
+        with self._lock:
+            match = self._match(sig)
+            if match is not None:
+                self._join(match[0])
+                return match[1]
+            pending = next(
+                (
+                    entry
+                    for entry in self._pending.values()
+                    if similarity(sig, entry[0]) >= self.threshold
+                ),
+                None,
+            )
+            if pending is None:
+                self._pending[_digest(text)] = (sig, threading.Event(), [])
+                return None
+            if not wait:
+                return None
+            self.stats["waited"] += 1
+        _, event, label = pending
+        if event.wait(self.wait) and label:
+            with self._lock:
+                match = self._match(sig)
+                if match is not None:
+                    self._join(match[0])
+                    return match[1]
+        return None
+
+    def add(self, text, label):
+        if not self.enabled:
+            return
+        sig = signature(text)
+        with self._lock:
+            pending = self._pending.pop(_digest(text), None)
+            match = self._match(sig)
+            if match is None or match[1] != label:
+                cursor = self.conn.execute(
+                    "INSERT INTO clusters (label, size, signature) VALUES (?, 1, ?)",
+                    (label, array("Q", sig).tobytes()),
+                )
+                self.conn.executemany(
+                    "INSERT INTO bands VALUES (?, ?, ?)",
+                    [(band, key, cursor.lastrowid) for band, key in band_keys(sig)],
+                )
+                self.conn.commit()
+                self.stats["clusters"] += 1
+        if pending is not None:
+            pending[2].append(label)
+            pending[1].set()
+
+    def release(self, text):
+        with self._lock:
+            pending = self._pending.pop(_digest(text), None)
+        if pending is not None:
+            pending[1].set()
+
+    def summary(self):
+        clusters, emails = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM clusters"
+        ).fetchone()
+        return {"clusters": clusters, "emails": emails}
@@ -0,0 +1,123 @@
+import json
+import math
+import os
+import re
+import threading
+import zlib
+from collections import Counter
+
+
+N_FEATURES = 2**18  # کلمه‌ها با hash به این تعداد خانه نگاشت می‌شوند؛ حافظه محدود می‌ماند
+CONFIDENCE = 0.99  # احتمال لازم برای تصمیم بدون LLM (naive Bayes بیش از حد مطمئن است)
+WARMUP = 50  # قبل از این تعداد برچسب از LLM، مدل محلی تصمیم نمی‌گیرد
+ALPHA = 0.1  # هموارسازی Laplace
+
+WORD = re.compile(r"\w+")
+SENDER = re.compile(r"^From:.*?@([\w.-]+)", re.MULTILINE)
+
+
+def features(text):
+    """شماره‌ی hash کلمه‌ها (هر کلمه یک بار) + دامنه‌ی فرستنده"""
+    text = text.lower()
+    tokens = set(WORD.findall(text))
+    sender = SENDER.search(text)
+    if sender:
+        tokens.add("from:" + sender.group(1))
+    return {zlib.crc32(t.encode()) % N_FEATURES for t in tokens}
+
+
+class PreClassifier:
+    """
+    naive Bayes محلی که از برچسب‌های خود LLM یاد می‌گیرد (online).
+    predict فقط وقتی برچسب برمی‌گرداند که احتمال دسته از confidence بیشتر باشد؛
+    بقیه‌ی ایمیل‌ها به LLM می‌روند و برچسب LLM دوباره به مدل داده می‌شود.
+    مدل فقط از برچسب‌های LLM یاد می‌گیرد، نه از حدس‌های خودش.
+    شمارنده‌ها در self.stats: local، llm، learned.
+    """
+
+    def __init__(self, confidence=CONFIDENCE, warmup=WARMUP):
+        self.confidence = confidence
+        self.warmup = warmup
+        self.documents = Counter()  # برچسب -> تعداد ایمیل
+        self.counts = {}  # برچسب -> Counter(feature -> تعداد ایمیل)
+        self.totals = Counter()  # برچسب -> جمع featureها
+        self.stats = {"local": 0, "llm": 0, "learned": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def learn(self, text, label):
+        found = features(text)
+        with self._lock:
+            counts = self.counts.setdefault(label, Counter())
+            counts.update(found)
+            self.documents[label] += 1
+            self.totals[label] += len(found)
+            self.stats["learned"] += 1
+
+    def probabilities(self, text):
+        found = features(text)
+        total = sum(self.documents.values())
+        scores = {}
+        with self._lock:
+            for label, documents in self.documents.items():
+                counts = self.counts[label]
+                denominator = math.log(self.totals[label] + ALPHA * N_FEATURES)
+                score = math.log(documents / total)
+                for feature in found:
+                    score += math.log(counts.get(feature, 0) + ALPHA) - denominator
+                scores[label] = score
+        if not scores:
+            return {}
+        best = max(scores.values())
+        exp = {label: math.exp(s - best) for label, s in scores.items()}
+        norm = sum(exp.values())
+        return {label: e / norm for label, e in exp.items()}
+
+    def predict(self, text):
+        """(برچسب، احتمال) اگر مدل به اندازه‌ی کافی مطمئن است، وگرنه None"""
+        if sum(self.documents.values()) < self.warmup:
+            self._count("llm")
+            return None
+        probabilities = self.probabilities(text)
+        label, probability = max(probabilities.items(), key=lambda p: p[1])
+        if probability < self.confidence:
+            self._count("llm")
+            return None
+        self._count("local")
+        return label, probability
+
+    @property
+    def llm_rate(self):
+        asked = self.stats["local"] + self.stats["llm"]
+        return self.stats["llm"] / asked if asked else 1.0
+
+    def save(self, path):
+        with self._lock:
+            data = {
+                "n_features": N_FEATURES,
+                "documents": self.documents,
+                "counts": {label: dict(c) for label, c in self.counts.items()},
+            }
+            # اول در فایل موقت؛ crash وسط نوشتن مدل قبلی را خراب نمی‌کند
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(data, f)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """مدل ذخیره‌شده، یا مدل خالی اگر فایل نیست یا با N_FEATURES فعلی ساخته نشده"""
+        model = cls(**kwargs)
+        if not os.path.exists(path):
+            return model
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("n_features") != N_FEATURES:
+            return model
+        model.documents = Counter(data["documents"])
+        for label, counts in data["counts"].items():
+            model.counts[label] = Counter({int(k): v for k, v in counts.items()})
+            model.totals[label] = sum(counts.values())
+        return model
@@ -1,5 +1,10 @@
 import os
+import sys
+import time
 import asyncio
+import statistics
+import contextlib
+from collections import deque
 from dotenv import load_dotenv
 from typing import TypedDict, Literal
 
@@ -16,9 +21,15 @@ from telegram.ext import (
 
 # ایمپورت‌های مربوط به هوش مصنوعی
 from langchain_groq import ChatGroq
+from langchain_core.runnables import RunnableLambda
 from pydantic import BaseModel, Field
 from langgraph.graph import StateGraph, START, END
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.structured import StructuredOutput
+from fastpath import SentimentFastPath
+from microbatch import MicroBatcher
+
 
 load_dotenv()
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
@@ -27,12 +38,31 @@ if not TELEGRAM_TOKEN or not GROK_API_KEY:
     print('"Error: Keys are missing in .env"')
 
 
+MAX_INFLIGHT_LLM = 32  # سقف کل درخواست‌های هم‌زمان به LLM در کل ربات
+MAX_CONCURRENT_UPDATES = 256  # چند پیام تلگرام هم‌زمان پردازش می‌شوند
+REPLY_TIMEOUT = 20  # ثانیه، از نوبت پیام در چت خودش تا آماده شدن جواب (شامل صف LLM)
+FALLBACK_REPLY = "⏳ الان سرم خیلی شلوغه، چند لحظه دیگه دوباره بفرست."
+ERROR_REPLY = "😕 یه مشکلی پیش اومد، دوباره امتحان کن."
+# پیام‌هایی که در این پنجره می‌رسند با یک درخواست LLM تحلیل می‌شوند؛ پنجره‌ی 0 یعنی خاموش
+SENTIMENT_BATCH_WINDOW = float(os.getenv("SENTIMENT_BATCH_WINDOW", "0.02"))
+SENTIMENT_BATCH_SIZE = int(os.getenv("SENTIMENT_BATCH_SIZE", "16"))
+QUIET = False  # loadtest.py روشنش می‌کند تا "User said" برای هر پیام چاپ نشود
+
+
 class Sentiment(BaseModel):
     mood: Literal["negative", "positive", "neutral"] = Field(
         description="تشخیص حس جمله: positive (خوشحال/مثبت)، negative (ناراحت/عصبانی)، neutral (خنی/معمولی)"
     )
 
 
+class TextSentiment(Sentiment):
+    id: int = Field(description="شماره‌ی پیام، همان N در [N]")
+
+
+class BatchSentiment(BaseModel):
+    results: list[TextSentiment] = Field(description="برای هر پیام یک نتیجه")
+
+
 class State(TypedDict):
     text: str
     sentiment: str
@@ -42,14 +72,11 @@ class State(TypedDict):
 llm = ChatGroq(
     model="llama-3.3-70b-versatile", api_key=os.getenv("GROQ_API_KEY"), temperature=0
 )
-sentiment_analyzer = llm.with_structured_output(Sentiment)
+sentiment_analyzer = StructuredOutput(llm, Sentiment)
+batch_analyzer = StructuredOutput(llm, BatchSentiment)
 
 
-def analyze_sentiment(state):
-    text = state["text"]
-    result = sentiment_analyzer.invoke(f"Analyze the sentiment of this text: {text}")
-    mood = result.mood
-
+def format_reply(text, mood):
     emoji = ""
     if mood == "positive":
         emoji = "😄"
@@ -62,9 +89,49 @@ def analyze_sentiment(state):
     return {"sentiment": mood, "final_answer": response}
 
 
+# سلام، ایموجی تنها و پیام‌های تکراری بدون LLM جواب می‌گیرند
+fast_path = SentimentFastPath()
+
+
+def analyze_sentiment(state):
+    text = state["text"]
+    mood = fast_path.lookup(text)
+    if mood is None:
+        result = sentiment_analyzer.invoke(
+            f"Analyze the sentiment of this text: {text}"
+        )
+        mood = result.mood
+        fast_path.remember(text, mood)
+    return format_reply(text, mood)
+
+
+async def classify_one(text):
+    return await sentiment_analyzer.ainvoke(f"Analyze the sentiment of this text: {text}")
+
+
+sentiment_batcher = MicroBatcher(
+    classify_one,
+    batch_analyzer,
+    window=SENTIMENT_BATCH_WINDOW,
+    max_batch=SENTIMENT_BATCH_SIZE,
+)
+
+
+async def aanalyze_sentiment(state):
+    # fast path را ReplyScheduler قبل از صف LLM چک کرده؛ این‌جا فقط پیام‌های miss می‌رسند
+    text = state["text"]
+    # زیر بار، پیام‌های هم‌زمان چند کاربر در یک درخواست تحلیل می‌شوند
+    result = await sentiment_batcher.submit(text)
+    fast_path.remember(text, result.mood)
+    return format_reply(text, result.mood)
+
+
 builder = StateGraph(State)
 
-builder.add_node("analyzer", analyze_sentiment)
+# نسخه async تا انتظار برای LLM event loop تلگرام را قفل نکند
+builder.add_node(
+    "analyzer", RunnableLambda(analyze_sentiment, afunc=aanalyze_sentiment)
+)
 
 builder.add_edge(START, "analyzer")
 builder.add_edge("analyzer", END)
@@ -73,6 +140,107 @@ builder.add_edge("analyzer", END)
 graph = builder.compile()
 
 
+class ReplyScheduler:
+    """
+    اجرای گراف برای پیام‌های هم‌زمان تلگرام:
+    - حداکثر max_inflight فراخوانی هم‌زمان LLM در کل ربات؛ بقیه در صف می‌مانند
+    - پیام‌های یک چت به ترتیب رسیدن جواب می‌گیرند (قفل هر چت، FIFO)
+    - اگر جواب تا timeout ثانیه (شامل انتظار در صف) آماده نشد، FALLBACK_REPLY
+    - پیامی که fast_path جوابش را دارد نه منتظر LLM می‌ماند نه timeout می‌خورد؛
+      فقط پشت پیام‌های قبلی همان چت صبر می‌کند
+    شمارنده‌ها در self.stats: replies، fast، timeouts، errors، peak_inflight.
+    زمان از رسیدن پیام تا فرستادن جواب در self.latencies (fast و llm)؛
+    summary() میانه و p95 را به میلی‌ثانیه می‌دهد.
+    """
+
+    def __init__(
+        self, graph, max_inflight=MAX_INFLIGHT_LLM, timeout=REPLY_TIMEOUT, fast_path=None
+    ):
+        self.graph = graph
+        self.llm_slots = asyncio.Semaphore(max_inflight)
+        self.timeout = timeout
+        self.fast_path = fast_path
+        self.inflight = 0
+        self.stats = {
+            "replies": 0, "fast": 0, "timeouts": 0, "errors": 0, "peak_inflight": 0,
+        }
+        self.latencies = {"fast": deque(maxlen=10000), "llm": deque(maxlen=10000)}
+        self._chats = {}  # chat_id -> [قفل، تعداد پیام‌های در جریان]
+
+    @contextlib.asynccontextmanager
+    async def chat(self, chat_id):
+        """پیام‌های یک چت داخل این بلوک یکی‌یکی اجرا می‌شوند"""
+        entry = self._chats.setdefault(chat_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._chats[chat_id]
+
+    async def _run(self, text):
+        async with self.llm_slots:
+            self.inflight += 1
+            self.stats["peak_inflight"] = max(self.stats["peak_inflight"], self.inflight)
+            try:
+                result = await self.graph.ainvoke({"text": text})
+            finally:
+                self.inflight -= 1
+        return result["final_answer"]
+
+    async def answer(self, text):
+        try:
+            reply = await asyncio.wait_for(self._run(text), self.timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            return FALLBACK_REPLY
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"Error: {type(e).__name__}: {e}")
+            return ERROR_REPLY
+        self.stats["replies"] += 1
+        return reply
+
+    def quick_answer(self, text):
+        """جواب fast_path بدون LLM، یا None"""
+        mood = self.fast_path.lookup(text) if self.fast_path else None
+        if mood is None:
+            return None
+        self.stats["fast"] += 1
+        return format_reply(text, mood)["final_answer"]
+
+    async def handle(self, chat_id, text, send):
+        """جواب یک پیام را با send می‌فرستد؛ fast path قبل از قفل چت و صف LLM"""
+        started = time.perf_counter()
+        reply = self.quick_answer(text)
+        # جواب هم داخل قفل چت فرستاده می‌شود تا ترتیب جواب‌ها هم حفظ شود
+        async with self.chat(chat_id):
+            if reply is None:
+                path = "llm"
+                reply = await self.answer(text)
+            else:
+                path = "fast"
+            await send(reply)
+        self.latencies[path].append(time.perf_counter() - started)
+
+    def summary(self):
+        summary = {}
+        for path, latencies in self.latencies.items():
+            if latencies:
+                values = sorted(latencies)
+                summary[path] = {
+                    "count": len(values),
+                    "p50_ms": 1000 * statistics.median(values),
+                    "p95_ms": 1000 * values[min(len(values) - 1, int(len(values) * 0.95))],
+                }
+        return summary
+
+
+scheduler = ReplyScheduler(graph, fast_path=fast_path)
+
+
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(
         "سلام! هر چی بگی من حسش رو تشخیص میدم و تکرار میکنم. 😎"
@@ -81,24 +249,37 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_text = update.message.text
-    print(f"User said: {user_text}")
+    if not QUIET:
+        print(f"User said: {user_text}")
 
-    input = {"text": user_text}
-    result = graph.invoke(input)
-
-    await update.message.reply_text(result["final_answer"])
+    await scheduler.handle(
+        update.effective_chat.id, user_text, update.message.reply_text
+    )
 
 
 def main():
     print("--- Telegram Bot Started ---")
 
-    application = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
+    # بدون concurrent_updates تلگرام پیام‌ها را یکی‌یکی به handler می‌دهد
+    application = (
+        ApplicationBuilder()
+        .token(TELEGRAM_TOKEN)
+        .concurrent_updates(MAX_CONCURRENT_UPDATES)
+        .build()
+    )
     application.add_handler(CommandHandler("start", start_command))
     application.add_handler(
         MessageHandler(filters.TEXT & (~filters.COMMAND), handle_message)
     )
 
-    application.run_polling()
+    try:
+        application.run_polling()
+    finally:
+        print(f"Scheduler stats: {scheduler.stats}")
+        print(f"Reply latency: {scheduler.summary()}")
+        print(f"Micro-batching: {sentiment_batcher.summary()}")
+        print(f"Fast path: {fast_path.stats}")
+        print(f"Structured output stats: {sentiment_analyzer.stats}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,134 @@
+import re
+import threading
+from collections import OrderedDict
+
+
+CACHE_SIZE = 4096
+MAX_UNKNOWN = 1  # چند کلمه‌ی ناشناخته کنار نشانه‌های یک‌طرفه هنوز قابل قبول است
+
+POSITIVE = {
+    # فارسی
+    "خوب", "خوبه", "خوبم", "عالی", "عالیه", "عالیی", "ممنون", "ممنونم", "مرسی",
+    "متشکرم", "سپاس", "خوشحال", "خوشحالم", "قشنگ", "قشنگه", "زیبا", "بهترین",
+    "محشر", "محشره", "باحال", "باحاله", "آفرین", "عاشقتم", "عاشقشم", "ایول",
+    "دوستت", "خفن", "فوق‌العاده", "فوقالعاده", "شاد", "لذت", "موفق",
+    # English
+    "good", "great", "awesome", "love", "loved", "happy", "thanks", "thank", "nice",
+    "amazing", "excellent", "best", "cool", "wonderful", "glad", "lol", "perfect",
+    "yay", "fantastic", "beautiful",
+}
+NEGATIVE = {
+    "بد", "بده", "بدم", "افتضاح", "افتضاحه", "متنفرم", "ناراحت", "ناراحتم",
+    "عصبانی", "عصبانیم", "غمگین", "غمگینم", "بدترین", "مزخرف", "مزخرفه", "داغونم",
+    "لعنتی", "حالمو", "گریه", "خسته‌ام", "خستم", "اعصابم", "ناامید", "ناامیدم",
+    "bad", "terrible", "awful", "hate", "sad", "angry", "worst", "horrible", "annoyed",
+    "upset", "sucks", "disappointed", "ugh", "tired", "depressed", "furious",
+}
+NEUTRAL = {
+    "سلام", "درود", "خداحافظ", "بای", "باشه", "اوکی", "اوک", "چطوری", "خوبی", "چخبر", "خبر",
+    "hi", "hello", "hey", "ok", "okay", "bye", "yo", "sup",
+}
+# جمله‌هایی که کلمه‌هایشان جدا معنی دیگری دارند
+PHRASES = {
+    "خسته نباشی": "positive",
+    "خسته نباشید": "positive",
+    "دمت گرم": "positive",
+    "دستت درد نکنه": "positive",
+    "حالم بده": "negative",
+    "حالم گرفته": "negative",
+    "not bad": "positive",
+}
+# نفی قطبیت را برمی‌گرداند؛ این موارد به LLM سپرده می‌شوند
+NEGATIONS = {
+    "نه", "نیست", "نیستم", "نبود", "نمی", "نمیشه", "اصلا", "هیچ",
+    "not", "no", "never", "dont", "don't", "isn't", "isnt", "wasnt", "nothing",
+}
+FILLER = {
+    "من", "تو", "ما", "این", "اون", "آن", "خیلی", "واقعا", "واقعاً", "هم", "و", "که",
+    "را", "رو", "است", "هست", "بود", "یه", "یک", "دارم", "داری", "شدم", "جان", "جون",
+    "i", "im", "i'm", "you", "we", "it", "its", "is", "am", "are", "was", "this", "that",
+    "so", "very", "really", "much", "the", "a", "an", "my", "your", "too", "all",
+}
+POSITIVE_EMOJI = set("😀😃😄😁😆😊🙂😍🥰😘😎🤩😂🤣👍👏🎉✨🔥💯🙏🌹💪") | {"❤", "♥", "💕", "💖", "😇"}
+NEGATIVE_EMOJI = set("😞😢😭😡😠🤬💔👎😩😫😤😔🙁😒😣😖🤮") | {"☹"}
+NEUTRAL_EMOJI = set("🤔😐😶👋😑")  # 🙄 معمولاً طعنه است و به LLM می‌رود
+
+ARABIC = str.maketrans({"ي": "ی", "ك": "ک", "ة": "ه", "\ufe0f": None})
+DIACRITICS = re.compile(r"[\u064b-\u065f\u0670]")
+REPEATS = re.compile(r"(\w)\1{2,}")  # «عالیییی» و «goood» → «عالیی» و «good»
+TOKEN = re.compile(r"[\w'\u200c]+|[\U0001F300-\U0001FAFF\u2600-\u27bf]")
+
+
+def normalize(text):
+    text = DIACRITICS.sub("", text.translate(ARABIC)).lower()
+    return " ".join(REPEATS.sub(r"\1\1", text).split())
+
+
+def lexicon_mood(text):
+    """
+    حس پیام‌های کوتاه و واضح از روی واژه‌نامه و ایموجی: positive، negative، neutral
+    یا None اگر پیام نفی، نشانه‌های متضاد یا بیش از MAX_UNKNOWN کلمه‌ی ناشناخته دارد.
+    text باید normalize شده باشد.
+    """
+    for phrase, mood in PHRASES.items():
+        if phrase in text:
+            text = text.replace(phrase, f" {mood}_phrase ")
+    positive = negative = unknown = 0
+    tokens = TOKEN.findall(text)
+    for token in tokens:
+        if token in NEGATIONS:
+            return None
+        if token in POSITIVE or token in POSITIVE_EMOJI or token == "positive_phrase":
+            positive += 1
+        elif token in NEGATIVE or token in NEGATIVE_EMOJI or token == "negative_phrase":
+            negative += 1
+        elif token in NEUTRAL or token in NEUTRAL_EMOJI or token in FILLER:
+            continue
+        elif not token.isdigit():
+            unknown += 1
+    if not tokens or (positive and negative):
+        return None
+    if positive or negative:
+        if unknown > MAX_UNKNOWN:
+            return None
+        return "positive" if positive else "negative"
+    # فقط سلام و احوال‌پرسی و کلمه‌های خنثی
+    return "neutral" if not unknown else None
+
+
+class SentimentFastPath:
+    """
+    لایه‌ی محلی جلوی LLM: اول واژه‌نامه و ایموجی برای پیام‌های واضح، بعد یک LRU
+    با کلید متن نرمال‌شده برای پیام‌های تکراری. فقط پیام‌های مبهم به LLM می‌رسند و
+    جوابشان با remember در cache می‌رود.
+    شمارنده‌ها در self.stats: lexicon، cache، llm.
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.stats = {"lexicon": 0, "cache": 0, "llm": 0}
+        self._entries = OrderedDict()  # متن نرمال‌شده -> mood
+        self._lock = threading.Lock()
+
+    def lookup(self, text):
+        key = normalize(text)
+        mood = lexicon_mood(key)
+        with self._lock:
+            if mood is not None:
+                self.stats["lexicon"] += 1
+                return mood
+            mood = self._entries.get(key)
+            if mood is not None:
+                self._entries.move_to_end(key)
+                self.stats["cache"] += 1
+                return mood
+            self.stats["llm"] += 1
+            return None
+
+    def remember(self, text, mood):
+        key = normalize(text)
+        with self._lock:
+            self._entries[key] = mood
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
@@ -0,0 +1,210 @@
+"""
+تست بار handler ربات با آپدیت‌های جعلی تلگرام و LLM جعلی (بدون توکن تلگرام و کلید Groq).
+
+    python loadtest.py --chats 100 --messages 3 --latency 0.5 --max-inflight 8 32 64
+    python loadtest.py --max-inflight 64 --batch-window 0.02 --batch-size 16
+    python loadtest.py --lexicon-share 0.3 --repeat-share 0.3
+
+آپدیت‌ها مثل Application با concurrent_updates، هر کدام در یک task جدا و به
+ترتیب رسیدن اجرا می‌شوند. ترتیب جواب‌های هر چت و جواب fallback هم بررسی می‌شود.
+سهم lexicon-share از پیام‌ها سلام و ایموجی است و سهم repeat-share از چند جمله‌ی
+ثابت تکرار می‌شود (بار اول LLM، بعد cache). نرخ hit و زمان جواب hit و miss گزارش می‌شود.
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import time
+from types import SimpleNamespace
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+os.environ.setdefault("GROQ_API_KEY", "fake")
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "fake")
+import bot
+from common.structured import StructuredOutput
+from fastpath import SentimentFastPath
+from microbatch import MicroBatcher
+
+
+NUMBERED = re.compile(r"^\[(\d+)\] (.*)$", re.MULTILINE)
+LEXICON_TEXTS = [
+    "سلام", "👍", "خیلی ممنون 🙏", "thanks!", "حالم بده 😢", "hello", "عالیه 😍", "ugh",
+]
+REPEATED_TEXTS = [
+    "the delivery was good but late",
+    "can you check my order status",
+    "is the good plan still available",
+    "where do I change my password",
+]
+
+
+def mood_of(text):
+    return "positive" if "good" in text else "neutral"
+
+
+class FakeSentimentLLM(BaseChatModel):
+    """
+    structured output جعلی با تأخیر؛ با احتمال slow_rate خیلی کند جواب می‌دهد.
+    پرامپت‌های دسته‌ای ([N] ...) را هم جواب می‌دهد.
+    """
+
+    latency: float = 0.5
+    slow_rate: float = 0.0
+    slow_latency: float = 30.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self):
+        return "fake-sentiment"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _result(self, text):
+        lines = NUMBERED.findall(text)
+        if lines:
+            results = [{"id": int(n), "mood": mood_of(line)} for n, line in lines]
+            name, args = "BatchSentiment", {"results": results}
+        else:
+            name, args = "Sentiment", {"mood": mood_of(text)}
+        call = {"name": name, "args": args, "id": f"call_{self.calls}"}
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content="", tool_calls=[call]))]
+        )
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        return self._result(messages[-1].content)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        slow = random.random() < self.slow_rate
+        await asyncio.sleep(self.slow_latency if slow else self.latency)
+        return self._result(messages[-1].content)
+
+
+class FakeMessage:
+    def __init__(self, text, replies):
+        self.text = text
+        self.replies = replies
+
+    async def reply_text(self, text):
+        self.replies.append((self.text, text, time.perf_counter()))
+
+
+def message_text(chat, n, args, rng):
+    draw = rng.random()
+    if draw < args.lexicon_share:
+        return rng.choice(LEXICON_TEXTS)
+    if draw < args.lexicon_share + args.repeat_share:
+        return rng.choice(REPEATED_TEXTS)
+    return f"chat {chat} message {n} good"
+
+
+def fake_update(chat_id, text, replies):
+    return SimpleNamespace(
+        message=FakeMessage(text, replies), effective_chat=SimpleNamespace(id=chat_id)
+    )
+
+
+async def run(args, max_inflight):
+    fake = FakeSentimentLLM(latency=args.latency, slow_rate=args.slow_rate)
+    bot.sentiment_analyzer = StructuredOutput(fake, bot.Sentiment)
+    bot.sentiment_batcher = MicroBatcher(
+        bot.classify_one,
+        StructuredOutput(fake, bot.BatchSentiment),
+        window=args.batch_window,
+        max_batch=args.batch_size,
+    )
+    bot.fast_path = SentimentFastPath()
+    bot.scheduler = bot.ReplyScheduler(
+        bot.graph, max_inflight=max_inflight, timeout=args.timeout, fast_path=bot.fast_path
+    )
+    replies = {chat: [] for chat in range(args.chats)}
+    rng = random.Random(args.seed)
+    texts = {
+        chat: [message_text(chat, n, args, rng) for n in range(args.messages)]
+        for chat in range(args.chats)
+    }
+    # پیام‌ها کمی پراکنده می‌رسند، اما پیام‌های هر چت پشت سر هم
+    updates = [
+        fake_update(chat, texts[chat][n], replies[chat])
+        for n in range(args.messages)
+        for chat in range(args.chats)
+    ]
+    # چاپ "User said" برای هر پیام خروجی را شلوغ می‌کند
+    bot.QUIET = True
+    start = time.perf_counter()
+    tasks = []
+    for update in updates:
+        tasks.append(asyncio.create_task(bot.handle_message(update, None)))
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    in_order = all(
+        [r[0] for r in chat_replies] == texts[chat]
+        for chat, chat_replies in replies.items()
+    )
+    total = args.chats * args.messages
+    ideal = total * args.latency / max_inflight
+    # هر چت پیام‌هایش را پشت سر هم جواب می‌گیرد، پس زمان کمتر از این نمی‌شود
+    floor = args.messages * args.latency
+    print(
+        f"max_inflight={max_inflight:>3}: {elapsed:6.2f}s "
+        f"(ideal ~{max(ideal, floor):.2f}s), {total / elapsed:6.1f} msgs/s, "
+        f"in order: {in_order}, LLM requests: {fake.calls}"
+    )
+    print(f"  scheduler: {bot.scheduler.stats}")
+    fast = bot.fast_path.stats
+    hits = fast["lexicon"] + fast["cache"]
+    print(f"  fast path: {fast}, hit rate {hits / total:.0%}")
+    for path, latency in bot.scheduler.summary().items():
+        print(
+            f"  {path:>4} replies: {latency['count']:>4}, "
+            f"p50 {latency['p50_ms']:8.2f}ms, p95 {latency['p95_ms']:8.2f}ms"
+        )
+    if args.batch_window > 0:
+        print(f"  micro-batching: {bot.sentiment_batcher.summary()}")
+
+
+async def main(args):
+    print(
+        f"--- {args.chats} chats x {args.messages} messages, "
+        f"LLM latency {args.latency}s, timeout {args.timeout}s ---"
+    )
+    for max_inflight in args.max_inflight:
+        await run(args, max_inflight)
+
+
+def cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=100)
+    parser.add_argument("--messages", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--max-inflight", type=int, nargs="+", default=[8, 32, 64])
+    parser.add_argument("--timeout", type=float, default=bot.REPLY_TIMEOUT)
+    parser.add_argument(
+        "--slow-rate", type=float, default=0.0, help="share of calls that hang"
+    )
+    parser.add_argument(
+        "--batch-window", type=float, default=0.0, help="seconds, 0 = no micro-batching"
+    )
+    parser.add_argument("--batch-size", type=int, default=bot.SENTIMENT_BATCH_SIZE)
+    parser.add_argument(
+        "--lexicon-share", type=float, default=0.2, help="greetings and emoji messages"
+    )
+    parser.add_argument(
+        "--repeat-share", type=float, default=0.2, help="messages from a few fixed texts"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    cli()
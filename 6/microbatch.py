@@ -0,0 +1,136 @@
+import asyncio
+import statistics
+import time
+from collections import deque
+
+from langchain_core.exceptions import OutputParserException
+from pydantic import ValidationError
+
+
+WINDOW = 0.02  # ثانیه؛ حداکثر تأخیری که یک پیام برای پر شدن دسته منتظر می‌ماند
+MAX_BATCH = 16
+
+PROMPT = (
+    "Analyze the sentiment of each numbered message below. Return one result per "
+    "message, using the number in [N] as its id. Do not skip any message.\n\n"
+)
+
+
+def render(texts):
+    return PROMPT + "\n".join(
+        f"[{n}] {' '.join(text.split())}" for n, text in enumerate(texts, 1)
+    )
+
+
+class MicroBatcher:
+    """
+    پیام‌هایی که در یک پنجره‌ی کوتاه (window) می‌رسند با یک درخواست structured output
+    تحلیل می‌شوند؛ هر فراخواننده فقط نتیجه‌ی پیام خودش را می‌گیرد.
+
+    - دسته با رسیدن به max_batch پیام یا تمام شدن پنجره فرستاده می‌شود
+    - دسته‌ی یک‌پیامی و پیام‌هایی که مدل جا انداخت با classify_one تکی فرستاده می‌شوند
+    - window=0 یا enabled=False یعنی بدون دسته‌بندی (هر پیام مستقیم)
+
+    شمارنده‌ها در self.stats: requests، batches، batched، singles.
+    """
+
+    def __init__(
+        self, classify_one, batch_llm, window=WINDOW, max_batch=MAX_BATCH, enabled=True
+    ):
+        self.classify_one = classify_one
+        self.batch_llm = batch_llm
+        self.window = window
+        self.max_batch = max_batch
+        self.enabled = enabled
+        self.stats = {"requests": 0, "batches": 0, "batched": 0, "singles": 0}
+        self.waits = deque(maxlen=10000)  # تأخیر اضافه‌ی پنجره برای هر پیام
+        self._pending = []  # (متن، future، زمان رسیدن)
+        self._timer = None
+        self._tasks = set()  # ارجاع به taskهای در جریان تا garbage collect نشوند
+
+    async def submit(self, text):
+        if not self.enabled or self.window <= 0 or self.max_batch <= 1:
+            return await self._single(text)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        items, self._pending = self._pending, []
+        # پیامی که handlerش لغو شده (timeout) دیگر به LLM فرستاده نمی‌شود
+        items = [item for item in items if not item[1].done()]
+        if items:
+            task = asyncio.get_running_loop().create_task(self._run(items))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _single(self, text):
+        self.stats["requests"] += 1
+        self.stats["singles"] += 1
+        return await self.classify_one(text)
+
+    async def _answer(self, future, text):
+        try:
+            result = await self._single(text)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
+
+    async def _run(self, items):
+        now = time.perf_counter()
+        self.waits.extend(now - arrived for _, _, arrived in items)
+        if len(items) == 1:
+            await self._answer(items[0][1], items[0][0])
+            return
+        self.stats["requests"] += 1
+        self.stats["batches"] += 1
+        self.stats["batched"] += len(items)
+        results = {}
+        try:
+            prompt = render([text for text, _, _ in items])
+            response = await self.batch_llm.ainvoke(prompt)
+            for entry in response.results:
+                results.setdefault(entry.id, entry)
+        except (OutputParserException, ValidationError):
+            pass
+        except Exception as e:
+            for _, future, _ in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        missing = []
+        for n, (text, future, _) in enumerate(items, 1):
+            if future.done():
+                continue
+            if n in results:
+                future.set_result(results[n])
+            else:
+                missing.append(self._answer(future, text))
+        await asyncio.gather(*missing)
+
+    def summary(self):
+        batches = self.stats["batches"]
+        waits = sorted(self.waits)
+        return {
+            **self.stats,
+            "avg_fill": (
+                self.stats["batched"] / (batches * self.max_batch) if batches else 0.0
+            ),
+            "wait_p50_ms": 1000 * statistics.median(waits) if waits else 0.0,
+            "wait_p95_ms": (
+                1000 * waits[min(len(waits) - 1, int(len(waits) * 0.95))]
+                if waits
+                else 0.0
+            ),
+        }
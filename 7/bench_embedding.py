@@ -0,0 +1,110 @@
+"""
+سنجش مرحله‌ی embedding (دسته، هم‌زمانی، rate limit و cache) با embedding جعلی.
+
+    python bench_embedding.py --chunks 3000 --latency 0.3 --rate-limit 10 --concurrency 8
+
+embedding جعلی برای هر درخواست latency ثانیه طول می‌کشد و بیش از rate-limit درخواست
+در ثانیه را با خطای 429 رد می‌کند. اول مثل FAISS.from_documents دسته‌ها پشت سر هم
+فرستاده می‌شوند، بعد با BatchEmbedder؛ سپس همان متن‌ها و متن‌هایی که درصد کمی از
+آن‌ها عوض شده دوباره embed می‌شوند (با cache روی دیسک).
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from bench_index import FakeEmbeddings, RateLimitError, manual
+from embedding import BatchEmbedder, EmbeddingCache
+
+
+def corpus(chunks, seed=0):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    texts = []
+    pages = 0
+    while len(texts) < chunks:
+        page = manual(1, seed=seed * 100000 + pages)[0]
+        texts.extend(splitter.split_text("\n".join(page)))
+        pages += 1
+    return texts[:chunks]
+
+
+def edit(texts, share, rng):
+    texts = list(texts)
+    for i in rng.sample(range(len(texts)), int(len(texts) * share)):
+        texts[i] += " (revised)"
+    return texts
+
+
+def sequential(fake, texts, batch_size):
+    began = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        fake.embed_documents(texts[i : i + batch_size])
+    return time.perf_counter() - began
+
+
+def run(name, embedder, fake, texts):
+    requests, stats = fake.requests, dict(embedder.stats)
+    began = time.perf_counter()
+    vectors = embedder.embed_documents(texts)
+    elapsed = time.perf_counter() - began
+    delta = {k: embedder.stats[k] - stats[k] for k in stats}
+    print(
+        f"{name:>28}: {elapsed:6.2f}s, {fake.requests - requests} API requests, "
+        f"{delta}"
+    )
+    return vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched, cached embedding benchmark")
+    parser.add_argument("--chunks", type=int, default=3000)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per request")
+    parser.add_argument(
+        "--rate-limit", type=int, default=10, help="requests per second, 0 = none"
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--edited", type=float, default=0.05, help="share of chunks")
+    args = parser.parse_args()
+
+    texts = corpus(args.chunks)
+    print(
+        f"--- {len(texts)} chunks, {args.latency}s per request, "
+        f"limit {args.rate_limit or 'none'} req/s ---"
+    )
+    fake = FakeEmbeddings(latency=args.latency, batch_size=args.batch_size)
+    print(f"{'sequential (before)':>28}: {sequential(fake, texts, args.batch_size):6.2f}s")
+
+    fake = FakeEmbeddings(
+        latency=args.latency, batch_size=args.batch_size, rate_limit=args.rate_limit
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "embeddings.sqlite")
+
+        def embedder():
+            return BatchEmbedder(
+                fake,
+                "fake",
+                cache=EmbeddingCache(path),
+                batch_size=args.batch_size,
+                concurrency=args.concurrency,
+                rate_limit_errors=(RateLimitError,),
+            )
+
+        cold = run("batched, empty cache", embedder(), fake, texts)
+        warm = run("same chunks, next run", embedder(), fake, texts)
+        # بردار float32 از cache با بردار تازه فقط در دقت فرق دارد
+        assert all(abs(a[0] - b[0]) < 1e-6 for a, b in zip(cold, warm))
+        changed = edit(texts, args.edited, random.Random(0))
+        run(f"{args.edited:.0%} of chunks edited", embedder(), fake, changed)
+        print(
+            f"cache: {len(EmbeddingCache(path))} vectors, "
+            f"429 responses: {fake.rejected}"
+        )
+
+
+if __name__ == "__main__":
+    main()
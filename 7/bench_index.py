@@ -0,0 +1,207 @@
+"""
+سنجش index ذخیره‌شده و به‌روزرسانی تدریجی RAG، روی PDFهای ساختگی و embedding جعلی.
+
+    python bench_index.py --documents 8 --pages 10 --latency 0.5
+
+هر PDF یک دفترچه‌ی فنی با شماره‌ی قطعه است. embedding جعلی برای هر درخواست latency
+ثانیه صبر می‌کند (مثل API گوگل). بعد از شروع سرد و گرم، یک خط از یک سند عوض
+می‌شود، یک سند اضافه و یکی حذف می‌شود؛ در آخر برای مقایسه index از نو ساخته می‌شود.
+"""
+import argparse
+import hashlib
+import math
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from embedding import BATCH_SIZE
+from index_store import PersistentIndex, scan_documents
+from pdf_loader import load_sequential
+
+
+COMPONENTS = [
+    "hydraulic pump", "drive belt", "pressure valve", "bearing housing", "gasket",
+    "control board", "coolant hose", "fuel filter", "relay", "torque sensor",
+    "impeller", "thermostat", "seal kit", "solenoid", "brake pad",
+]
+ACTIONS = ["Inspect", "Replace", "Lubricate", "Tighten", "Calibrate", "Clean"]
+LINES_PER_PAGE = 45
+
+
+class RateLimitError(Exception):
+    pass
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    embedding قطعی و محلی برای bench‌ها: بردار از hash متن ساخته می‌شود، پس متن
+    یکسان بردار یکسان می‌گیرد. هر batch_size متن یک درخواست حساب می‌شود و latency
+    ثانیه طول می‌کشد. با rate_limit (درخواست در ثانیه) مثل API خطای 429 می‌دهد.
+    """
+
+    def __init__(self, size=64, latency=0.0, batch_size=BATCH_SIZE, rate_limit=None):
+        self.size = size
+        self.latency = latency
+        self.batch_size = batch_size
+        self.rate_limit = rate_limit
+        self.requests = 0
+        self.texts = 0
+        self.rejected = 0
+        self._recent = []  # زمان شروع درخواست‌های یک ثانیه‌ی اخیر
+        self._lock = threading.Lock()
+
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest())
+        vector = np.random.default_rng(seed).standard_normal(self.size)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        requests = math.ceil(len(texts) / self.batch_size)
+        with self._lock:
+            now = time.monotonic()
+            self._recent = [t for t in self._recent if now - t < 1]
+            if self.rate_limit and len(self._recent) + requests > self.rate_limit:
+                self.rejected += 1
+                raise RateLimitError("429 RESOURCE_EXHAUSTED: quota exceeded")
+            self._recent.extend([now] * requests)
+            self.requests += requests
+            self.texts += len(texts)
+        time.sleep(self.latency * requests)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+def part_number(n):
+    return f"C112216-{n:04d}"
+
+
+def manual_lines(page, rng):
+    lines = [f"Section {page + 1}: maintenance of unit {page % 7 + 1}"]
+    for n in range(LINES_PER_PAGE - 1):
+        component = rng.choice(COMPONENTS)
+        lines.append(
+            f"{page + 1}.{n + 1} {rng.choice(ACTIONS)} the {component} "
+            f"(part no. {part_number(rng.randrange(10000))}) every "
+            f"{rng.choice([50, 100, 250, 500])} hours; torque {rng.randrange(5, 90)} Nm."
+        )
+    return lines
+
+
+def _escape(line):
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def manual(pages, seed=0):
+    """خط‌های هر صفحه‌ی یک دفترچه‌ی ساختگی"""
+    rng = random.Random(seed)
+    return [manual_lines(page, rng) for page in range(pages)]
+
+
+def write_pdf(path, texts):
+    """PDF متنی ساده (Helvetica، یک stream برای هر صفحه) بدون وابستگی اضافه"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages، بعد از معلوم شدن شماره‌ی صفحه‌ها
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for lines in texts:
+        body = "BT /F1 9 Tf 11 TL 40 780 Td " + " ".join(
+            f"({_escape(line)}) Tj T*" for line in lines
+        ) + " ET"
+        stream = body.encode("latin-1")
+        objects.append(
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        )
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % len(objects)
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids),
+        len(kids),
+    )
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref,
+    )
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def run(name, index, docs_dir, embeddings):
+    requests = embeddings.requests
+    embedded, reused = index.stats["embedded"], index.stats["reused"]
+    began = time.perf_counter()
+    changes = index.update(scan_documents(docs_dir), load_sequential)
+    elapsed = time.perf_counter() - began
+    print(
+        f"{name:>22}: {1000 * elapsed:8.1f}ms, {index.vector_store.index.ntotal} vectors, "
+        f"{index.stats['embedded'] - embedded} embedded / "
+        f"{index.stats['reused'] - reused} reused chunks, "
+        f"{embeddings.requests - requests} embedding requests"
+    )
+    print(f"{'':>24}{changes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Persistent, incremental RAG index")
+    parser.add_argument("--documents", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=10, help="pages per document")
+    parser.add_argument(
+        "--latency", type=float, default=0.5, help="fake embedding seconds per request"
+    )
+    args = parser.parse_args()
+
+    embeddings = FakeEmbeddings(latency=args.latency)
+    splitter = {"chunk_size": 1000, "chunk_overlap": 200}
+    with tempfile.TemporaryDirectory() as tmp:
+        docs_dir = os.path.join(tmp, "data")
+        index_dir = os.path.join(tmp, "faiss_index")
+        os.makedirs(docs_dir)
+        corpus = {
+            f"manual-{n}.pdf": manual(args.pages, seed=n) for n in range(args.documents)
+        }
+        for name, texts in corpus.items():
+            write_pdf(os.path.join(docs_dir, name), texts)
+
+        def new_index():
+            return PersistentIndex(index_dir, embeddings, "fake", splitter)
+
+        run("cold start", new_index(), docs_dir, embeddings)
+        index = new_index()
+        run("warm start", index, docs_dir, embeddings)
+
+        # یک خط از یک صفحه عوض می‌شود، یک سند اضافه و یکی حذف می‌شود
+        edited = corpus["manual-0.pdf"]
+        edited[args.pages // 2][3] = "3.4 Replace the gasket (part no. C112216-9999)."
+        write_pdf(os.path.join(docs_dir, "manual-0.pdf"), edited)
+        write_pdf(os.path.join(docs_dir, "new.pdf"), manual(args.pages, seed=100))
+        os.remove(os.path.join(docs_dir, "manual-1.pdf"))
+        run("1 edit, 1 new, 1 removed", index, docs_dir, embeddings)
+        run("no changes", index, docs_dir, embeddings)
+
+        shutil.rmtree(index_dir)
+        run("full rebuild (before)", new_index(), docs_dir, embeddings)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+سنجش retrieval ترکیبی (FAISS + BM25 + RRF + rerank) روی fixtures/questions.jsonl.
+
+    python bench_retrieval.py --k 5 --candidates 20
+
+پیکره همان دفترچه‌های ساختگی bench_index.py است (۳ سند × ۳۰ صفحه، بدون PDF). embedding
+جعلی (HashingEmbeddings) مثل مدل‌های واقعی معنی کلی جمله و شماره‌ی بخش را می‌گیرد
+اما شماره‌ی قطعه را نمی‌شناسد. سؤالی درست جواب گرفته که یکی از k چانک
+برگشتی خط جواب را داشته باشد. recall هر مرحله و زمان هر مرحله گزارش می‌شود.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from bench_index import manual
+from hybrid import BM25_WEIGHT, CODE_WEIGHT, STOPWORDS, HybridRetriever
+
+
+FIXTURE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "fixtures", "questions.jsonl"
+)
+# کلمه‌ها و عددهای کوتاه (شماره‌ی بخش، ساعت)؛ کدی مثل C112216-0042 ویژگی ندارد
+WORD = re.compile(r"(?<![\w-])(?:[a-z]+|\d{1,3})(?![\w-])")
+STEM = 5  # «inspected» و «inspect» یک ویژگی‌اند
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    مدل جعلی با سیگنال معنایی: bag-of-words هش‌شده روی ریشه‌ی کلمه‌ها و عددهای کوتاه
+    به علاوه‌ی جفت کلمه‌های مجاور (بی‌ترتیب، بعد از حذف stopwordها)، پس «gasket be
+    inspected» به «Inspect the gasket» نزدیک است. شماره‌ی قطعه را نمی‌شناسد.
+    """
+
+    def __init__(self, size=2048):
+        self.size = size
+
+    def _features(self, text):
+        words = [
+            word[:STEM] for word in WORD.findall(text.lower()) if word not in STOPWORDS
+        ]
+        yield from words
+        for pair in zip(words, words[1:]):
+            yield " ".join(sorted(pair))
+
+    def _vector(self, text):
+        vector = np.zeros(self.size)
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode(), digest_size=4).digest()
+            vector[int.from_bytes(digest) % self.size] += 1
+        vector = np.log1p(vector)  # تکرار زیاد یک کلمه (every، hours) غالب نشود
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+def load_questions():
+    with open(FIXTURE, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def build_store(documents, pages):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    embeddings = HashingEmbeddings()
+    chunks, ids = [], []
+    for n in range(documents):
+        doc_id = f"manual-{n}.pdf"
+        for page, lines in enumerate(manual(pages, seed=n)):
+            page_doc = Document("\n".join(lines), metadata={"doc_id": doc_id, "page": page})
+            for chunk in splitter.split_documents([page_doc]):
+                ids.append(f"{doc_id}#{len(ids)}")
+                chunks.append(chunk)
+    texts = [c.page_content for c in chunks]
+    return FAISS.from_embeddings(
+        list(zip(texts, embeddings.embed_documents(texts))),
+        embeddings,
+        metadatas=[c.metadata for c in chunks],
+        ids=ids,
+    )
+
+
+def recall(questions, retriever, k):
+    hits = {}
+    for item in questions:
+        result, docs = retriever.rankings(item["question"])
+        for stage, ranking in result.items():
+            texts = [
+                (docs.get(i) or retriever.vector_store.docstore.search(i)).page_content
+                for i in ranking[:k]
+            ]
+            found = any(answer in text for answer in item["answers"] for text in texts)
+            hits.setdefault((item["kind"], stage), []).append(found)
+    return {key: sum(found) / len(found) for key, found in hits.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hybrid retrieval benchmark")
+    parser.add_argument("--documents", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=30)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--bm25-weight", type=float, default=BM25_WEIGHT)
+    parser.add_argument(
+        "--code-weight", type=float, default=CODE_WEIGHT, help="BM25 weight for codes"
+    )
+    args = parser.parse_args()
+
+    questions = load_questions()
+    store = build_store(args.documents, args.pages)
+    retriever = HybridRetriever(
+        k=args.k,
+        candidates=args.candidates,
+        rerank=True,
+        bm25_weight=args.bm25_weight,
+        code_weight=args.code_weight,
+    )
+    added, _ = retriever.sync(store)
+    print(f"--- {added} chunks, {len(questions)} questions, recall@{args.k} ---")
+    scores = recall(questions, retriever, args.k)
+    kinds = sorted({kind for kind, _ in scores})
+    print(f"{'':>10}" + "".join(f"{kind:>14}" for kind in kinds))
+    for stage in ("vector", "bm25", "fused", "reranked"):
+        print(f"{stage:>10}" + "".join(f"{scores[(kind, stage)]:>14.0%}" for kind in kinds))
+    print("latency per stage:")
+    for stage, timing in retriever.summary().items():
+        print(f"{stage:>10}: p50 {timing['p50_ms']:.2f}ms, p95 {timing['p95_ms']:.2f}ms")
+
+    # حذف یک سند از FAISS؛ BM25 فقط همان چانک‌ها را کنار می‌گذارد
+    removed = [i for i in store.index_to_docstore_id.values() if i.startswith("manual-0")]
+    store.delete(removed)
+    print(f"after deleting manual-0.pdf from FAISS, sync (added, removed): "
+          f"{retriever.sync(store)}, BM25 chunks: {len(retriever.bm25)}")
+
+
+if __name__ == "__main__":
+    main()
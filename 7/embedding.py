@@ -0,0 +1,199 @@
+import random
+import sqlite3
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from langchain_core.embeddings import Embeddings
+
+from index_store import text_hash
+
+try:  # google-api-core همراه langchain-google-genai نصب می‌شود
+    from google.api_core.exceptions import ResourceExhausted, TooManyRequests
+except ImportError:
+    RATE_LIMIT_ERRORS = ()
+else:
+    RATE_LIMIT_ERRORS = (ResourceExhausted, TooManyRequests)
+
+
+BATCH_SIZE = 100  # حداکثر متن در هر درخواست embedding گوگل
+CONCURRENCY = 4
+MAX_RETRIES = 6
+BACKOFF = 1.0  # ثانیه؛ مکث همه‌ی درخواست‌ها بعد از اولین 429 یک دسته، دو برابر در هر تکرار
+MIN_INTERVAL = 0.05  # ثانیه؛ اولین فاصله‌ی بین درخواست‌ها بعد از خطای rate limit
+MAX_INTERVAL = 30.0
+SPEEDUP = 0.9  # هر درخواست موفق فاصله را کم می‌کند تا دوباره به سقف API نزدیک شویم
+LOOKUP_CHUNK = 500  # حداکثر پارامتر در هر کوئری IN
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT, hash TEXT, vector BLOB,
+    PRIMARY KEY (model, hash)
+);
+"""
+
+
+def is_rate_limited(error, errors=RATE_LIMIT_ERRORS):
+    """
+    خطا یا یکی از علت‌هایش از نوع errors است؛ GoogleGenerativeAIEmbeddings خطای 429
+    (ResourceExhausted) را در GoogleGenerativeAIError می‌پیچد (raise ... from).
+    """
+    while error is not None:
+        if isinstance(error, errors):
+            return True
+        error = error.__cause__
+    return False
+
+
+class EmbeddingCache:
+    """
+    بردارهای embedding روی SQLite با کلید (مدل، hash متن چانک). متن یکسان در هر سند و
+    هر اجرایی فقط یک بار embed می‌شود.
+    """
+
+    def __init__(self, path=":memory:"):
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def get_many(self, model, hashes):
+        found = {}
+        hashes = list(hashes)
+        with self._lock:
+            for i in range(0, len(hashes), LOOKUP_CHUNK):
+                part = hashes[i : i + LOOKUP_CHUNK]
+                rows = self.conn.execute(
+                    "SELECT hash, vector FROM embeddings WHERE model=? AND hash IN "
+                    f"({','.join('?' * len(part))})",
+                    (model, *part),
+                )
+                for digest, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[digest] = vector.tolist()
+        return found
+
+    def put_many(self, model, items):
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                [(model, digest, array("f", v).tobytes()) for digest, v in items],
+            )
+            self.conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+class BatchEmbedder(Embeddings):
+    """
+    لایه‌ی embedding جلوی مدل اصلی (مثلاً GoogleGenerativeAIEmbeddings):
+
+    - متن‌های تکراری و متن‌هایی که در cache هستند دوباره فرستاده نمی‌شوند
+    - بقیه در دسته‌های batch_size با حداکثر concurrency درخواست هم‌زمان فرستاده می‌شوند
+    - بعد از خطای rate limit همه‌ی درخواست‌ها مکث می‌کنند (backoff نمایی برای دسته‌ی
+      ردشده، تا max_retries بار) و فاصله‌ی بین شروع درخواست‌ها دو برابر می‌شود؛ با هر
+      درخواست موفق این فاصله کم‌کم کوتاه می‌شود
+
+    rate_limit_errors نوع خطاهای rate limit مدل اصلی است (پیش‌فرض: 429 کتابخانه‌ی گوگل).
+    embed_query مستقیم به مدل اصلی می‌رود. شمارنده‌ها در self.stats: cached،
+    embedded، requests، rate_limited.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        model,
+        cache=None,
+        batch_size=BATCH_SIZE,
+        concurrency=CONCURRENCY,
+        max_retries=MAX_RETRIES,
+        rate_limit_errors=RATE_LIMIT_ERRORS,
+    ):
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = cache
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.rate_limit_errors = rate_limit_errors
+        self.stats = {"cached": 0, "embedded": 0, "requests": 0, "rate_limited": 0}
+        self._interval = 0.0
+        self._next_start = 0.0
+        self._lock = threading.Lock()
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def _wait_turn(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self._interval
+        if start > now:
+            time.sleep(start - now)
+
+    def _embed_batch(self, texts):
+        for attempt in range(self.max_retries + 1):
+            self._wait_turn()
+            try:
+                vectors = self.embeddings.embed_documents(texts)
+            except Exception as e:
+                if (
+                    not is_rate_limited(e, self.rate_limit_errors)
+                    or attempt == self.max_retries
+                ):
+                    raise
+                with self._lock:
+                    self.stats["rate_limited"] += 1
+                    self._interval = min(
+                        MAX_INTERVAL, max(MIN_INTERVAL, self._interval * 2)
+                    )
+                    # بقیه‌ی درخواست‌ها هم پشت این مکث صف می‌کشند
+                    pause = max(self._interval, BACKOFF * 2**attempt)
+                    self._next_start = max(
+                        self._next_start,
+                        time.monotonic() + pause * random.uniform(1, 1.5),
+                    )
+                continue
+            with self._lock:
+                self.stats["requests"] += 1
+                self._interval *= SPEEDUP
+                if self._interval < MIN_INTERVAL / 2:
+                    self._interval = 0.0
+            return vectors
+
+    def embed_documents(self, texts):
+        hashes = [text_hash(text) for text in texts]
+        unique = dict(zip(hashes, texts))
+        vectors = {}
+        if self.cache is not None:
+            vectors = self.cache.get_many(self.model, unique)
+        self._count("cached", len(vectors))
+        missing = [(h, t) for h, t in unique.items() if h not in vectors]
+        batches = [
+            missing[i : i + self.batch_size]
+            for i in range(0, len(missing), self.batch_size)
+        ]
+        with ThreadPoolExecutor(max_workers=max(1, self.concurrency)) as pool:
+            futures = {
+                pool.submit(self._embed_batch, [t for _, t in batch]): batch
+                for batch in batches
+            }
+            for future in as_completed(futures):
+                batch = futures[future]
+                items = list(zip((h for h, _ in batch), future.result()))
+                vectors.update(items)
+                # هر دسته همان لحظه ذخیره می‌شود تا قطع شدن وسط کار هدر نرود
+                if self.cache is not None:
+                    self.cache.put_many(self.model, items)
+                self._count("embedded", len(items))
+        return [vectors[h] for h in hashes]
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
@@ -0,0 +1,239 @@
+import math
+import re
+import statistics
+import time
+from collections import Counter, defaultdict, deque
+
+
+K1 = 1.5
+B = 0.75
+RRF_K = 60  # ثابت reciprocal rank fusion؛ رتبه‌های بالا وزن بیشتری می‌گیرند
+BM25_WEIGHT = 0.5  # وزن BM25 در fusion نسبت به جستجوی برداری
+# سؤالی که کد دارد (توکنی با حداقل ۴ رقم) جوابش را فقط BM25 پیدا می‌کند
+CODE_WEIGHT = 2.0
+CODE = re.compile(r"\d{4}")
+CANDIDATES = 20  # نامزد از هر retriever قبل از ادغام
+TOP_K = 5
+
+# شماره‌ی قطعه و کدهایی مثل C112216-0042 یا 7.12 یک توکن‌اند؛
+# تکه‌هایشان هم جدا index می‌شوند
+TOKEN = re.compile(r"\w+(?:[-./]\w+)*")
+PARTS = re.compile(r"[-./]")
+SUFFIXES = ("ing", "ed", "es", "e", "s")  # «replaced» و «replace» هر دو «replac»
+STOPWORDS = {
+    "a", "an", "the", "of", "to", "in", "on", "for", "and", "or", "is", "are", "be",
+    "what", "which", "how", "when", "should", "does", "do", "with", "by", "at", "it",
+    "this", "that", "from", "as", "every", "often", "many", "much",
+}
+
+
+def stem(token):
+    if len(token) > 4 and token.isalpha():
+        for suffix in SUFFIXES:
+            if token.endswith(suffix):
+                return token[: -len(suffix)]
+    return token
+
+
+def tokenize(text):
+    tokens = []
+    for token in TOKEN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(stem(token))
+        parts = PARTS.split(token)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part)
+    return tokens
+
+
+def rrf(rankings, k=RRF_K, weights=None):
+    """
+    reciprocal rank fusion: [(id، امتیاز)] از چند لیست id مرتب‌شده. weights (یکی برای
+    هر لیست، پیش‌فرض همه ۱) سهم هر retriever را تعیین می‌کند.
+    """
+    scores = defaultdict(float)
+    for ranking, weight in zip(rankings, weights or [1.0] * len(rankings)):
+        for rank, chunk_id in enumerate(ranking, 1):
+            scores[chunk_id] += weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+class BM25Index:
+    """
+    inverted index محلی با امتیاز BM25 روی همان چانک‌های FAISS (کلید: id چانک).
+    sync(vector_store) فقط چانک‌های اضافه‌شده و حذف‌شده را اعمال می‌کند.
+    """
+
+    def __init__(self, k1=K1, b=B):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)  # توکن -> {id چانک: تعداد}
+        self.lengths = {}  # id چانک -> تعداد توکن
+        self.total_length = 0
+        self._terms = {}  # id چانک -> توکن‌هایش، برای حذف
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def add(self, chunk_id, text):
+        if chunk_id in self.lengths:
+            self.remove(chunk_id)
+        counts = Counter(tokenize(text))
+        for token, count in counts.items():
+            self.postings[token][chunk_id] = count
+        self.lengths[chunk_id] = sum(counts.values())
+        self.total_length += self.lengths[chunk_id]
+        self._terms[chunk_id] = list(counts)
+
+    def remove(self, chunk_id):
+        for token in self._terms.pop(chunk_id, []):
+            postings = self.postings[token]
+            postings.pop(chunk_id, None)
+            if not postings:
+                del self.postings[token]
+        self.total_length -= self.lengths.pop(chunk_id, 0)
+
+    def sync(self, vector_store):
+        """خروجی: (تعداد اضافه‌شده، تعداد حذف‌شده)"""
+        ids = set(vector_store.index_to_docstore_id.values()) if vector_store else set()
+        stale = set(self.lengths) - ids
+        for chunk_id in stale:
+            self.remove(chunk_id)
+        added = ids - set(self.lengths)
+        for chunk_id in added:
+            self.add(chunk_id, vector_store.docstore.search(chunk_id).page_content)
+        return len(added), len(stale)
+
+    def idf(self, token):
+        n = len(self.lengths)
+        df = len(self.postings.get(token, ()))
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query, k=CANDIDATES):
+        """[(id چانک، امتیاز)] به ترتیب امتیاز"""
+        if not self.lengths:
+            return []
+        average = self.total_length / len(self.lengths)
+        scores = defaultdict(float)
+        for token in set(tokenize(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = self.idf(token)
+            for chunk_id, tf in postings.items():
+                length = self.lengths[chunk_id] / average
+                norm = tf + self.k1 * (1 - self.b + self.b * length)
+                scores[chunk_id] += idf * tf * (self.k1 + 1) / norm
+        return sorted(scores.items(), key=lambda item: -item[1])[:k]
+
+
+class HybridRetriever:
+    """
+    جستجوی برداری FAISS و BM25 محلی روی همان چانک‌ها، ادغام با reciprocal rank fusion
+    وزن‌دار و در صورت rerank=True مرتب‌سازی دوباره‌ی محلی: بهترین خط هر چانک چه سهمی از
+    توکن‌های سؤال را (با وزن idf) دارد. برای شماره‌ی قطعه و کدها که embedding خوب
+    نمی‌شناسد، BM25 و rerank جواب دقیق را بالا می‌آورند؛ وزن BM25 در fusion برای
+    سؤال‌های کددار code_weight و برای بقیه bm25_weight است، تا بدون rerank هم جواب
+    دقیق کد از دست نرود.
+
+    sync(vector_store) را بعد از هر به‌روزرسانی index صدا بزنید.
+    زمان هر مرحله در self.timings؛ summary() میانه و p95 را به میلی‌ثانیه می‌دهد.
+    """
+
+    STAGES = ("vector", "bm25", "fusion", "rerank")
+
+    def __init__(
+        self,
+        k=TOP_K,
+        candidates=CANDIDATES,
+        rerank=True,
+        bm25_weight=BM25_WEIGHT,
+        code_weight=CODE_WEIGHT,
+    ):
+        self.k = k
+        self.candidates = candidates
+        self.rerank = rerank
+        self.bm25_weight = bm25_weight
+        self.code_weight = code_weight
+        self.bm25 = BM25Index()
+        self.vector_store = None
+        self.timings = {stage: deque(maxlen=10000) for stage in self.STAGES}
+
+    def sync(self, vector_store):
+        self.vector_store = vector_store
+        return self.bm25.sync(vector_store)
+
+    def _timed(self, stage, started):
+        now = time.perf_counter()
+        self.timings[stage].append(now - started)
+        return now
+
+    @staticmethod
+    def _line_score(weights, text):
+        """سهم وزن‌دار توکن‌های سؤال در بهترین خط چانک"""
+        total = sum(weights.values()) or 1.0
+        best = 0.0
+        for line in text.splitlines():
+            present = set(tokenize(line))
+            best = max(best, sum(w for t, w in weights.items() if t in present))
+        return best / total
+
+    def weights(self, question):
+        """وزن [vector، bm25] در fusion"""
+        has_code = any(CODE.search(token) for token in TOKEN.findall(question))
+        return [1.0, self.code_weight if has_code else self.bm25_weight]
+
+    def rankings(self, question):
+        """
+        id چانک‌ها به ترتیب برای هر مرحله (vector، bm25، fused و با rerank، reranked)
+        و Documentهایی که سر راه خوانده شد
+        """
+        started = time.perf_counter()
+        hits = self.vector_store.similarity_search(question, k=self.candidates)
+        docs = {doc.id: doc for doc in hits}
+        vector = list(docs)
+        started = self._timed("vector", started)
+        bm25 = [chunk_id for chunk_id, _ in self.bm25.search(question, self.candidates)]
+        started = self._timed("bm25", started)
+        fused = [
+            chunk_id
+            for chunk_id, _ in rrf([vector, bm25], weights=self.weights(question))
+        ]
+        started = self._timed("fusion", started)
+        result = {"vector": vector, "bm25": bm25, "fused": fused}
+        if self.rerank:
+            weights = {t: self.bm25.idf(t) for t in set(tokenize(question))}
+            for chunk_id in fused:
+                if chunk_id not in docs:
+                    docs[chunk_id] = self.vector_store.docstore.search(chunk_id)
+            # مرتب‌سازی پایدار: هم‌امتیازها ترتیب fusion را نگه می‌دارند
+            result["reranked"] = sorted(
+                fused,
+                key=lambda chunk_id: -self._line_score(
+                    weights, docs[chunk_id].page_content
+                ),
+            )
+            self._timed("rerank", started)
+        return result, docs
+
+    def retrieve(self, question):
+        if self.vector_store is None:
+            return []
+        result, docs = self.rankings(question)
+        ranking = result.get("reranked", result["fused"])
+        return [
+            docs.get(chunk_id) or self.vector_store.docstore.search(chunk_id)
+            for chunk_id in ranking[: self.k]
+        ]
+
+    def summary(self):
+        summary = {}
+        for stage, timings in self.timings.items():
+            if timings:
+                values = sorted(timings)
+                summary[stage] = {
+                    "p50_ms": 1000 * statistics.median(values),
+                    "p95_ms": 1000 * values[min(len(values) - 1, int(len(values) * 0.95))],
+                }
+        return summary
@@ -0,0 +1,280 @@
+import hashlib
+import json
+import os
+import time
+from itertools import groupby
+
+from langchain_community.vectorstores import FAISS
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+
+MANIFEST = "manifest.json"
+MANIFEST_VERSION = 2
+HASH_BLOCK = 1 << 20  # بایت؛ فایل‌های بزرگ تکه‌تکه hash می‌شوند
+EXTENSIONS = (".pdf",)
+BATCH_CHUNKS = 512  # چانک‌هایی که با هم embed و به FAISS اضافه می‌شوند
+
+
+def file_hash(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def text_hash(text):
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def scan_documents(directory, extensions=EXTENSIONS):
+    """{doc_id: path}؛ doc_id مسیر نسبی فایل در directory است"""
+    sources = {}
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(extensions):
+                path = os.path.join(root, name)
+                sources[os.path.relpath(path, directory).replace(os.sep, "/")] = path
+    return sources
+
+
+class PersistentIndex:
+    """
+    FAISS ذخیره‌شده روی دیسک که با تغییر مجموعه‌ی اسناد به‌روز می‌شود، نه از نو ساخته.
+    manifest برای هر سند hash محتوا، اندازه، mtime و id چانک‌هایش را نگه می‌دارد، به
+    علاوه‌ی پارامترهای splitter و مدل embedding.
+
+    update(sources, load):
+    - سندی که اندازه و mtime یا hash آن عوض نشده اصلاً خوانده نمی‌شود
+    - سند جدید یا تغییرکرده صفحه به صفحه split و هر batch_chunks چانک embed می‌شود؛
+      فقط چانک‌هایی embed می‌شوند که متنشان در نسخه‌ی قبلی همان سند نبود و بقیه
+      بردار قبلی را می‌گیرند
+    - بردارهای سندهای حذف‌شده از FAISS پاک می‌شوند
+    - تغییر splitter یا مدل embedding یعنی ساخت کامل
+
+    هر چانک doc_id، page و chunk_hash را در metadata دارد (برای ارجاع در جواب).
+    manifest آخر از همه نوشته می‌شود، پس ذخیره‌ی نیمه‌کاره در اجرای بعد دوباره ساخته می‌شود.
+    شمارنده‌ها در self.stats: loaded، embedded، reused، deleted، seconds (آخرین update).
+    """
+
+    def __init__(
+        self, path, embeddings, embedding_model, splitter, batch_chunks=BATCH_CHUNKS
+    ):
+        self.path = path
+        self.embeddings = embeddings
+        self.embedding_model = embedding_model
+        self.splitter = splitter  # dict پارامترها، مثلاً chunk_size و chunk_overlap
+        self.text_splitter = RecursiveCharacterTextSplitter(**splitter)
+        self.batch_chunks = batch_chunks
+        self.stats = {
+            "loaded": 0, "embedded": 0, "reused": 0, "deleted": 0, "seconds": 0.0,
+        }
+        self.vector_store = None
+        self.documents = None  # doc_id -> {hash، size، mtime، chunks}
+
+    def settings(self):
+        return {
+            "version": MANIFEST_VERSION,
+            "splitter": self.splitter,
+            "embedding_model": self.embedding_model,
+        }
+
+    def saved_manifest(self):
+        try:
+            with open(os.path.join(self.path, MANIFEST), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def open(self):
+        """وضعیت ذخیره‌شده را می‌خواند؛ اگر نبود یا تنظیماتش فرق داشت، index خالی"""
+        self.vector_store, self.documents = None, {}
+        manifest = self.saved_manifest()
+        if manifest is None or manifest.get("settings") != self.settings():
+            return
+        if manifest["documents"]:
+            try:
+                # فایل pickle را خودمان نوشته‌ایم
+                self.vector_store = FAISS.load_local(
+                    self.path, self.embeddings, allow_dangerous_deserialization=True
+                )
+            except Exception as e:
+                print(f"Saved index is unreadable ({e}), rebuilding.")
+                return
+        self.documents = manifest["documents"]
+        self.stats["loaded"] += 1
+
+    def save(self):
+        os.makedirs(self.path, exist_ok=True)
+        manifest_path = os.path.join(self.path, MANIFEST)
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        if self.vector_store is not None:
+            self.vector_store.save_local(self.path)
+        tmp = manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {"settings": self.settings(), "documents": self.documents},
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+        os.replace(tmp, manifest_path)
+
+    def _delete(self, ids):
+        if ids and self.vector_store is not None:
+            self.vector_store.delete(ids)
+            self.stats["deleted"] += len(ids)
+
+    def _old_vectors(self, ids):
+        """chunk_hash -> بردار، برای چانک‌های نسخه‌ی قبلی یک سند"""
+        if not ids or self.vector_store is None:
+            return {}
+        wanted = set(ids)
+        vectors = {}
+        for position, chunk_id in self.vector_store.index_to_docstore_id.items():
+            if chunk_id in wanted:
+                doc = self.vector_store.docstore.search(chunk_id)
+                vectors[doc.metadata["chunk_hash"]] = self.vector_store.index.reconstruct(
+                    position
+                ).tolist()
+        return vectors
+
+    def _store(self, pairs, metadatas, ids):
+        if not pairs:
+            return
+        if self.vector_store is None:
+            self.vector_store = FAISS.from_embeddings(
+                pairs, self.embeddings, metadatas=metadatas, ids=ids
+            )
+        else:
+            self.vector_store.add_embeddings(pairs, metadatas=metadatas, ids=ids)
+
+    def _add(self, doc_id, batch, old, keep, deferred):
+        """
+        batch: [(شماره، چانک)]. فقط چانک‌هایی embed می‌شوند که متنشان در نسخه‌ی قبلی
+        سند نبود؛ چانکی که id و metadata ـش عوض نشده همان‌جا در FAISS می‌ماند و چانکی
+        که فقط metadata ـش عوض شده به deferred می‌رود (id قبلی هنوز در FAISS است).
+        خروجی: idهایی که به FAISS اضافه شد.
+        """
+        pairs, metadatas, ids, new = [], [], [], []
+        for n, chunk in batch:
+            chunk.metadata["doc_id"] = doc_id
+            chunk.metadata["chunk_hash"] = text_hash(chunk.page_content)
+            # id با متن عوض می‌شود تا index‌های دیگر (BM25) چانک تغییرکرده را تشخیص دهند
+            chunk_id = f"{doc_id}#{n}-{chunk.metadata['chunk_hash'][:12]}"
+            if chunk_id in keep:
+                if self.vector_store.docstore.search(chunk_id).metadata == chunk.metadata:
+                    keep[chunk_id] = True
+                    self.stats["reused"] += 1
+                else:
+                    deferred.append((chunk_id, chunk))
+                continue
+            ids.append(chunk_id)
+            metadatas.append(chunk.metadata)
+            pairs.append([chunk.page_content, old.get(chunk.metadata["chunk_hash"])])
+            if pairs[-1][1] is None:
+                new.append(pairs[-1])
+        embedded = self.embeddings.embed_documents([text for text, _ in new])
+        for pair, vector in zip(new, embedded):
+            pair[1] = vector
+        self.stats["embedded"] += len(new)
+        self.stats["reused"] += len(pairs) - len(new)
+        self._store([tuple(pair) for pair in pairs], metadatas, ids)
+        return ids
+
+    def _index_document(self, changed, pages, summary):
+        """
+        هر صفحه همان لحظه که می‌رسد split می‌شود (نتیجه مثل split_documents(pages)) و
+        هر batch_chunks چانک embed و به FAISS اضافه می‌شود، پس کل سند یک‌جا در حافظه
+        نیست. چانک‌های نسخه‌ی قبلی فقط بعد از اضافه شدن همه‌ی چانک‌های جدید حذف
+        می‌شوند و entry ـی manifest آخر از همه نوشته می‌شود: اگر خواندن، embedding یا
+        افزودن وسط سند خطا داد، چانک‌های اضافه‌شده‌ی همین دور پاک می‌شوند و index و
+        manifest همان نسخه‌ی قبلی سند را دارند.
+        """
+        doc_id, digest, stat, entry = changed
+        old_ids = entry["chunks"] if entry else []
+        old = self._old_vectors(old_ids)
+        keep = dict.fromkeys(old_ids, False)  # id قبلی -> هنوز در سند هست؟
+        had_store = self.vector_store is not None
+        ids, batch, added, deferred = [], [], [], []
+        try:
+            for page in pages:
+                for chunk in self.text_splitter.split_documents([page]):
+                    batch.append((len(ids), chunk))
+                    ids.append(
+                        f"{doc_id}#{len(ids)}-{text_hash(chunk.page_content)[:12]}"
+                    )
+                    if len(batch) >= self.batch_chunks:
+                        added += self._add(doc_id, batch, old, keep, deferred)
+                        batch = []
+            added += self._add(doc_id, batch, old, keep, deferred)
+        except BaseException:
+            if not had_store:
+                self.vector_store = None
+            elif added:
+                self.vector_store.delete(added)
+            raise
+        # چانک‌هایی که فقط metadata ـشان عوض شده (مثلاً صفحه) با همان بردار قبلی
+        self._delete([chunk_id for chunk_id, kept in keep.items() if not kept])
+        self._store(
+            [(c.page_content, old[c.metadata["chunk_hash"]]) for _, c in deferred],
+            [c.metadata for _, c in deferred],
+            [chunk_id for chunk_id, _ in deferred],
+        )
+        self.stats["reused"] += len(deferred)
+        self.documents[doc_id] = {
+            "hash": digest,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "chunks": ids,
+        }
+        summary["changed" if entry else "added"] += 1
+
+    def update(self, sources, load):
+        """
+        sources: {doc_id: path}، مثلاً از scan_documents. load(paths) صفحه‌های همه‌ی
+        سندها را به ترتیب همان paths و شماره‌ی صفحه برمی‌گرداند (مثلاً
+        ParallelPDFLoader.lazy_load) و metadata ـی source هر صفحه همان path است.
+        خروجی: تعداد سندهای added، changed، removed و unchanged.
+        """
+        start = time.perf_counter()
+        if self.documents is None:
+            self.open()
+        summary = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0}
+        dirty = False
+        changed = {}  # path -> (doc_id، hash، stat، entry قبلی)
+        for doc_id, path in sorted(sources.items()):
+            stat = os.stat(path)
+            entry = self.documents.get(doc_id)
+            if entry and (entry["size"], entry["mtime"]) == (stat.st_size, stat.st_mtime):
+                summary["unchanged"] += 1
+                continue
+            digest = file_hash(path)
+            dirty = True
+            if entry and entry["hash"] == digest:
+                # فقط mtime عوض شده (کپی، touch)
+                entry["size"], entry["mtime"] = stat.st_size, stat.st_mtime
+                summary["unchanged"] += 1
+                continue
+            changed[path] = (doc_id, digest, stat, entry)
+        try:
+            if changed:
+                pages = load(list(changed))
+                for path, document in groupby(
+                    pages, key=lambda p: p.metadata["source"]
+                ):
+                    self._index_document(changed.pop(path), document, summary)
+                # PDF بدون صفحه
+                for item in changed.values():
+                    self._index_document(item, [], summary)
+            for doc_id in sorted(set(self.documents) - set(sources)):
+                self._delete(self.documents.pop(doc_id)["chunks"])
+                summary["removed"] += 1
+                dirty = True
+        finally:
+            # هر سند یا کامل اعمال شده یا اصلاً؛ سندهای تمام‌شده حتی بعد از خطا ذخیره می‌شوند
+            if dirty:
+                self.save()
+        self.stats["seconds"] = time.perf_counter() - start
+        return summary
@@ -3,14 +3,16 @@ from dotenv import load_dotenv
 from typing import TypedDict, List
 
 
-from langchain_community.document_loaders import PDFPlumberLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 from langgraph.graph import StateGraph, START, END
 
+from embedding import BatchEmbedder, EmbeddingCache
+from hybrid import HybridRetriever
+from index_store import PersistentIndex, scan_documents
+from pdf_loader import ParallelPDFLoader
+
 load_dotenv()
 if not os.getenv("GOOGLE_API_KEY"):
     print("Error: GOOGLE_API_KEY missing.")
@@ -20,49 +22,95 @@ if not os.getenv("GROQ_API_KEY"):
     print("Error: GROQ_API_KEY missing.")
     print("Please create a .env file with: GROQ_API_KEY=your_groq_api_key_here")
     exit(1)
-PDF_PATH = r"E:\AI_Engineering\Practicing_Ai_Agentic\AI\7\data\000-128 C112216.pdf"
+# همه‌ی PDFهای این پوشه index می‌شوند؛ با هر سؤال تغییرات پوشه هم اعمال می‌شود
+DOCS_DIR = os.getenv(
+    "DOCS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+)
 
-if not os.path.exists(PDF_PATH):
-    print(f"Error: File not found at {PDF_PATH}")
-    print("Please create a 'data' folder and put a PDF file named 'sample.pdf' in it.")
+if not os.path.isdir(DOCS_DIR):
+    print(f"Error: Folder not found at {DOCS_DIR}")
+    print("Please create a 'data' folder and put your PDF files in it.")
     exit(1)
 
-loader = PDFPlumberLoader(PDF_PATH)
-docs = loader.load()
-print(f"Loaded {len(docs)} pages.")
+# index ساخته‌شده کنار همین فایل ذخیره می‌شود؛ فقط چانک‌های تازه embed می‌شوند
+INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "faiss_index")
+EMBEDDING_MODEL = "models/text-embedding-004"
+# بردار هر متن یک بار برای همیشه؛ index از نو ساخته شود هم دوباره embed نمی‌شود
+EMBEDDING_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "embeddings.sqlite"
+)
+EMBED_BATCH_SIZE = 100
+EMBED_CONCURRENCY = 4
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+TOP_K = 5
+# نامزد از FAISS و BM25 برای ادغام؛ rerank محلی جواب‌های دقیق (شماره‌ی قطعه) را بالا می‌آورد
+CANDIDATES = 20
+RERANK = True
+
+
+# استخراج صفحه‌ها در چند پروسه؛ با PDF_WORKERS=1 یا یک فایل، همان PDFPlumberLoader قبلی
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", os.cpu_count() or 1))
+PAGES_PER_TASK = 8
+pdf_loader = ParallelPDFLoader(workers=PDF_WORKERS, pages_per_task=PAGES_PER_TASK)
+
+
+embeddings = BatchEmbedder(
+    GoogleGenerativeAIEmbeddings(
+        model=EMBEDDING_MODEL,
+        api_key=os.getenv("GOOGLE_API_KEY"),
+    ),
+    EMBEDDING_MODEL,
+    cache=EmbeddingCache(EMBEDDING_CACHE_PATH),
+    batch_size=EMBED_BATCH_SIZE,
+    concurrency=EMBED_CONCURRENCY,
+)
+index = PersistentIndex(
+    INDEX_DIR,
+    embeddings,
+    EMBEDDING_MODEL,
+    {"chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP},
+)
+
+retriever = HybridRetriever(k=TOP_K, candidates=CANDIDATES, rerank=RERANK)
 
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
 
-splits = text_splitter.split_documents(docs)
-print(f"Created {len(splits)} chunks.")
-# اینو بذار تو کدت ببین چی چاپ میکنه
-print("--- نمونه متن استخراج شده ---")
-print(splits[0].page_content[:500])  # ۵۰۰ حرف اول رو چاپ کن
-print("-----------------------------")
+def refresh_index():
+    changes = index.update(scan_documents(DOCS_DIR), pdf_loader.lazy_load)
+    # BM25 فقط چانک‌های اضافه یا حذف‌شده‌ی FAISS را اعمال می‌کند
+    retriever.sync(index.vector_store)
+    if changes["added"] or changes["changed"] or changes["removed"]:
+        print(
+            f"Vector Store Updated ✅ {changes} "
+            f"({index.stats['seconds']:.1f}s, embeddings: {embeddings.stats}, "
+            f"pdf: {pdf_loader.stats})"
+        )
+    return changes
 
-embeddings = GoogleGenerativeAIEmbeddings(
-    model="models/text-embedding-004",
-    api_key=os.getenv("GOOGLE_API_KEY"),
-)
-vector_store = FAISS.from_documents(splits, embeddings)
-print("Vector Store Created Successfully! ✅")
 
-retriever = vector_store.as_retriever(search_kwargs={"k": 5})
+def cite(doc):
+    """[doc_id p.N]؛ شماره‌ی صفحه‌ی PDFPlumberLoader از صفر است"""
+    page = doc.metadata.get("page")
+    if page is None:
+        return f"[{doc.metadata['doc_id']}]"
+    return f"[{doc.metadata['doc_id']} p.{page + 1}]"
 
 
 class State(TypedDict):
     question: str
     context: List[str]
+    sources: List[str]
     answer: str
 
 
 def retriever_node(state: State):
     question = state["question"]
     print(f"🔍 Searching for: {question}")
-    documents = retriever.invoke(question)
+    documents = retriever.retrieve(question)
 
-    context_text = [doc.page_content for doc in documents]
-    return {"context": context_text}
+    # هر چانک با منبعش به مدل داده می‌شود تا در جواب به آن ارجاع دهد
+    context_text = [f"{cite(doc)} {doc.page_content}" for doc in documents]
+    return {"context": context_text, "sources": [cite(doc) for doc in documents]}
 
 
 def generate_node(state: State):
@@ -73,6 +121,7 @@ def generate_node(state: State):
         """
     You are a helpful assistant. Answer the question based ONLY on the following context.
     If the answer is not in the context, say "I don't know based on this document."
+    Cite the [document p.N] tag of every passage you use.
     
     Context:
     {context}
@@ -103,13 +152,25 @@ graph = builder.compile()
 
 
 def main():
+    # اینجا و نه موقع import: پروسه‌های ParallelPDFLoader در ویندوز این فایل را import می‌کنند
+    refresh_index()
+    if index.vector_store is None:
+        print(f"Error: No PDF files with text found in {DOCS_DIR}")
+        exit(1)
+    print(
+        f"Vector Store Ready ✅ {len(index.documents)} documents, "
+        f"{index.vector_store.index.ntotal} chunks ({1000 * index.stats['seconds']:.0f}ms)"
+    )
     while True:
         question = input("Enter your question: ")
         if question.lower() in ["exit", "quit", "bye"]:
             break
+        refresh_index()
         result = graph.invoke({"question": question})
         print(f"📄 Retrieved Context (Summarized):\n{str(result['context'])[:200]}...")
+        print(f"📚 Sources: {', '.join(dict.fromkeys(result['sources']))}")
         print(f"🤖 Answer:\n{result['answer']}")
+    print(f"Retrieval latency: {retriever.summary()}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,105 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pdfplumber
+from langchain_community.document_loaders import PDFPlumberLoader
+from langchain_core.documents import Document
+
+
+PAGES_PER_TASK = 8
+WORKERS = os.cpu_count() or 1
+
+
+def _metadata(path, pdf):
+    # همان metadata ـی که PDFPlumberLoader می‌سازد (page از صفر)
+    return {
+        "source": path,
+        "file_path": path,
+        "total_pages": len(pdf.pages),
+        **{k: v for k, v in pdf.metadata.items() if type(v) in [str, int]},
+    }
+
+
+def extract_pages(path, start, stop):
+    """صفحه‌های [start، stop) یک PDF؛ در پروسه‌ی جدا اجرا می‌شود"""
+    with pdfplumber.open(path) as pdf:
+        metadata = _metadata(path, pdf)
+        return [
+            Document(
+                # همان متنی که PDFPlumberParser با تنظیمات پیش‌فرض می‌سازد
+                page_content=pdf.pages[n].extract_text() + "\n",
+                metadata={**metadata, "page": n},
+            )
+            for n in range(start, min(stop, len(pdf.pages)))
+        ]
+
+
+def page_count(path):
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
+
+
+def load_sequential(paths):
+    """loader قبلی: هر PDF با PDFPlumberLoader، صفحه به صفحه در همین پروسه"""
+    for path in paths:
+        yield from PDFPlumberLoader(path).lazy_load()
+
+
+class ParallelPDFLoader:
+    """
+    استخراج متن PDF با pdfplumber در یک process pool: هر فایل به بازه‌های
+    pages_per_task صفحه‌ای تقسیم می‌شود و بازه‌های همه‌ی فایل‌ها هم‌زمان پردازش می‌شوند.
+
+    lazy_load(paths) صفحه‌ها را به ترتیب فایل و شماره‌ی صفحه، با همان متن و metadata
+    ـی PDFPlumberLoader، به محض آماده شدن برمی‌گرداند. حداکثر max_pending بازه در
+    جریان است، پس کل سند هیچ‌وقت یک‌جا در حافظه نیست. با workers <= 1 یا فقط یک
+    فایل، هزینه‌ی process pool سود ندارد و همان load_sequential اجرا می‌شود.
+    شمارنده‌ها در self.stats: files، pages، seconds.
+    """
+
+    def __init__(self, workers=WORKERS, pages_per_task=PAGES_PER_TASK, max_pending=None):
+        self.workers = workers
+        self.pages_per_task = pages_per_task
+        self.max_pending = max_pending or 2 * workers
+        self.stats = {"files": 0, "pages": 0, "seconds": 0.0}
+
+    def _tasks(self, paths):
+        for path in paths:
+            self.stats["files"] += 1
+            total = page_count(path)
+            for start in range(0, total, self.pages_per_task):
+                yield path, start, start + self.pages_per_task
+
+    def _sequential(self, paths):
+        self.stats["files"] += len(paths)
+        for page in load_sequential(paths):
+            self.stats["pages"] += 1
+            yield page
+
+    def lazy_load(self, paths):
+        start = time.perf_counter()
+        paths = list(paths)
+        if self.workers <= 1 or len(paths) <= 1:
+            yield from self._sequential(paths)
+            self.stats["seconds"] += time.perf_counter() - start
+            return
+        tasks = self._tasks(paths)
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for task in tasks:
+                pending.append(pool.submit(extract_pages, *task))
+                if len(pending) >= self.max_pending:
+                    break
+            while pending:
+                pages = pending.popleft().result()
+                task = next(tasks, None)
+                if task is not None:
+                    pending.append(pool.submit(extract_pages, *task))
+                self.stats["pages"] += len(pages)
+                yield from pages
+        self.stats["seconds"] += time.perf_counter() - start
+
+    def load(self, paths):
+        return list(self.lazy_load(paths))
@@ -1,4 +1,5 @@
 import os
+import sys
 from dotenv import load_dotenv
 from typing import Annotated
 from typing_extensions import TypedDict
@@ -10,8 +11,12 @@ from langchain_core.messages import HumanMessage, SystemMessage
 
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
-from langgraph.prebuilt import ToolNode, tools_condition
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.prebuilt import tools_condition
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.checkpoint import SqliteDeltaSaver
+from common.history import manage_history, with_summary
+from common.tools import ParallelToolNode
 
 # 1. تنظیمات اولیه
 load_dotenv()
@@ -41,26 +46,45 @@ llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
 llm_with_tools = llm.bind_tools(tools)
 
 # 4. تعریف استیت
+# تاریخچه محدود: فقط چند نوبت آخر کامل می‌ماند و بقیه در summary خلاصه می‌شود
+KEEP_LAST_TURNS = 4
+SUMMARIZE_AFTER_TURNS = 8
+TOOL_PAYLOAD_LIMIT = 1500  # متن کامل ایمیل‌ها بعد از استفاده از تاریخچه حذف می‌شود
+
 class State(TypedDict):
     messages: Annotated[list, add_messages]
+    summary: str
 
 # 5. تعریف نودها
 def reasoner_node(state: State):
-    return {"messages": [llm_with_tools.invoke(state["messages"])]}
+    messages = with_summary(state["messages"], state.get("summary", ""))
+    return {"messages": [llm_with_tools.invoke(messages)]}
+
+def history_node(state: State):
+    return manage_history(
+        state, llm, KEEP_LAST_TURNS, SUMMARIZE_AFTER_TURNS, TOOL_PAYLOAD_LIMIT
+    )
 
-tool_node = ToolNode(tools)
+# چند جستجو/خواندن ایمیل در یک پیام هم‌زمان اجرا می‌شوند
+tool_node = ParallelToolNode(tools, default_limit=4, timeout=30)
 
 # 6. ساخت گراف
 builder = StateGraph(State)
 
 builder.add_node("reasoner", reasoner_node)
 builder.add_node("tools", tool_node)
+builder.add_node("history", history_node)
 
 builder.add_edge(START, "reasoner")
-builder.add_conditional_edges("reasoner", tools_condition)
+builder.add_conditional_edges(
+    "reasoner", tools_condition, {"tools": "tools", END: "history"}
+)
 builder.add_edge("tools", "reasoner")
+builder.add_edge("history", END)
 
-memory = MemorySaver()
+memory = SqliteDeltaSaver(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "checkpoints.sqlite")
+)
 graph = builder.compile(checkpointer=memory)
 
 # 7. اجرا
@@ -81,16 +105,22 @@ def main():
         
         for event in graph.stream({"messages": msgs}, config):
             for node_name, value in event.items():
+                if node_name == "history":
+                    continue
                 last_msg = value["messages"][-1]
                 
                 if node_name == "reasoner":
                     if last_msg.tool_calls:
-                        print(f"🛠️ AI is calling tool: {last_msg.tool_calls[0]['name']}")
+                        for call in last_msg.tool_calls:
+                            print(f"🛠️ AI is calling tool: {call['name']}")
                     elif last_msg.content:
                         print(f"🤖 AI: {last_msg.content}")
                 
                 elif node_name == "tools":
-                    print("✅ Tool Executed.")
+                    for msg in value["messages"]:
+                        elapsed = msg.response_metadata["elapsed"]
+                        status = "❌ Tool Failed" if msg.status == "error" else "✅ Tool Executed"
+                        print(f"{status}: {msg.name} ({elapsed:.2f}s)")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""
+مقایسه MemorySaver و SqliteDeltaSaver روی یک گراف چت ساده با LLM جعلی.
+
+    python -m common.bench_checkpoint --turns 10000
+
+اندازه‌گیری حافظه با tracemalloc اجرا را چند برابر کند می‌کند؛ برای دیدن
+تأخیر واقعی نوشتن از --no-memory استفاده کنید.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from typing import Annotated
+from typing_extensions import TypedDict
+
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import StateGraph, START, END
+from langgraph.graph.message import add_messages
+
+from common.checkpoint import SqliteDeltaSaver
+from common.history import manage_history, with_summary
+
+
+class State(TypedDict):
+    messages: Annotated[list, add_messages]
+    summary: str
+
+
+def build_graph(checkpointer, turns, bounded):
+    reply = "This is a fairly ordinary assistant answer. " * 5
+    llm = FakeMessagesListChatModel(
+        responses=[AIMessage(content=f"{reply}#{i}") for i in range(turns * 2)]
+    )
+
+    def chatbot_node(state: State):
+        messages = with_summary(state["messages"], state.get("summary", ""))
+        return {"messages": [llm.invoke(messages)]}
+
+    def history_node(state: State):
+        if not bounded:
+            return {}
+        return manage_history(state, llm, 4, 8)
+
+    builder = StateGraph(State)
+    builder.add_node("chatbot", chatbot_node)
+    builder.add_node("history", history_node)
+    builder.add_edge(START, "chatbot")
+    builder.add_edge("chatbot", "history")
+    builder.add_edge("history", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def timed(saver, timings):
+    put, put_writes = saver.put, saver.put_writes
+
+    def timed_put(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return put(*args, **kwargs)
+        finally:
+            timings.append(time.perf_counter() - start)
+
+    def timed_put_writes(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return put_writes(*args, **kwargs)
+        finally:
+            timings.append(time.perf_counter() - start)
+
+    saver.put, saver.put_writes = timed_put, timed_put_writes
+    return saver
+
+
+def run(name, make_saver, turns, bounded, trace_memory):
+    timings = []
+    if trace_memory:
+        tracemalloc.start()
+    saver = timed(make_saver(), timings)
+    graph = build_graph(saver, turns, bounded)
+    config = {"configurable": {"thread_id": "bench"}}
+    start = time.perf_counter()
+    for i in range(turns):
+        graph.invoke({"messages": [HumanMessage(content=f"question {i}")]}, config)
+    elapsed = time.perf_counter() - start
+    timings.sort()
+    line = (
+        f"{name:<18} total {elapsed:7.1f}s | write mean {statistics.mean(timings) * 1e3:6.3f}ms"
+        f" p95 {timings[int(len(timings) * 0.95)] * 1e3:6.3f}ms"
+    )
+    if trace_memory:
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        line += f" | memory {current / 2**20:7.1f}MB (peak {peak / 2**20:.1f}MB)"
+    print(line)
+    return saver
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=10000)
+    parser.add_argument(
+        "--unbounded",
+        action="store_true",
+        help="history node را خاموش می‌کند (MemorySaver در این حالت O(n^2) حافظه می‌گیرد)",
+    )
+    parser.add_argument("--no-memory", action="store_true")
+    args = parser.parse_args()
+    bounded = not args.unbounded
+    trace_memory = not args.no_memory
+
+    print(f"--- Checkpointer benchmark ({args.turns} turns) ---")
+    run("MemorySaver", MemorySaver, args.turns, bounded, trace_memory)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.sqlite")
+        saver = run(
+            "SqliteDeltaSaver",
+            lambda: SqliteDeltaSaver(path),
+            args.turns,
+            bounded,
+            trace_memory,
+        )
+        saver.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        print(f"SQLite file size: {os.path.getsize(path) / 2**20:.1f}MB")
+        saver.conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from langchain_core.tools import StructuredTool
+
+
+MAX_ENTRIES = 1024
+MAX_ENTRY_SIZE = 64 * 1024  # بایت، بعد از JSON شدن (content و artifact)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tool_cache (
+    tool TEXT, key TEXT, value TEXT, expires REAL,
+    PRIMARY KEY (tool, key)
+);
+"""
+
+_MISS = object()
+
+# name -> ToolCache، برای گزارش آمار همه‌ی ابزارهای cache شده
+caches = {}
+
+
+def normalize_args(value):
+    """آرگومان‌هایی که فقط در فاصله‌ها فرق دارند یک کلید می‌گیرند"""
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, dict):
+        return {k: normalize_args(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize_args(v) for v in value]
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+class ToolCache:
+    """
+    LRU در حافظه با یک لایه‌ی اختیاری SQLite روی دیسک.
+    ttl=None یعنی جواب هیچ‌وقت منقضی نمی‌شود (برای ابزارهای خالص).
+    شمارنده‌ها در self.stats: hits، disk_hits، misses، skipped.
+    """
+
+    def __init__(
+        self,
+        name,
+        maxsize=MAX_ENTRIES,
+        ttl=None,
+        disk=None,
+        max_entry_size=MAX_ENTRY_SIZE,
+    ):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_entry_size = max_entry_size
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "skipped": 0}
+        self._entries = OrderedDict()  # key -> (expires, value)
+        self._lock = threading.Lock()
+        self.conn = None
+        if disk:
+            self.conn = sqlite3.connect(disk, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(SCHEMA)
+
+    @staticmethod
+    def key(args):
+        text = json.dumps(
+            normalize_args(args), sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+    def _remember(self, key, expires, value):
+        self._entries[key] = (expires, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > now):
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[1]
+            self._entries.pop(key, None)
+            if self.conn is not None:
+                row = self.conn.execute(
+                    "SELECT value, expires FROM tool_cache WHERE tool=? AND key=?",
+                    (self.name, key),
+                ).fetchone()
+                if row is not None and (row[1] is None or row[1] > now):
+                    value = tuple(json.loads(row[0]))
+                    self._remember(key, row[1], value)
+                    self.stats["disk_hits"] += 1
+                    return value
+            self.stats["misses"] += 1
+            return _MISS
+
+    def put(self, key, value):
+        try:
+            text = json.dumps(value, ensure_ascii=False)
+        except (TypeError, ValueError):
+            text = None
+        with self._lock:
+            # جواب‌های خیلی بزرگ جای چند جواب کوچک را در LRU می‌گیرند
+            if text is None or len(text.encode()) > self.max_entry_size:
+                self.stats["skipped"] += 1
+                return
+            expires = time.time() + self.ttl if self.ttl is not None else None
+            self._remember(key, expires, value)
+            if self.conn is not None:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO tool_cache VALUES (?, ?, ?, ?)",
+                    (self.name, key, text, expires),
+                )
+                self.conn.commit()
+
+
+def cached(
+    maxsize=MAX_ENTRIES,
+    ttl=None,
+    disk=None,
+    max_entry_size=MAX_ENTRY_SIZE,
+    should_cache=None,
+):
+    """
+    دکوریتور برای ابزارهای قطعی (یا با ttl برای ابزارهایی مثل جستجو):
+
+        @cached(max_entry_size=4096)
+        @tool
+        def power(a: int, b: int) -> int: ...
+
+        search_tool = cached(ttl=3600)(TavilySearchResults(max_results=2))
+
+    یک ابزار هم‌نام با همان schema برمی‌گرداند که با آرگومان‌های نرمال‌شده
+    از cache جواب می‌دهد. should_cache(content, artifact) می‌تواند جواب‌هایی مثل
+    پیام خطا را از cache بیرون نگه دارد.
+    """
+
+    def decorate(tool):
+        cache = ToolCache(tool.name, maxsize, ttl, disk, max_entry_size)
+        caches[tool.name] = cache
+
+        def call(kwargs):
+            # ToolCall کامل تا artifact ابزارهای content_and_artifact هم برگردد
+            return {"name": tool.name, "args": kwargs, "id": "cache", "type": "tool_call"}
+
+        def store(key, message):
+            value = (message.content, message.artifact)
+            if message.status != "error" and (
+                should_cache is None or should_cache(*value)
+            ):
+                cache.put(key, value)
+            return value
+
+        def run(**kwargs):
+            key = cache.key(kwargs)
+            value = cache.get(key)
+            if value is not _MISS:
+                return value
+            return store(key, tool.invoke(call(kwargs)))
+
+        async def arun(**kwargs):
+            key = cache.key(kwargs)
+            value = cache.get(key)
+            if value is not _MISS:
+                return value
+            return store(key, await tool.ainvoke(call(kwargs)))
+
+        return StructuredTool.from_function(
+            func=run,
+            coroutine=arun,
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            response_format="content_and_artifact",
+        )
+
+    return decorate
+
+
+def cache_stats():
+    return {name: dict(cache.stats) for name, cache in caches.items()}
@@ -0,0 +1,119 @@
+"""
+بررسی تعمیر محلی StructuredOutput روی خروجی‌های خراب یک مدل جعلی (بدون API).
+
+    python -m common.check_structured
+
+هر مورد یک tool call نامعتبر است که باید بدون درخواست دوباره به مدل تعمیر شود؛
+از جمله برچسب خراب داخل یک جواب دسته‌ای (مثل BatchCategory و BatchSentiment).
+"""
+from typing import Literal
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import BaseModel, Field
+
+from common.structured import StructuredOutput
+
+
+class Category(BaseModel):
+    label: Literal["spam", "work", "personal"]
+
+
+class EmailCategory(Category):
+    id: str
+
+
+class BatchCategory(BaseModel):
+    emails: list[EmailCategory]
+
+
+class Score(BaseModel):
+    mood: Literal["negative", "positive", "neutral"]
+    confidence: int = Field(ge=0, le=100)
+
+
+class Report(BaseModel):
+    best: Score
+    scores: list[Score]
+
+
+class FakeToolLLM(BaseChatModel):
+    """همیشه همان tool call را با args داده‌شده برمی‌گرداند"""
+
+    name_: str
+    args: dict
+    calls: int = 0
+
+    @property
+    def _llm_type(self):
+        return "fake-tool"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        call = {"name": self.name_, "args": self.args, "id": f"call_{self.calls}"}
+        message = AIMessage(content="", tool_calls=[call])
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+CASES = [
+    (
+        Category,
+        {"label": "Spam."},
+        Category(label="spam"),
+    ),
+    (
+        BatchCategory,
+        {
+            "emails": [
+                {"id": "1", "label": "work"},
+                {"id": "2", "label": "Personal 💌"},
+                {"id": 3, "label": "SPAM!"},
+            ]
+        },
+        BatchCategory(
+            emails=[
+                EmailCategory(id="1", label="work"),
+                EmailCategory(id="2", label="personal"),
+                EmailCategory(id="3", label="spam"),
+            ]
+        ),
+    ),
+    (
+        Report,
+        {
+            "best": {"mood": "positive 😄", "confidence": "۹۵٪"},
+            "scores": [
+                {"mood": "Negative.", "confidence": 140},
+                {"mood": "neutral", "confidence": -3},
+            ],
+        },
+        Report(
+            best=Score(mood="positive", confidence=95),
+            scores=[
+                Score(mood="negative", confidence=100),
+                Score(mood="neutral", confidence=0),
+            ],
+        ),
+    ),
+]
+
+
+def main():
+    for schema, args, expected in CASES:
+        llm = FakeToolLLM(name_=schema.__name__, args=args)
+        structured = StructuredOutput(llm, schema)
+        result = structured.invoke("classify")
+        assert result == expected, f"{schema.__name__}: {result!r} != {expected!r}"
+        assert structured.stats == {"ok": 0, "repaired": 1, "retried": 0, "failed": 0}, (
+            f"{schema.__name__}: {structured.stats}"
+        )
+        assert llm.calls == 1, f"{schema.__name__}: {llm.calls} model calls"
+    print(f"{len(CASES)} cases repaired locally")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,486 @@
+import asyncio
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+import weakref
+from collections import OrderedDict
+
+from langchain_core.messages import BaseMessage
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT, checkpoint_ns TEXT, checkpoint_id TEXT, parent_id TEXT,
+    type TEXT, checkpoint BLOB, metadata_type TEXT, metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT, checkpoint_ns TEXT, channel TEXT, version TEXT,
+    type TEXT, value BLOB, base TEXT, keep INTEGER,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS messages (
+    thread_id TEXT, digest TEXT, type TEXT, value BLOB,
+    PRIMARY KEY (thread_id, digest)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT, checkpoint_ns TEXT, checkpoint_id TEXT, task_id TEXT,
+    idx INTEGER, channel TEXT, type TEXT, value BLOB, task_path TEXT,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+# نوع blob برای لیست پیام‌ها: به جای کپی کامل لیست، فقط
+# «چند پیام اول نسخه base را نگه دار + این digestها را اضافه کن» ذخیره می‌شود
+MESSAGE_DELTA = "msgdelta"
+
+
+def _is_message_list(value):
+    return (
+        isinstance(value, list)
+        and len(value) > 0
+        and all(isinstance(m, BaseMessage) for m in value)
+    )
+
+
+def _common_prefix(a, b):
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+class SqliteDeltaSaver(BaseCheckpointSaver[str]):
+    """
+    checkpointer فایلی (SQLite) به جای MemorySaver.
+
+    - هر کانال فقط وقتی نسخه‌اش عوض شود ذخیره می‌شود.
+    - کانال‌های لیست پیام (messages) به صورت delta ذخیره می‌شوند و متن هر پیام
+      فقط یک بار در جدول messages نوشته می‌شود.
+    - بعد از هر compact_every checkpoint در یک thread، فقط keep_last تای آخر
+      می‌مانند و قدیمی‌ترینِ باقی‌مانده به snapshot کامل تبدیل می‌شود.
+    """
+
+    def __init__(
+        self,
+        path,
+        *,
+        serde=None,
+        compact_every=200,
+        keep_last=20,
+        snapshot_every=50,
+        max_cached_threads=1024,
+    ):
+        super().__init__(serde=serde)
+        self.compact_every = compact_every
+        self.keep_last = keep_last
+        self.snapshot_every = snapshot_every
+        self.max_cached_threads = max_cached_threads
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        # (thread_id, ns, channel) -> (version, digests, chain_length, weakrefs)
+        self._heads = OrderedDict()
+        self._puts_since_compact = {}
+
+    # ---------- خواندن ----------
+
+    def _message_digests(self, thread_id, ns, channel, version):
+        head = self._heads.get((thread_id, ns, channel))
+        if head and head[0] == version:
+            return head[1], head[2]
+        row = self.conn.execute(
+            "SELECT type, value, base, keep FROM blobs WHERE thread_id=? "
+            "AND checkpoint_ns=? AND channel=? AND version=?",
+            (thread_id, ns, channel, version),
+        ).fetchone()
+        if row is None or row[0] != MESSAGE_DELTA:
+            return None, 0
+        added = json.loads(row[1])
+        if row[2] is None:
+            return added, 0
+        base, length = self._message_digests(thread_id, ns, channel, row[2])
+        return base[: row[3]] + added, length + 1
+
+    def _load_messages(self, thread_id, digests):
+        found = {}
+        for i in range(0, len(digests), 500):
+            part = digests[i : i + 500]
+            marks = ",".join("?" * len(part))
+            for digest, type_, value in self.conn.execute(
+                f"SELECT digest, type, value FROM messages WHERE thread_id=? "
+                f"AND digest IN ({marks})",
+                (thread_id, *part),
+            ):
+                found[digest] = self.serde.loads_typed((type_, value))
+        return [found[d] for d in digests]
+
+    def _load_channel_values(self, thread_id, ns, versions):
+        values = {}
+        for channel, version in versions.items():
+            row = self.conn.execute(
+                "SELECT type, value FROM blobs WHERE thread_id=? AND "
+                "checkpoint_ns=? AND channel=? AND version=?",
+                (thread_id, ns, channel, str(version)),
+            ).fetchone()
+            if row is None or row[0] == "empty":
+                continue
+            if row[0] == MESSAGE_DELTA:
+                digests, _ = self._message_digests(
+                    thread_id, ns, channel, str(version)
+                )
+                values[channel] = self._load_messages(thread_id, digests)
+            else:
+                values[channel] = self.serde.loads_typed(row)
+        return values
+
+    def _pending_writes(self, thread_id, ns, checkpoint_id):
+        rows = self.conn.execute(
+            "SELECT task_id, channel, type, value FROM writes WHERE thread_id=? "
+            "AND checkpoint_ns=? AND checkpoint_id=? ORDER BY task_path, task_id, idx",
+            (thread_id, ns, checkpoint_id),
+        )
+        return [(t, c, self.serde.loads_typed((ty, v))) for t, c, ty, v in rows]
+
+    def _tuple(self, thread_id, ns, row):
+        checkpoint_id, parent_id, type_, blob, meta_type, meta = row
+        checkpoint = self.serde.loads_typed((type_, blob))
+        checkpoint["channel_values"] = self._load_channel_values(
+            thread_id, ns, checkpoint["channel_versions"]
+        )
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=checkpoint,
+            metadata=self.serde.loads_typed((meta_type, meta)),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": ns,
+                        "checkpoint_id": parent_id,
+                    }
+                }
+                if parent_id
+                else None
+            ),
+            pending_writes=self._pending_writes(thread_id, ns, checkpoint_id),
+        )
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata"
+        with self.lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self.conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id=? AND "
+                    "checkpoint_ns=? AND checkpoint_id=?",
+                    (thread_id, ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self.conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id=? AND "
+                    "checkpoint_ns=? ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, ns),
+                ).fetchone()
+            return self._tuple(thread_id, ns, row) if row else None
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, "
+            "checkpoint, metadata_type, metadata FROM checkpoints WHERE 1=1"
+        )
+        params = []
+        if config:
+            query += " AND thread_id=?"
+            params.append(config["configurable"]["thread_id"])
+            if (ns := config["configurable"].get("checkpoint_ns")) is not None:
+                query += " AND checkpoint_ns=?"
+                params.append(ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                query += " AND checkpoint_id=?"
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            query += " AND checkpoint_id<?"
+            params.append(before_id)
+        query += " ORDER BY checkpoint_id DESC"
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+            results = []
+            for thread_id, ns, *row in rows:
+                if limit is not None and len(results) >= limit:
+                    break
+                metadata = self.serde.loads_typed((row[4], row[5]))
+                if filter and not all(metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                results.append(self._tuple(thread_id, ns, row))
+        yield from results
+
+    # ---------- نوشتن ----------
+
+    def _put_messages(self, thread_id, ns, channel, version, messages):
+        key = (thread_id, ns, channel)
+        head = self._heads.get(key)
+        # پیام‌هایی که همان آبجکت نسخه قبلی هستند دوباره serialize نمی‌شوند
+        known = head[3] if head else []
+        digests = []
+        refs = []
+        rows = []
+        for i, m in enumerate(messages):
+            if i < len(known) and known[i]() is m:
+                digest = head[1][i]
+            else:
+                type_, data = self.serde.dumps_typed(m)
+                digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+                rows.append((thread_id, digest, type_, data))
+            digests.append(digest)
+            refs.append(weakref.ref(m))
+        self.conn.executemany("INSERT OR IGNORE INTO messages VALUES (?,?,?,?)", rows)
+
+        if head is None:
+            row = self.conn.execute(
+                "SELECT version FROM blobs WHERE thread_id=? AND checkpoint_ns=? "
+                "AND channel=? AND type=? ORDER BY version DESC LIMIT 1",
+                (thread_id, ns, channel, MESSAGE_DELTA),
+            ).fetchone()
+            if row:
+                base_digests, length = self._message_digests(
+                    thread_id, ns, channel, row[0]
+                )
+                head = (row[0], base_digests, length, [])
+
+        if head is None or head[2] >= self.snapshot_every:
+            base, keep, added, length = None, 0, digests, 0
+        else:
+            keep = _common_prefix(head[1], digests)
+            base, added, length = head[0], digests[keep:], head[2] + 1
+        self.conn.execute(
+            "INSERT OR REPLACE INTO blobs VALUES (?,?,?,?,?,?,?,?)",
+            (
+                thread_id,
+                ns,
+                channel,
+                version,
+                MESSAGE_DELTA,
+                json.dumps(added),
+                base,
+                keep,
+            ),
+        )
+        self._heads[key] = (version, digests, length, refs)
+        self._heads.move_to_end(key)
+        while len(self._heads) > self.max_cached_threads:
+            self._heads.popitem(last=False)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"]["checkpoint_ns"]
+        c = checkpoint.copy()
+        values = c.pop("channel_values")
+        with self.lock:
+            for channel, version in new_versions.items():
+                value = values.get(channel)
+                if _is_message_list(value):
+                    self._put_messages(thread_id, ns, channel, str(version), value)
+                    continue
+                type_, data = (
+                    self.serde.dumps_typed(value)
+                    if channel in values
+                    else ("empty", b"")
+                )
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO blobs VALUES (?,?,?,?,?,?,NULL,0)",
+                    (thread_id, ns, channel, str(version), type_, data),
+                )
+            type_, data = self.serde.dumps_typed(c)
+            meta_type, meta = self.serde.dumps_typed(
+                get_checkpoint_metadata(config, metadata)
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?,?,?,?,?,?,?,?)",
+                (
+                    thread_id,
+                    ns,
+                    checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),
+                    type_,
+                    data,
+                    meta_type,
+                    meta,
+                ),
+            )
+            self.conn.commit()
+
+            count = self._puts_since_compact.get(thread_id, 0) + 1
+            self._puts_since_compact[thread_id] = count
+            if self.compact_every and count >= self.compact_every:
+                self.compact(thread_id, self.keep_last)
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, data = self.serde.dumps_typed(value)
+            idx = WRITES_IDX_MAP.get(channel, idx)
+            rows.append(
+                (thread_id, ns, checkpoint_id, task_id, idx, channel, type_, data, task_path)
+            )
+        # نوشتن‌های خاص (خطا، interrupt) جایگزین می‌شوند و بقیه فقط یک بار ثبت می‌شوند
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO writes VALUES (?,?,?,?,?,?,?,?,?)",
+                [r for r in rows if r[4] < 0],
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO writes VALUES (?,?,?,?,?,?,?,?,?)",
+                [r for r in rows if r[4] >= 0],
+            )
+            self.conn.commit()
+
+    def delete_thread(self, thread_id):
+        with self.lock:
+            for table in ("checkpoints", "blobs", "messages", "writes"):
+                self.conn.execute(f"DELETE FROM {table} WHERE thread_id=?", (thread_id,))
+            self.conn.commit()
+            for key in [k for k in self._heads if k[0] == thread_id]:
+                del self._heads[key]
+            self._puts_since_compact.pop(thread_id, None)
+
+    # ---------- فشرده‌سازی ----------
+
+    def compact(self, thread_id, keep_last=1):
+        """checkpointهای قدیمی thread را حذف می‌کند و فقط keep_last تای آخر را نگه می‌دارد"""
+        with self.lock:
+            self._puts_since_compact[thread_id] = 0
+            for (ns,) in self.conn.execute(
+                "SELECT DISTINCT checkpoint_ns FROM checkpoints WHERE thread_id=?",
+                (thread_id,),
+            ).fetchall():
+                self._compact_ns(thread_id, ns, keep_last)
+            self.conn.commit()
+
+    def _compact_ns(self, thread_id, ns, keep_last):
+        rows = self.conn.execute(
+            "SELECT checkpoint_id, type, checkpoint FROM checkpoints WHERE "
+            "thread_id=? AND checkpoint_ns=? ORDER BY checkpoint_id DESC",
+            (thread_id, ns),
+        ).fetchall()
+        if len(rows) <= keep_last:
+            return
+        kept, dropped = rows[:keep_last], rows[keep_last:]
+        referenced = set()
+        for _, type_, blob in kept:
+            versions = self.serde.loads_typed((type_, blob))["channel_versions"]
+            referenced.update((ch, str(v)) for ch, v in versions.items())
+
+        # deltaهایی که پایه‌شان حذف می‌شود به snapshot کامل تبدیل می‌شوند
+        for channel, version in referenced:
+            row = self.conn.execute(
+                "SELECT base FROM blobs WHERE thread_id=? AND checkpoint_ns=? AND "
+                "channel=? AND version=? AND type=?",
+                (thread_id, ns, channel, version, MESSAGE_DELTA),
+            ).fetchone()
+            if row is None or row[0] is None or (channel, row[0]) in referenced:
+                continue
+            digests, _ = self._message_digests(thread_id, ns, channel, version)
+            self.conn.execute(
+                "UPDATE blobs SET value=?, base=NULL, keep=0 WHERE thread_id=? AND "
+                "checkpoint_ns=? AND channel=? AND version=?",
+                (json.dumps(digests), thread_id, ns, channel, version),
+            )
+        for (checkpoint_id, _, _) in dropped:
+            for table in ("checkpoints", "writes"):
+                self.conn.execute(
+                    f"DELETE FROM {table} WHERE thread_id=? AND checkpoint_ns=? "
+                    "AND checkpoint_id=?",
+                    (thread_id, ns, checkpoint_id),
+                )
+        for channel, version in self.conn.execute(
+            "SELECT channel, version FROM blobs WHERE thread_id=? AND checkpoint_ns=?",
+            (thread_id, ns),
+        ).fetchall():
+            if (channel, version) not in referenced:
+                self.conn.execute(
+                    "DELETE FROM blobs WHERE thread_id=? AND checkpoint_ns=? AND "
+                    "channel=? AND version=?",
+                    (thread_id, ns, channel, version),
+                )
+        for key in [k for k in self._heads if k[:2] == (thread_id, ns)]:
+            del self._heads[key]
+
+        live = set()
+        for (value,) in self.conn.execute(
+            "SELECT value FROM blobs WHERE thread_id=? AND type=?",
+            (thread_id, MESSAGE_DELTA),
+        ):
+            live.update(json.loads(value))
+        for (digest,) in self.conn.execute(
+            "SELECT digest FROM messages WHERE thread_id=?", (thread_id,)
+        ).fetchall():
+            if digest not in live:
+                self.conn.execute(
+                    "DELETE FROM messages WHERE thread_id=? AND digest=?",
+                    (thread_id, digest),
+                )
+
+    def get_next_version(self, current, channel):
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # ---------- نسخه‌های async ----------
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(
+            self.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(
+            self.put_writes, config, writes, task_id, task_path
+        )
+
+    async def adelete_thread(self, thread_id):
+        return await asyncio.to_thread(self.delete_thread, thread_id)
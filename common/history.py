@@ -0,0 +1,129 @@
+from langchain_core.messages import (
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+    ToolMessage,
+)
+
+
+SUMMARY_PROMPT = """You maintain the running summary of a conversation.
+Current summary:
+{summary}
+
+Fold the following older messages into the summary. Keep names, numbers,
+decisions and open questions; drop small talk. Answer with the new summary
+only, in at most {max_words} words.
+
+Messages:
+{transcript}
+"""
+
+
+def count_turns(messages):
+    return sum(1 for m in messages if isinstance(m, HumanMessage))
+
+
+def turn_start(messages, keep_last_turns):
+    """اندیس اولین پیام از N نوبت آخر (هر نوبت با یک HumanMessage شروع می‌شود)"""
+    seen = 0
+    for i in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[i], HumanMessage):
+            seen += 1
+            if seen == keep_last_turns:
+                return i
+    return 0
+
+
+def compact_tool_messages(messages, tool_payload_limit):
+    """خروجی حجیم ابزارهایی که مدل بعد از آن‌ها جواب داده را با یک خلاصه کوتاه عوض می‌کند"""
+    updates = []
+    answered = False
+    for m in reversed(messages):
+        if not isinstance(m, ToolMessage):
+            answered = answered or m.type == "ai"
+            continue
+        if not answered or len(str(m.content)) <= tool_payload_limit:
+            continue
+        # با همان id برمی‌گردد تا add_messages پیام قبلی را جایگزین کند
+        updates.append(
+            ToolMessage(
+                content=f"[{len(str(m.content))} chars of {m.name or 'tool'} output omitted after use]",
+                id=m.id,
+                name=m.name,
+                tool_call_id=m.tool_call_id,
+                status=m.status,
+            )
+        )
+    return updates
+
+
+def with_summary(messages, summary):
+    if not summary:
+        return messages
+    note = SystemMessage(content=f"Summary of the earlier conversation:\n{summary}")
+    return [note] + list(messages)
+
+
+def _transcript(messages):
+    return "\n".join(f"{m.type}: {m.content}" for m in messages if m.content)
+
+
+def _summary_prompt(summary, old_messages, max_words):
+    return SUMMARY_PROMPT.format(
+        summary=summary or "(empty)",
+        transcript=_transcript(old_messages),
+        max_words=max_words,
+    )
+
+
+def _plan(state, keep_last_turns, summarize_after_turns, tool_payload_limit):
+    messages = state["messages"]
+    updates = compact_tool_messages(messages, tool_payload_limit)
+    if count_turns(messages) <= summarize_after_turns:
+        return updates, []
+    old = messages[: turn_start(messages, keep_last_turns)]
+    old_ids = {m.id for m in old}
+    updates = [m for m in updates if m.id not in old_ids]
+    return updates + [RemoveMessage(id=m.id) for m in old], old
+
+
+def manage_history(
+    state,
+    llm,
+    keep_last_turns=4,
+    summarize_after_turns=8,
+    tool_payload_limit=2000,
+    max_summary_words=200,
+):
+    """
+    در پایان هر نوبت اجرا می‌شود:
+    ۱. خروجی ابزارهای مصرف‌شده را کوچک می‌کند.
+    ۲. اگر تعداد نوبت‌ها از summarize_after_turns بیشتر شد، نوبت‌های قدیمی را در
+       خلاصه ادغام و از state حذف می‌کند تا فقط keep_last_turns نوبت آخر بماند.
+    """
+    updates, old = _plan(
+        state, keep_last_turns, summarize_after_turns, tool_payload_limit
+    )
+    if not old:
+        return {"messages": updates} if updates else {}
+    prompt = _summary_prompt(state.get("summary", ""), old, max_summary_words)
+    summary = llm.invoke(prompt).content
+    return {"summary": summary, "messages": updates}
+
+
+async def amanage_history(
+    state,
+    llm,
+    keep_last_turns=4,
+    summarize_after_turns=8,
+    tool_payload_limit=2000,
+    max_summary_words=200,
+):
+    updates, old = _plan(
+        state, keep_last_turns, summarize_after_turns, tool_payload_limit
+    )
+    if not old:
+        return {"messages": updates} if updates else {}
+    prompt = _summary_prompt(state.get("summary", ""), old, max_summary_words)
+    summary = (await llm.ainvoke(prompt)).content
+    return {"summary": summary, "messages": updates}
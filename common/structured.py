@@ -0,0 +1,214 @@
+import difflib
+import json
+import re
+import threading
+import typing
+
+import annotated_types
+from langchain_core.exceptions import OutputParserException
+from langchain_core.runnables import Runnable
+from pydantic import BaseModel, ValidationError
+
+
+JSON_BLOCK = re.compile(r"\{.*\}", re.DOTALL)
+NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+PERSIAN_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "01234567890123456789")
+
+
+def extract_json(text):
+    """اولین آبجکت JSON داخل متن (حتی وسط توضیحات یا ```json```) را پیدا می‌کند"""
+    match = JSON_BLOCK.search(text or "")
+    while match:
+        candidate = match.group(0)
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            # آکولاد آخر را کوتاه می‌کنیم تا به یک JSON معتبر برسیم
+            end = candidate.rfind("}", 0, len(candidate) - 1)
+            if end <= 0:
+                return None
+            match = JSON_BLOCK.search(candidate[: end + 1])
+    return None
+
+
+def match_choice(value, choices):
+    """برچسب‌هایی مثل "Spam." یا "positive 😄" را به یکی از مقادیر Literal نگاشت می‌کند"""
+    text = str(value).strip().lower()
+    if text in choices:
+        return text
+    words = re.findall(r"\w+", text)
+    for word in words:
+        if word in choices:
+            return word
+    for choice in choices:
+        if choice in text:
+            return choice
+    close = difflib.get_close_matches(" ".join(words), choices, n=1, cutoff=0.6)
+    return close[0] if close else None
+
+
+def clamp_number(value, metadata, as_int):
+    if isinstance(value, str):
+        found = NUMBER.search(value.translate(PERSIAN_DIGITS))
+        if not found:
+            return value
+        value = float(found.group(0))
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        return value
+    step = 1 if as_int else 0
+    for bound in metadata:
+        if isinstance(bound, annotated_types.Ge):
+            value = max(value, bound.ge)
+        elif isinstance(bound, annotated_types.Gt):
+            value = max(value, bound.gt + step)
+        elif isinstance(bound, annotated_types.Le):
+            value = min(value, bound.le)
+        elif isinstance(bound, annotated_types.Lt):
+            value = min(value, bound.lt - step)
+    return round(value) if as_int else value
+
+
+def _repair_value(annotation, metadata, value):
+    origin = typing.get_origin(annotation)
+    if origin is typing.Literal:
+        choice = match_choice(value, typing.get_args(annotation))
+        return value if choice is None else choice
+    if annotation in (int, float):
+        return clamp_number(value, metadata, annotation is int)
+    if annotation is str and not isinstance(value, str):
+        return str(value)
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        # مدل تو در تو، مثلاً هر ایمیل داخل BatchCategory
+        repaired = repair_fields(annotation, value)
+        return value if repaired is None else repaired
+    if origin in (list, tuple, set, frozenset) and isinstance(value, list):
+        args = typing.get_args(annotation)
+        if len(args) == 1 or (len(args) == 2 and args[1] is Ellipsis):
+            return [_repair_value(args[0], [], item) for item in value]
+    return value
+
+
+def repair_fields(schema, data):
+    """
+    تعمیر محلی: بازه‌های عددی را clamp و برچسب‌های Literal را fuzzy-match می‌کند؛
+    داخل فیلدهایی که خودشان مدل یا لیستی از مدل‌اند هم می‌رود
+    """
+    fields = schema.model_fields
+    if not isinstance(data, dict):
+        if len(fields) != 1:
+            return None
+        data = {next(iter(fields)): data}
+    repaired = dict(data)
+    for name, field in fields.items():
+        if name in repaired:
+            repaired[name] = _repair_value(
+                field.annotation, field.metadata, repaired[name]
+            )
+    return repaired
+
+
+def _failed_generation(error):
+    # Groq وقتی tool call نامعتبر باشد، متن خام مدل را در failed_generation برمی‌گرداند
+    body = getattr(error, "body", None)
+    if isinstance(body, dict):
+        return (body.get("error") or {}).get("failed_generation")
+    return None
+
+
+def _candidates(raw, text):
+    if raw is not None:
+        for call in getattr(raw, "tool_calls", None) or []:
+            yield call["args"]
+        for call in getattr(raw, "invalid_tool_calls", None) or []:
+            yield extract_json(call.get("args"))
+        text = raw.content if isinstance(raw.content, str) else text
+    if text:
+        yield extract_json(text)
+        yield text
+
+
+class StructuredOutput(Runnable):
+    """
+    جایگزین llm.with_structured_output(schema) با یک مسیر تعمیر ارزان:
+    اگر خروجی مدل در validation رد شد، اول محلی تعمیر می‌شود و فقط اگر
+    تعمیر هم جواب نداد دوباره از مدل پرسیده می‌شود.
+    شمارنده‌ها در self.stats: ok، repaired، retried، failed.
+    """
+
+    def __init__(self, llm, schema, max_retries=1, **kwargs):
+        self.schema = schema
+        self.max_retries = max_retries
+        self.raw_llm = llm.with_structured_output(schema, include_raw=True, **kwargs)
+        self.stats = {"ok": 0, "repaired": 0, "retried": 0, "failed": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def repair(self, raw=None, text=None):
+        for candidate in _candidates(raw, text):
+            if candidate is None:
+                continue
+            data = repair_fields(self.schema, candidate)
+            if data is None:
+                continue
+            try:
+                return self.schema.model_validate(data)
+            except ValidationError:
+                continue
+        return None
+
+    def _resolve(self, result, error):
+        if error is None and result["parsed"] is not None:
+            self._count("ok")
+            return result["parsed"]
+        if error is not None:
+            parsed = self.repair(text=_failed_generation(error))
+        else:
+            parsed = self.repair(raw=result["raw"])
+        if parsed is not None:
+            self._count("repaired")
+        return parsed
+
+    def _give_up(self, error):
+        self._count("failed")
+        if error is not None:
+            raise error
+        raise OutputParserException(
+            f"Could not parse or repair a {self.schema.__name__} from the model output"
+        )
+
+    def invoke(self, input, config=None, **kwargs):
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._count("retried")
+            result, error = None, None
+            try:
+                result = self.raw_llm.invoke(input, config, **kwargs)
+            except Exception as e:
+                if _failed_generation(e) is None:
+                    raise
+                error = e
+            parsed = self._resolve(result, error)
+            if parsed is not None:
+                return parsed
+        self._give_up(error)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._count("retried")
+            result, error = None, None
+            try:
+                result = await self.raw_llm.ainvoke(input, config, **kwargs)
+            except Exception as e:
+                if _failed_generation(e) is None:
+                    raise
+                error = e
+            parsed = self._resolve(result, error)
+            if parsed is not None:
+                return parsed
+        self._give_up(error)
@@ -0,0 +1,144 @@
+import asyncio
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import Runnable
+
+
+MAX_WORKERS = 8
+CALL_TIMEOUT = 30
+
+
+def _error_message(call, text, elapsed):
+    return ToolMessage(
+        content=f"Error: {text}",
+        name=call["name"],
+        tool_call_id=call["id"],
+        status="error",
+        response_metadata={"elapsed": elapsed},
+    )
+
+
+def _timed(message, call, elapsed):
+    if not isinstance(message, ToolMessage):
+        message = ToolMessage(content=str(message), tool_call_id=call["id"])
+    message.name = message.name or call["name"]
+    message.response_metadata = {**message.response_metadata, "elapsed": elapsed}
+    return message
+
+
+class ParallelToolNode(Runnable):
+    """
+    جایگزین ToolNode وقتی مدل چند tool call در یک پیام می‌فرستد:
+    همه‌ی callها هم‌زمان اجرا می‌شوند (با سقف هم‌زمانی برای هر ابزار و timeout
+    برای هر call) و ToolMessageها به همان ترتیب callها برگردانده می‌شوند.
+    زمان هر call در response_metadata["elapsed"] است.
+
+        ParallelToolNode(tools, limits={"tavily_search_results_json": 3}, timeout=20)
+
+    سقف‌ها بین همه‌ی sessionها مشترک است. timeout از لحظه‌ی شروع node حساب
+    می‌شود (انتظار برای جای خالی هم جزوش است)؛ call رها شده تا وقتی واقعاً تمام
+    نشده جایش را در سقف ابزار نگه می‌دارد.
+    """
+
+    def __init__(
+        self,
+        tools,
+        limits=None,
+        default_limit=4,
+        timeout=CALL_TIMEOUT,
+        max_workers=MAX_WORKERS,
+    ):
+        self.tools = {tool.name: tool for tool in tools}
+        limits = limits or {}
+        self.limits = {name: limits.get(name, default_limit) for name in self.tools}
+        self.timeout = timeout
+        self._slots = {name: threading.Semaphore(n) for name, n in self.limits.items()}
+        self._async_slots = weakref.WeakKeyDictionary()
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="tool")
+
+    @staticmethod
+    def tool_calls(input):
+        messages = input["messages"] if isinstance(input, dict) else input
+        for message in reversed(messages):
+            if isinstance(message, AIMessage):
+                return message.tool_calls
+        return []
+
+    def _run(self, call, config):
+        with self._slots[call["name"]]:
+            start = time.perf_counter()
+            tool = self.tools[call["name"]]
+            message = tool.invoke({**call, "type": "tool_call"}, config)
+            return message, time.perf_counter() - start
+
+    def invoke(self, input, config=None, **kwargs):
+        start = time.perf_counter()
+        calls = self.tool_calls(input)
+        futures = [
+            self._executor.submit(self._run, call, config)
+            if call["name"] in self.tools
+            else None
+            for call in calls
+        ]
+        results = []
+        for call, future in zip(calls, futures):
+            if future is None:
+                results.append(
+                    _error_message(call, f"unknown tool {call['name']}", 0.0)
+                )
+                continue
+            remaining = max(0.0, start + self.timeout - time.perf_counter())
+            try:
+                message, elapsed = future.result(timeout=remaining)
+            except FutureTimeout:
+                future.cancel()
+                results.append(
+                    _error_message(
+                        call, f"timed out after {self.timeout}s", self.timeout
+                    )
+                )
+                continue
+            except Exception as e:
+                results.append(
+                    _error_message(call, f"{type(e).__name__}: {e}", 0.0)
+                )
+                continue
+            results.append(_timed(message, call, elapsed))
+        return {"messages": results}
+
+    async def _arun(self, call, config):
+        # Semaphoreهای asyncio به loop وابسته‌اند، پس برای هر loop جدا ساخته می‌شوند
+        loop = asyncio.get_running_loop()
+        slots = self._async_slots.setdefault(
+            loop, {name: asyncio.Semaphore(n) for name, n in self.limits.items()}
+        )
+        async with slots[call["name"]]:
+            start = time.perf_counter()
+            tool = self.tools[call["name"]]
+            message = await tool.ainvoke({**call, "type": "tool_call"}, config)
+            return message, time.perf_counter() - start
+
+    async def _acall(self, call, config):
+        if call["name"] not in self.tools:
+            return _error_message(call, f"unknown tool {call['name']}", 0.0)
+        try:
+            message, elapsed = await asyncio.wait_for(
+                self._arun(call, config), self.timeout
+            )
+        except asyncio.TimeoutError:
+            return _error_message(
+                call, f"timed out after {self.timeout}s", self.timeout
+            )
+        except Exception as e:
+            return _error_message(call, f"{type(e).__name__}: {e}", 0.0)
+        return _timed(message, call, elapsed)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        calls = self.tool_calls(input)
+        results = await asyncio.gather(*(self._acall(call, config) for call in calls))
+        return {"messages": list(results)}